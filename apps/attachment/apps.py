@@ -12,8 +12,13 @@ class AttachmentConfig(AppConfig):
 
     @staticmethod
     def signal_imports():
-        pass
+        import apps.attachment.signals  # noqa
+
+    @staticmethod
+    def task_imports():
+        import apps.attachment.tasks  # noqa
 
     def ready(self):
         self.model_imports()
-        self.signal_imports()
\ No newline at end of file
+        self.signal_imports()
+        self.task_imports()
\ No newline at end of file
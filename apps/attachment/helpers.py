@@ -0,0 +1,85 @@
+import hashlib
+import os
+from functools import partial
+
+from django.db import transaction
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+IMAGE_RENDITION_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+}
+
+IMAGE_RENDITION_MAX_SIZE = 4096
+IMAGE_RENDITION_QUALITY = 90
+
+
+def get_image_rendition_version(image_name):
+    """
+    Returns a short token identifying the source image, so renditions of a replaced image get new urls.
+    """
+    return hashlib.md5(image_name.encode()).hexdigest()[:12]
+
+
+def get_image_rendition_signature(uuid, width, height, fmt, version):
+    return salted_hmac(
+        'apps.attachment.image_rendition',
+        f"{uuid}/{width}x{height}.{fmt}/{version}",
+        algorithm='sha256'
+    ).hexdigest()[:32]
+
+
+def check_image_rendition_signature(uuid, width, height, fmt, version, signature):
+    expected = get_image_rendition_signature(uuid, width, height, fmt, version)
+    return constant_time_compare(expected, signature or '')
+
+
+def check_image_rendition_params(width, height, fmt):
+    return fmt in IMAGE_RENDITION_FORMATS and \
+        0 < width <= IMAGE_RENDITION_MAX_SIZE and \
+        0 < height <= IMAGE_RENDITION_MAX_SIZE
+
+
+def get_image_rendition_url(image_attachment, width, height, fmt='webp'):
+    """
+    Returns the signed url of the on-demand rendition of the given image attachment, or None if the params are not
+    allowed.
+    """
+    fmt = fmt.lower()
+    width, height = int(width), int(height)
+
+    if not image_attachment or not image_attachment.image_raw or not check_image_rendition_params(width, height, fmt):
+        return None
+
+    version = get_image_rendition_version(image_attachment.image_raw.name)
+    signature = get_image_rendition_signature(image_attachment.uuid, width, height, fmt, version)
+
+    url = reverse('attachment:image_rendition', kwargs={
+        'uuid': image_attachment.uuid,
+        'width': width,
+        'height': height,
+        'fmt': fmt,
+    })
+
+    return f"{url}?v={version}&s={signature}"
+
+
+def get_image_rendition_prefix(uuid):
+    return os.path.join('attachment', 'ondemand', str(uuid), '')
+
+
+def get_image_rendition_path(uuid, width, height, fmt, version):
+    return os.path.join(get_image_rendition_prefix(uuid), version, f"{width}x{height}.{fmt}")
+
+
+def remove_image_renditions_on_commit(uuid, keep_version=None):
+    """
+    Queues the removal of the on-demand renditions of the given image attachment once the transaction commits, except
+    the renditions of `keep_version`.
+    """
+    from apps.attachment.tasks import task_remove_image_renditions
+
+    transaction.on_commit(partial(task_remove_image_renditions.delay, str(uuid), keep_version))
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.6 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attachment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified at')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Key')),
+                ('source_hash', models.CharField(db_index=True, max_length=64, verbose_name='Source hash')),
+                ('params', models.JSONField(blank=True, null=True, verbose_name='Params')),
+                ('pillow_version', models.CharField(max_length=20, verbose_name='Pillow version')),
+                ('file', models.ImageField(max_length=255, upload_to='', verbose_name='File')),
+                ('ref_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Reference count')),
+            ],
+            options={
+                'verbose_name': 'Image Rendition',
+                'verbose_name_plural': 'Image Renditions',
+            },
+        ),
+    ]
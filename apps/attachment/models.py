@@ -1,8 +1,21 @@
-from django.db import models
+import hashlib
+import json
+import os
+
+import PIL
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from apps.utils.helpers.django import get_upload_path, remove_storage_file_if_exists, get_processed_image_as_field_file
+from apps.attachment.helpers import get_image_rendition_url, get_image_rendition_version, \
+    remove_image_renditions_on_commit
+from apps.utils.helpers.django import get_upload_path, remove_storage_file_if_exists, get_processed_images_as_field_files, \
+    check_storage_file_exists, remove_storage_files_on_commit
+from apps.utils.helpers.file import get_file_hash
 from apps.utils.mixins.models.atoms import TimestampMixin, UuidMixin, TitleSlugMixin
+from apps.utils.mixins.models.core import StoredFieldsMixin
 
 
 class Category(TimestampMixin, TitleSlugMixin, models.Model):
@@ -61,7 +74,96 @@ class FileAttachment(TimestampMixin, UuidMixin, models.Model):
         return self.file.url
 
 
-class ImageAttachment(TimestampMixin, UuidMixin, models.Model):
+class ImageRenditionManager(models.Manager):
+
+    @staticmethod
+    def get_key(source_hash, params, pillow_version=PIL.__version__):
+        params_json = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(f"{source_hash}:{params_json}:{pillow_version}".encode()).hexdigest()
+
+    def acquire(self, image_file, image_name, params):
+        """
+        Returns the file name of the rendition of the given image for the given params, and adds a reference to it.
+
+        The rendition is only encoded and stored if no rendition with the same source content, params and Pillow
+        version exists in the storage yet.
+        """
+        source_hash = get_file_hash(image_file)
+        key = self.get_key(source_hash, params)
+
+        rendition = self.filter(key=key).first()
+        if rendition and check_storage_file_exists(rendition.file.name):
+            self.filter(pk=rendition.pk).update(ref_count=F('ref_count') + 1, modified_at=timezone.now())
+            return rendition.file.name
+
+        image_out = get_processed_images_as_field_files(image_file, image_name, [params])[0]
+        if not image_out:
+            return ''
+
+        file_name = default_storage.save(os.path.join('attachment', 'rendition', key[:2], key, image_out.name), image_out)
+
+        rendition, created = self.get_or_create(key=key, defaults={
+            'source_hash': source_hash,
+            'params': params,
+            'pillow_version': PIL.__version__,
+            'file': file_name,
+            'ref_count': 1,
+        })
+
+        if not created:
+            if rendition.file.name != file_name:
+                if check_storage_file_exists(rendition.file.name):
+                    remove_storage_file_if_exists(file_name)
+                else:
+                    # saved rather than updated, so the media reference index records the new file
+                    rendition.file = file_name
+                    rendition.save(update_fields=['file'])
+
+            self.filter(pk=rendition.pk).update(ref_count=F('ref_count') + 1, modified_at=timezone.now())
+
+        return rendition.file.name
+
+    def release(self, file_name):
+        """
+        Removes a reference from the rendition stored under the given file name.
+
+        Returns False if the file is not a rendition, in which case the caller owns the file.
+        """
+        return self.filter(file=file_name, ref_count__gt=0).update(ref_count=F('ref_count') - 1, modified_at=timezone.now()) > 0 or \
+            self.filter(file=file_name).exists()
+
+    def orphaned(self):
+        return self.filter(ref_count=0)
+
+
+class ImageRendition(TimestampMixin, models.Model):
+    """
+    Content-addressed index of the renditions generated for image attachments.
+
+    A rendition is keyed by the hash of its source content, its normalized params and the Pillow version, so saving the
+    same image with the same params reuses the stored file instead of encoding it again. `ref_count` holds the number
+    of image attachments using the rendition, renditions with no references are removed by
+    `task_clean_orphaned_image_renditions`.
+    """
+
+    objects = ImageRenditionManager()
+
+    key = models.CharField(_('Key'), max_length=64, unique=True)
+    source_hash = models.CharField(_('Source hash'), max_length=64, db_index=True)
+    params = models.JSONField(_('Params'), blank=True, null=True)
+    pillow_version = models.CharField(_('Pillow version'), max_length=20)
+    file = models.ImageField(_('File'), max_length=255)
+    ref_count = models.PositiveIntegerField(_('Reference count'), default=0, db_index=True)
+
+    class Meta:
+        verbose_name = "Image Rendition"
+        verbose_name_plural = "Image Renditions"
+
+    def __str__(self):
+        return self.key
+
+
+class ImageAttachment(TimestampMixin, UuidMixin, StoredFieldsMixin, models.Model):
     """
     example params:
 
@@ -74,7 +176,10 @@ class ImageAttachment(TimestampMixin, UuidMixin, models.Model):
     {"size": [2560, 1920], "prefix": "xxl-", "force_format": "WEBP"}
     """
 
-    _stored: dict
+    params_field = "params"
+    image_in_field = "image_raw"
+    image_out_field = "image_out"
+    remove_stored_on_change = True
 
     category = models.ForeignKey(
         Category,
@@ -105,20 +210,9 @@ class ImageAttachment(TimestampMixin, UuidMixin, models.Model):
     def __str__(self):
         return str(self.id)
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-
-        self.params_field = "params"
-        self.image_in_field = "image_raw"
-        self.image_out_field = "image_out"
-        self.remove_stored_on_change = True
-
     @classmethod
-    def from_db(cls, db, field_names, values):
-        instance = super().from_db(db, field_names, values)
-        instance._stored = dict(zip(field_names, values))
-
-        return instance
+    def get_stored_field_names(cls):
+        return super().get_stored_field_names() + (cls.image_in_field, cls.params_field, cls.image_out_field)
 
     def save(self, *args, **kwargs):
 
@@ -128,27 +222,67 @@ class ImageAttachment(TimestampMixin, UuidMixin, models.Model):
         image_in = getattr(self, self.image_in_field, None)
         params = getattr(self, self.params_field, None)
 
-        stored_image_in = self._stored.pop(self.image_in_field, None) if hasattr(self, '_stored') else None
-        stored_params = self._stored.pop(self.params_field, None) if hasattr(self, '_stored') else None
+        stored_image_in = self.get_stored_value(self.image_in_field)
+        stored_params = self.get_stored_value(self.params_field)
 
-        if image_in != stored_image_in or params != stored_params:
-            if hasattr(self, self.image_out_field):
-                if image_in and params:
-                    image_out = get_processed_image_as_field_file(image_in.file, image_in.name, **params)
-                else:
-                    image_out = image_in
+        files_to_remove = []
 
-                setattr(self, self.image_out_field, image_out)
+        # the rendition references are counted in the transaction of the save, so a failed save does not keep them
+        with transaction.atomic():
+            if image_in != stored_image_in or params != stored_params:
+                if hasattr(self, self.image_out_field):
+                    if image_in and params:
+                        image_out = ImageRendition.objects.acquire(image_in.file, image_in.name, params)
+                    else:
+                        image_out = image_in
 
-                stored_image_out = self._stored.pop(self.image_out_field, None) if hasattr(self, '_stored') else None
+                    setattr(self, self.image_out_field, image_out)
 
-                if not self._state.adding and self.remove_stored_on_change and image_out != stored_image_out and stored_image_out:
-                    remove_storage_file_if_exists(stored_image_out)
+                    stored_image_out = self.get_stored_value(self.image_out_field)
 
-            if not self._state.adding and self.remove_stored_on_change and image_in != stored_image_in and stored_image_in:
-                remove_storage_file_if_exists(stored_image_in)
+                    if not self._state.adding and stored_image_out and stored_image_out != stored_image_in:
+                        if not ImageRendition.objects.release(stored_image_out) and self.remove_stored_on_change \
+                                and image_out != stored_image_out:
+                            files_to_remove.append(stored_image_out)
 
-        super().save(*args, **kwargs)
+                if not self._state.adding and self.remove_stored_on_change and image_in != stored_image_in \
+                        and stored_image_in:
+                    files_to_remove.append(stored_image_in)
+
+            super().save(*args, **kwargs)
+
+        # removed once the transaction commits, a rollback keeps the files of the stored row
+        remove_storage_files_on_commit(files_to_remove, check_reference=False)
+
+        if stored_image_in and image_in != stored_image_in:
+            remove_image_renditions_on_commit(
+                self.uuid, get_image_rendition_version(image_in.name) if image_in else None
+            )
+
+    def rebuild_image_out(self):
+        """
+        Renders the output image again from the raw image and params, e.g. after the processing defaults changed.
+        """
+        image_in = getattr(self, self.image_in_field, None)
+        params = getattr(self, self.params_field, None)
+
+        if not image_in or not params:
+            return
+
+        stored_image_out = getattr(self, self.image_out_field).name
+
+        with transaction.atomic():
+            image_out = ImageRendition.objects.acquire(image_in.file, image_in.name, params)
+
+            setattr(self, self.image_out_field, image_out)
+            self.save(update_fields=[self.image_out_field])
+
+            if stored_image_out and stored_image_out != image_out and stored_image_out != image_in.name:
+                if not ImageRendition.objects.release(stored_image_out) and self.remove_stored_on_change:
+                    remove_storage_files_on_commit([stored_image_out], check_reference=False)
 
     def get_absolute_url(self):
         return self.image_out.url
+
+    def get_rendition_url(self, width, height, fmt='webp'):
+        return get_image_rendition_url(self, width, height, fmt)
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from apps.attachment.helpers import remove_image_renditions_on_commit
+from apps.attachment.models import ImageAttachment, ImageRendition
+
+
+@receiver(post_delete, sender=ImageAttachment)
+def post_delete_image_attachment(sender, instance, **kwargs):
+    if instance.image_out and instance.image_out != instance.image_raw:
+        ImageRendition.objects.release(instance.image_out.name)
+
+    remove_image_renditions_on_commit(instance.uuid)
@@ -0,0 +1,62 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from apps.attachment.helpers import get_image_rendition_prefix
+from apps.attachment.models import ImageAttachment, ImageRendition
+from apps.utils.helpers.django import remove_storage_file_if_exists, remove_storage_files_on_commit
+from apps.utils.helpers.storage import iter_storage_files
+
+logger = logging.getLogger('custom')
+
+
+@shared_task
+def task_clean_orphaned_image_renditions(min_age_hours=24):
+    """
+    Removes the image renditions that are no longer referenced by any image attachment, with their stored files.
+
+    Renditions modified within the last `min_age_hours` are kept, so a rendition released and acquired again by a
+    concurrent save is not removed.
+    """
+    cutoff = timezone.now() - timedelta(hours=min_age_hours)
+    num_removed = 0
+
+    for rendition in ImageRendition.objects.orphaned().filter(modified_at__lt=cutoff).iterator():
+        if ImageAttachment.objects.filter(image_out=rendition.file.name).exists():
+            ImageRendition.objects.filter(pk=rendition.pk).update(
+                ref_count=ImageAttachment.objects.filter(image_out=rendition.file.name).count()
+            )
+            continue
+
+        remove_storage_file_if_exists(rendition.file.name)
+        rendition.delete()
+        num_removed += 1
+
+    logger.info(f"task_clean_orphaned_image_renditions: removed {num_removed} renditions")
+
+    return num_removed
+
+
+@shared_task
+def task_remove_image_renditions(uuid, keep_version=None):
+    """
+    Removes the on-demand renditions of an image attachment through the storage deletion outbox, except the renditions
+    of `keep_version`.
+    """
+    prefix = get_image_rendition_prefix(uuid)
+    keep_prefix = f"{prefix}{keep_version}/" if keep_version else None
+
+    try:
+        names = [
+            name for name, _ in iter_storage_files(default_storage, prefix)
+            if not keep_prefix or not name.startswith(keep_prefix)
+        ]
+    except FileNotFoundError:
+        return 0
+
+    remove_storage_files_on_commit(names, storage=default_storage, check_reference=False)
+
+    return len(names)
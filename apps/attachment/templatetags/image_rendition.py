@@ -0,0 +1,10 @@
+from django import template
+
+from apps.attachment.helpers import get_image_rendition_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_rendition_url(image_attachment, width, height, fmt='webp'):
+    return get_image_rendition_url(image_attachment, width, height, fmt) or ''
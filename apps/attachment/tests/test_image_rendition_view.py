@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from apps.attachment import views
+from apps.attachment.helpers import get_image_rendition_path, get_image_rendition_url, get_image_rendition_version, \
+    get_image_rendition_prefix
+from apps.attachment.models import ImageAttachment
+from apps.attachment.tasks import task_remove_image_renditions
+from apps.core.tests.base import ModelTestCase, get_image_file
+
+
+class ImageRenditionViewTests(ModelTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.attachment = ImageAttachment.objects.create(image_raw=get_image_file())
+        self.version = get_image_rendition_version(self.attachment.image_raw.name)
+
+    def test_rendition_is_stored_and_redirected(self):
+        response = self.client.get(get_image_rendition_url(self.attachment, 100, 80))
+
+        path = get_image_rendition_path(self.attachment.uuid, 100, 80, 'webp', self.version)
+        self.assertRedirects(response, default_storage.url(path), fetch_redirect_response=False)
+        self.assertTrue(default_storage.exists(path))
+        self.assertIn('max-age=86400', response['Cache-Control'])
+
+    def test_cached_rendition_is_not_processed_again(self):
+        url = get_image_rendition_url(self.attachment, 100, 80)
+        self.client.get(url)
+
+        with mock.patch.object(views, 'get_processed_image') as process:
+            response = self.client.get(url)
+
+        process.assert_not_called()
+        self.assertEqual(response.status_code, 302)
+
+    def test_invalid_urls_are_not_found(self):
+        url = get_image_rendition_url(self.attachment, 100, 80)
+
+        self.assertEqual(self.client.get(url.replace('&s=', '&s=0')).status_code, 404)
+        self.assertEqual(self.client.get(url.replace('100x80', '100x81')).status_code, 404)
+        self.assertIsNone(get_image_rendition_url(self.attachment, 5000, 80))
+        self.assertIsNone(get_image_rendition_url(self.attachment, 100, 80, 'gif'))
+
+    def test_url_of_replaced_image_is_not_found(self):
+        url = get_image_rendition_url(self.attachment, 100, 80)
+
+        self.attachment.image_raw = get_image_file(name='other.png')
+        self.attachment.save()
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertNotEqual(get_image_rendition_url(self.attachment, 100, 80), url)
+
+    def test_cache_timeout_stays_below_signed_url_expiry(self):
+        with mock.patch.object(views, 'get_storage_url_expiry_or_none', return_value=300):
+            self.assertEqual(views.get_image_rendition_cache_timeout(), 240)
+
+        with mock.patch.object(views, 'get_storage_url_expiry_or_none', return_value=30):
+            self.assertEqual(views.get_image_rendition_cache_timeout(), 0)
+
+            url = get_image_rendition_url(self.attachment, 100, 80)
+            response = self.client.get(url)
+
+        self.assertIn('max-age=0', response['Cache-Control'])
+        self.assertIsNone(cache.get(f"image_rendition:{self.attachment.uuid}:{self.version}:100x80.webp"))
+
+
+@override_settings(STORAGE_DELETE_QUEUE=None)
+class RemoveImageRenditionsTests(ModelTestCase):
+
+    def test_renditions_are_removed_except_kept_version(self):
+        prefix = get_image_rendition_prefix('1234')
+        default_storage.save(f"{prefix}old/100x80.webp", get_image_file())
+        default_storage.save(f"{prefix}new/100x80.webp", get_image_file())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(task_remove_image_renditions('1234', keep_version='new'), 1)
+
+        self.assertFalse(default_storage.exists(f"{prefix}old/100x80.webp"))
+        self.assertTrue(default_storage.exists(f"{prefix}new/100x80.webp"))
+
+    def test_missing_prefix_removes_nothing(self):
+        self.assertEqual(task_remove_image_renditions('missing'), 0)
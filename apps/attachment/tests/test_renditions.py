@@ -0,0 +1,98 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.storage import default_storage
+from django.db import DatabaseError
+from django.utils import timezone
+
+from apps.attachment import models as attachment_models
+from apps.attachment.models import ImageAttachment, ImageRendition
+from apps.attachment.tasks import task_clean_orphaned_image_renditions
+from apps.core.models import MediaReference
+from apps.core.tests.base import ModelTestCase, get_image_file
+
+PARAMS = {'size': [160, 120], 'prefix': 'xs-', 'force_format': 'WEBP'}
+
+
+class ImageRenditionTests(ModelTestCase):
+
+    def create_attachment(self, params=PARAMS, **kwargs):
+        return ImageAttachment.objects.create(image_raw=get_image_file(**kwargs), params=params)
+
+    def test_same_image_and_params_share_one_rendition(self):
+        with mock.patch.object(
+            attachment_models, 'get_processed_images_as_field_files',
+            wraps=attachment_models.get_processed_images_as_field_files
+        ) as process:
+            first = self.create_attachment()
+            second = self.create_attachment()
+
+        self.assertEqual(process.call_count, 1)
+        self.assertEqual(first.image_out.name, second.image_out.name)
+
+        rendition = ImageRendition.objects.get()
+        self.assertEqual(rendition.file.name, first.image_out.name)
+        self.assertEqual(rendition.ref_count, 2)
+
+    def test_changed_params_release_the_previous_rendition(self):
+        attachment = self.create_attachment()
+        previous = ImageRendition.objects.get()
+
+        attachment.params = dict(PARAMS, size=[480, 360])
+        attachment.save()
+
+        previous.refresh_from_db()
+        self.assertEqual(previous.ref_count, 0)
+        self.assertEqual(ImageRendition.objects.get(file=attachment.image_out.name).ref_count, 1)
+
+    def test_delete_releases_the_rendition(self):
+        self.create_attachment()
+        self.create_attachment().delete()
+
+        self.assertEqual(ImageRendition.objects.get().ref_count, 1)
+
+    def test_failed_save_keeps_the_reference_count(self):
+        attachment = self.create_attachment()
+
+        with mock.patch.object(ImageAttachment, 'save_base', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.create_attachment()
+
+            attachment.params = dict(PARAMS, size=[480, 360])
+            with self.assertRaises(DatabaseError):
+                attachment.save()
+
+        self.assertEqual(list(ImageRendition.objects.values_list('ref_count', flat=True)), [1])
+
+    def test_replaced_rendition_file_is_indexed(self):
+        self.create_attachment()
+        ImageRendition.objects.update(file='attachment/rendition/missing.webp')
+
+        attachment = self.create_attachment()
+
+        self.assertNotEqual(attachment.image_out.name, 'attachment/rendition/missing.webp')
+        self.assertEqual(ImageRendition.objects.get().file.name, attachment.image_out.name)
+
+        references = MediaReference.objects.filter(content_type=ContentType.objects.get_for_model(ImageRendition))
+        self.assertEqual(list(references.values_list('name', flat=True)), [attachment.image_out.name])
+
+    def test_orphaned_renditions_are_removed(self):
+        attachment = self.create_attachment()
+        name = attachment.image_out.name
+        attachment.delete()
+
+        self.assertEqual(task_clean_orphaned_image_renditions(), 0)
+
+        ImageRendition.objects.update(modified_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(task_clean_orphaned_image_renditions(), 1)
+        self.assertFalse(ImageRendition.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_used_renditions_are_recounted(self):
+        attachment = self.create_attachment()
+        ImageRendition.objects.update(ref_count=0, modified_at=timezone.now() - timedelta(days=2))
+
+        self.assertEqual(task_clean_orphaned_image_renditions(), 0)
+        self.assertEqual(ImageRendition.objects.get(file=attachment.image_out.name).ref_count, 1)
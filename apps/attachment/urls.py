@@ -8,5 +8,6 @@ urlpatterns = [
 
     path('file/<uuid:uuid>/', views.file_attachment, name='file'),
     path('image/<uuid:uuid>/', views.image_attachment, name='image'),
+    path('image/<uuid:uuid>/<int:width>x<int:height>.<str:fmt>', views.image_rendition, name='image_rendition'),
 
 ]
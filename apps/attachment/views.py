@@ -1,6 +1,31 @@
+from django.core.cache import cache
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
 
+from apps.attachment.helpers import IMAGE_RENDITION_FORMATS, IMAGE_RENDITION_QUALITY, \
+    check_image_rendition_params, check_image_rendition_signature, get_image_rendition_path, \
+    get_image_rendition_version
 from apps.attachment.models import FileAttachment, ImageAttachment
+from apps.utils.helpers.image import get_processed_image
+from apps.utils.helpers.storage import get_storage_url_expiry_or_none
+
+IMAGE_RENDITION_CACHE_TIMEOUT = 60 * 60 * 24
+IMAGE_RENDITION_EXPIRY_MARGIN = 60
+
+
+def get_image_rendition_cache_timeout():
+    """
+    Returns how long a rendition url can be cached, kept below the url expiry of signed storages.
+    """
+    expiry = get_storage_url_expiry_or_none(default_storage)
+    if expiry is None:
+        return IMAGE_RENDITION_CACHE_TIMEOUT
+
+    return max(min(IMAGE_RENDITION_CACHE_TIMEOUT, expiry - IMAGE_RENDITION_EXPIRY_MARGIN), 0)
 
 
 def file_attachment(request, uuid):
@@ -11,3 +36,47 @@ def file_attachment(request, uuid):
 def image_attachment(request, uuid):
     image = get_object_or_404(ImageAttachment, uuid=uuid)
     return redirect(image.get_absolute_url())
+
+
+@require_GET
+def image_rendition(request, uuid, width, height, fmt):
+    version = request.GET.get('v', '')
+    signature = request.GET.get('s', '')
+
+    if not check_image_rendition_params(width, height, fmt) or \
+            not check_image_rendition_signature(uuid, width, height, fmt, version, signature):
+        raise Http404
+
+    cache_key = f"image_rendition:{uuid}:{version}:{width}x{height}.{fmt}"
+    cache_timeout = get_image_rendition_cache_timeout()
+    url = cache.get(cache_key)
+
+    if not url:
+        image = get_object_or_404(ImageAttachment, uuid=uuid)
+        if not image.image_raw or get_image_rendition_version(image.image_raw.name) != version:
+            raise Http404
+
+        path = get_image_rendition_path(uuid, width, height, fmt, version)
+
+        if not default_storage.exists(path):
+            out_file, filename = get_processed_image(
+                image.image_raw.file,
+                image.image_raw.name,
+                size=[width, height],
+                force_format=IMAGE_RENDITION_FORMATS[fmt],
+                quality=IMAGE_RENDITION_QUALITY
+            )
+
+            if out_file is None:
+                raise Http404
+
+            path = default_storage.save(path, File(out_file))
+
+        url = default_storage.url(path)
+        if cache_timeout:
+            cache.set(cache_key, url, cache_timeout)
+
+    response = redirect(url)
+    patch_cache_control(response, public=True, max_age=cache_timeout)
+
+    return response
@@ -1,13 +1,30 @@
 from django.apps import apps
 from django.contrib import admin
 
-from apps.core.models import ConfigGoogleRecaptcha
+from apps.core.helpers import schedule_storage_deletion_flush
+from apps.core.models import ConfigGoogleRecaptcha, StorageDeletion
 from apps.utils.mixins.admin.core import AutoModelAdminMixin, AutoModelNoModuleAdminMixin
 
 app_config = apps.get_app_config('core')
 
 app_config.model_imports()
 
+
+@admin.register(StorageDeletion)
+class StorageDeletionAdmin(AutoModelAdminMixin, admin.ModelAdmin):
+    actions = ('retry_deletions', )
+
+    def get_list_filter(self, request):
+        return tuple(super().get_list_filter(request)) + ('attempts', )
+
+    def retry_deletions(self, request, queryset):
+        updated = queryset.update(attempts=0)
+        schedule_storage_deletion_flush()
+
+        self.message_user(request, '{} deletions will be retried.'.format(updated))
+
+    retry_deletions.short_description = "Retry Selected"
+
 no_module_models = (
     ConfigGoogleRecaptcha,
 )
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
@@ -14,11 +15,19 @@ class CoreConfig(AppConfig):
     def signal_imports():
         import apps.core.signals  # noqa
 
+        apps.core.signals.connect_media_reference_signals()
+
     @staticmethod
     def task_imports():
         import apps.core.tasks  # noqa
 
+    @staticmethod
+    def pillow_config():
+        from PIL import Image
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+
     def ready(self):
         self.model_imports()
         self.signal_imports()
-        self.task_imports()
\ No newline at end of file
+        self.task_imports()
+        self.pillow_config()
\ No newline at end of file
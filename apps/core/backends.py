@@ -24,18 +24,52 @@ class SmtpEmailLogBackend(EmailLogBackendMixin, SmtpEmailBackend):
         return super().send_messages(email_messages)
 
 
-class AmazonSesEmailLogBackend(EmailLogBackendMixin, BaseEmailBackend):
+class AmazonSesEmailBackend(BaseEmailBackend):
     """
-    A Django Email backend that uses Amazon SES to send emails, and logs them.
+    A Django Email backend that uses Amazon SES to send emails.
+
+    The SES handler is created by open() and reused for all messages until close(). It uses the SES client of the
+    process, see `get_ses_client`. The messages that were not sent are kept in `failed_messages`.
     """
 
+    def __init__(self, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently, **kwargs)
+        self.connection = None
+        self.failed_messages = None
+
+    def open(self):
+        if self.connection:
+            return False
+
+        self.connection = AmazonSesHandler()
+        return True
+
+    def close(self):
+        self.connection = None
+
     def send_messages(self, email_messages):
+        self.failed_messages = []
+
+        if not email_messages:
+            return 0
+
         num_sent = 0
+        new_conn_created = self.open()
 
-        amazon_ses = AmazonSesHandler()
-        for message in email_messages:
-            sent = amazon_ses.send_email(message)
-            if sent:
-                num_sent += 1
+        try:
+            for message in email_messages:
+                if self.connection.send_email(message):
+                    num_sent += 1
+                else:
+                    self.failed_messages.append(message)
+        finally:
+            if new_conn_created:
+                self.close()
 
         return num_sent
+
+
+class AmazonSesEmailLogBackend(EmailLogBackendMixin, AmazonSesEmailBackend):
+    """
+    A Django Email backend that uses Amazon SES to send emails, and logs them.
+    """
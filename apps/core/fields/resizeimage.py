@@ -3,10 +3,10 @@
 # version 1.0.1
 
 from django.core import checks
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 from django.db.models import ImageField
 
-from apps.utils.helpers.image import get_processed_image
+from apps.utils.helpers.image import get_processed_images
 
 
 class ResizedImageFieldFile(ImageField.attr_class):
@@ -18,8 +18,8 @@ class ResizedImageFieldFile(ImageField.attr_class):
         for custom_kwargs in ['crop', 'size', 'scale', 'quality', 'keep_meta', 'force_format']:
             image_kwargs[custom_kwargs] = getattr(self.field, custom_kwargs)
 
-        bytes_io, filename = get_processed_image(content.file, name, **image_kwargs)
-        new_content = ContentFile(bytes_io.getvalue())
+        out_file, filename = get_processed_images(content.file, name, [image_kwargs])[0]
+        new_content = File(out_file)
 
         super(ResizedImageFieldFile, self).save(filename, new_content, save)
 
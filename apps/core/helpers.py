@@ -1,18 +1,99 @@
+import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from uuid import uuid4
 
 import requests
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template import Template, TemplateSyntaxError
 from django.template.loader import render_to_string
 
-from apps.core.models import SiteConfig
-from apps.utils.helpers.requests import get_request_parsed_ua_string
+from apps.core.models import SiteConfig, MediaReference, StorageDeletion
+from apps.utils.helpers.django import remove_storage_files
+from apps.utils.helpers.list import chunk_list
+from apps.utils.helpers.mail import get_email_message_data
+from apps.utils.helpers.requests import get_request_parsed_ua_string, check_url_exists
+from apps.utils.helpers.storage import get_storage_alias_or_none
 
 logger = logging.getLogger('custom')
 
 
+SITE_CONFIG_VERSION_KEY = 'site_config:version'
+SITE_CONFIG_SNAPSHOT_KEY = 'site_config:snapshot:{version}'
+
+_site_config_local = {
+    'version': None,
+    'snapshot': None,
+    'checked_at': 0.0,
+}
+
+
+def load_site_config_or_none():
+    """
+    Returns the active site config from the database, with its site, navigation links and reCAPTCHA config preloaded.
+    """
+    return SiteConfig.objects \
+        .filter(is_active=True) \
+        .select_related('site', 'config_google_recaptcha') \
+        .prefetch_related('navigation_link', 'navigation_link__child') \
+        .last()
+
+
+def get_site_config_version():
+    version = cache.get(SITE_CONFIG_VERSION_KEY)
+
+    if version is None:
+        version = uuid4().hex
+        # add() so concurrent processes agree on a single version
+        if not cache.add(SITE_CONFIG_VERSION_KEY, version, settings.SITE_CONFIG_CACHE_TIMEOUT):
+            version = cache.get(SITE_CONFIG_VERSION_KEY, version)
+
+    return version
+
+
 def get_site_config_or_none():
-    return SiteConfig.objects.filter(is_active=True).last()
+    """
+    Returns a snapshot of the active site config.
+
+    The snapshot is kept in the process for SITE_CONFIG_LOCAL_TTL seconds, after which its version is checked against
+    the shared cache. A new version is loaded from the shared cache, or from the database on a miss.
+    """
+    now = time.monotonic()
+
+    if _site_config_local['version'] and now - _site_config_local['checked_at'] < settings.SITE_CONFIG_LOCAL_TTL:
+        return _site_config_local['snapshot']
+
+    version = get_site_config_version()
+
+    if version != _site_config_local['version']:
+        snapshot_key = SITE_CONFIG_SNAPSHOT_KEY.format(version=version)
+        cached = cache.get(snapshot_key)
+
+        if cached is None:
+            cached = {'site_config': load_site_config_or_none()}
+            cache.set(snapshot_key, cached, settings.SITE_CONFIG_CACHE_TIMEOUT)
+
+        _site_config_local['snapshot'] = cached['site_config']
+        _site_config_local['version'] = version
+
+    _site_config_local['checked_at'] = now
+
+    return _site_config_local['snapshot']
+
+
+def invalidate_site_config_cache():
+    """
+    Replaces the site config version, so every process loads a new snapshot within SITE_CONFIG_LOCAL_TTL seconds.
+    """
+    cache.set(SITE_CONFIG_VERSION_KEY, uuid4().hex, settings.SITE_CONFIG_CACHE_TIMEOUT)
+    _site_config_local['version'] = None
 
 
 def get_maintenance_mode_or_false():
@@ -83,7 +164,40 @@ def dispatch_email(email, email_type, email_data):
 
         email.attach_alternative(body_html, 'text/html')
 
-        email.send()
+        send_email_messages([email])
+
+
+def queue_email_messages(messages):
+    """
+    Queues the given serialized messages to `task_send_emails`, in batches of EMAIL_QUEUE_BATCH_SIZE.
+    """
+    from apps.core.tasks import task_send_emails
+
+    for batch in chunk_list(messages, settings.EMAIL_QUEUE_BATCH_SIZE):
+        task_send_emails.apply_async(args=(batch,), queue=settings.EMAIL_QUEUE_NAME)
+
+
+def send_email_messages(email_messages):
+    """
+    Sends the given rendered email messages and returns the number of messages sent or queued.
+
+    With the EMAIL_QUEUE_ENABLED setting, messages are queued to a Celery worker once the transaction commits, so the
+    request does not wait on the mail service. Messages with attachments are always sent right away.
+    """
+    if not settings.EMAIL_QUEUE_ENABLED:
+        return get_connection().send_messages(email_messages)
+
+    messages = [get_email_message_data(message) for message in email_messages if not message.attachments]
+    num_sent = len(messages)
+
+    if messages:
+        transaction.on_commit(partial(queue_email_messages, messages))
+
+    attached = [message for message in email_messages if message.attachments]
+    if attached:
+        num_sent += get_connection().send_messages(attached)
+
+    return num_sent
 
 
 def check_request_ua_supported(request):
@@ -113,3 +227,191 @@ def check_request_ua_supported(request):
                 logging.error(e)
 
     return result
+
+
+def check_media_reference_exists(name, instance=None):
+    return MediaReference.objects.is_referenced(name, instance=instance)
+
+
+def get_referenced_media_names(names):
+    return MediaReference.objects.referenced_names(names)
+
+
+STORAGE_DELETION_FLUSH_KEY = 'storage_deletion:flush'
+
+
+def schedule_storage_deletion_flush():
+    """
+    Queues a flush of the storage deletion outbox, at most once per STORAGE_DELETION_FLUSH_DELAY seconds, so the files
+    dropped by many requests are removed in one batch.
+    """
+    from apps.core.tasks import task_flush_storage_deletions
+
+    delay = settings.STORAGE_DELETION_FLUSH_DELAY
+    if cache.add(STORAGE_DELETION_FLUSH_KEY, 1, delay):
+        task_flush_storage_deletions.apply_async(countdown=delay)
+
+
+def queue_storage_deletions(names, storage=default_storage, check_reference=True):
+    """
+    Writes the given files to the storage deletion outbox in the current transaction, and schedules a flush once it
+    commits. Files of a storage that is not in the STORAGES setting are removed in the process after the commit.
+    """
+    alias = get_storage_alias_or_none(storage)
+
+    if alias is None:
+        transaction.on_commit(partial(remove_storage_files, names, storage, check_reference))
+        return
+
+    StorageDeletion.objects.bulk_create([
+        StorageDeletion(storage=alias, name=name, check_reference=check_reference) for name in names
+    ], batch_size=1000)
+
+    transaction.on_commit(schedule_storage_deletion_flush)
+
+
+class CompiledTemplateCache:
+    """
+    Bounded LRU cache of templates compiled from strings, keyed by a hash of their content.
+
+    The cache is limited both in number of templates and in total content size, and keeps hit/miss stats. Content with
+    a syntax error is cached as None, so it is not parsed again on every render.
+    """
+
+    def __init__(self, max_size=256, max_content_size=4 * 1024 * 1024):
+        self.max_size = max_size
+        self.max_content_size = max_content_size
+        self.templates = OrderedDict()
+        self.content_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get_template_or_none(self, content):
+        key = hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+        with self.lock:
+            if key in self.templates:
+                self.templates.move_to_end(key)
+                self.hits += 1
+                return self.templates[key][0]
+
+            self.misses += 1
+
+        try:
+            template = Template(content)
+        except TemplateSyntaxError as e:
+            logger.warning(f"CompiledTemplateCache: {e}")
+            template = None
+
+        if len(content) > self.max_content_size:
+            return template
+
+        with self.lock:
+            if key not in self.templates:
+                self.templates[key] = (template, len(content))
+                self.content_size += len(content)
+
+            while len(self.templates) > self.max_size or self.content_size > self.max_content_size:
+                _, (_, size) = self.templates.popitem(last=False)
+                self.content_size -= size
+
+        return template
+
+    def clear(self):
+        with self.lock:
+            self.templates.clear()
+            self.content_size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.templates),
+                'max_size': self.max_size,
+                'content_size': self.content_size,
+                'max_content_size': self.max_content_size,
+            }
+
+
+compiled_template_cache = CompiledTemplateCache(
+    max_size=settings.RENDER_TEMPLATE_CACHE_SIZE,
+    max_content_size=settings.RENDER_TEMPLATE_CACHE_MAX_CONTENT_SIZE,
+)
+
+
+EXISTS_CACHE_KEY = 'exists:{kind}:{digest}'
+EXISTS_REFRESH_KEY = 'exists:refresh:{kind}:{digest}'
+
+
+def get_exists_cache_keys(kind, target):
+    digest = hashlib.md5(target.encode()).hexdigest()
+    return EXISTS_CACHE_KEY.format(kind=kind, digest=digest), EXISTS_REFRESH_KEY.format(kind=kind, digest=digest)
+
+
+def set_cached_exists(kind, target, exists):
+    key, _ = get_exists_cache_keys(kind, target)
+
+    # entries outlive their TTL, so a stale result can be served while it is refreshed
+    cache.set(key, {'exists': exists, 'checked_at': time.time()}, settings.EXISTS_CACHE_TIMEOUT * 2)
+
+
+def get_cached_exists(kind, target, task_args):
+    """
+    Returns the cached existence of the target, without blocking on a network check.
+
+    Missing and stale entries are refreshed in the background by `task_refresh_exists`. Until the first check is
+    done, EXISTS_CACHE_MISS_DEFAULT is returned. Negative results are rechecked after EXISTS_CACHE_NEGATIVE_TIMEOUT.
+    """
+    key, refresh_key = get_exists_cache_keys(kind, target)
+    entry = cache.get(key)
+
+    if entry is not None:
+        timeout = settings.EXISTS_CACHE_TIMEOUT if entry['exists'] else settings.EXISTS_CACHE_NEGATIVE_TIMEOUT
+        if time.time() - entry['checked_at'] < timeout:
+            return entry['exists']
+
+    # only one refresh is queued per target at a time
+    if cache.add(refresh_key, True, settings.EXISTS_CACHE_NEGATIVE_TIMEOUT):
+        from apps.core.tasks import task_refresh_exists
+
+        try:
+            task_refresh_exists.delay(kind, target, *task_args)
+        except Exception as e:
+            logger.error(f"get_cached_exists: {e}")
+            cache.delete(refresh_key)
+
+    return entry['exists'] if entry is not None else settings.EXISTS_CACHE_MISS_DEFAULT
+
+
+def refresh_exists(kind, target, storage=None):
+    """
+    Checks the existence of the target and caches the result.
+    """
+    if kind == 'url':
+        exists = check_url_exists(target)
+    else:
+        exists = storage.exists(target)
+
+    set_cached_exists(kind, target, exists)
+    cache.delete(get_exists_cache_keys(kind, target)[1])
+
+    return exists
+
+
+def get_url_exists(url):
+    return get_cached_exists('url', url, ())
+
+
+def get_file_exists(field_file):
+    """
+    Checks whether the file of the given field file exists. Local storage is checked directly, remote storage through
+    the existence cache.
+    """
+    if isinstance(field_file.storage, FileSystemStorage):
+        return field_file.storage.exists(field_file.name)
+
+    return get_cached_exists('file', field_file.name, (field_file.instance._meta.label, field_file.field.name))
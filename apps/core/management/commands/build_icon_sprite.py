@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import re
+from copy import deepcopy
+from xml.etree import ElementTree
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.utils import get_app_template_dirs
+
+from apps.core.sprite import get_heroicon_sprite_id, get_svg_icon_sprite_id, ICON_SPRITE_PATH, \
+    ICON_SPRITE_LOOKUP_PATH
+from apps.core.templatetags.heroicons.helpers import _load_icon, IconDoesNotExist
+from apps.core.templatetags.svg_icon.helpers import load_path
+
+HEROICON_REGEX = re.compile(r"""\{%\s*heroicon_(outline|solid|mini)\s+(['"])([\w-]+)\2""")
+SVG_ICON_REGEX = re.compile(r"""\{%\s*svg_icon\s+(['"])(\w+)\1\s+(['"])([\w-]+)\3""")
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def get_template_dirs():
+    dirs = []
+    for engine in settings.TEMPLATES:
+        dirs += [str(d) for d in engine.get('DIRS', [])]
+
+    dirs += [str(d) for d in get_app_template_dirs('templates')]
+
+    return dirs
+
+
+def find_icon_usages(template_dirs):
+    """
+    Returns the set of ('heroicon' or 'svg_icon', style or type, name) used with literal names in the templates.
+    """
+    usages = set()
+
+    for template_dir in template_dirs:
+        for root, dirs, files in os.walk(template_dir):
+            for name in files:
+                if not name.endswith(TEMPLATE_EXTENSIONS):
+                    continue
+
+                with open(os.path.join(root, name), encoding='utf-8', errors='ignore') as f:
+                    content = f.read()
+
+                for match in HEROICON_REGEX.finditer(content):
+                    usages.add(('heroicon', match.group(1), match.group(3)))
+
+                for match in SVG_ICON_REGEX.finditer(content):
+                    usages.add(('svg_icon', match.group(2), match.group(4)))
+
+    return usages
+
+
+def build_heroicon_symbol(icon_style, icon_name):
+    svg = _load_icon(icon_style, icon_name)
+    icon_id = get_heroicon_sprite_id(icon_style, icon_name)
+
+    symbol = ElementTree.Element('symbol', {'id': icon_id, 'viewBox': svg.attrib.get('viewBox', '0 0 24 24')})
+    for child in svg:
+        symbol.append(deepcopy(child))
+
+    # the root attributes are set on the referencing svg tag, so they can be overridden by the tag arguments
+    attrs = {key: value for key, value in svg.attrib.items() if key not in ('viewBox', 'xmlns')}
+
+    return icon_id, ElementTree.tostring(symbol, encoding='unicode'), {'viewBox': symbol.attrib['viewBox'], 'attrs': attrs}
+
+
+def build_svg_icon_symbol(icon_type, icon_name):
+    path = load_path(icon_type, icon_name)
+    if path is None:
+        raise IconDoesNotExist(f"The icon {icon_name!r} with type {icon_type!r} does not exist.")
+
+    icon_id = get_svg_icon_sprite_id(icon_type, icon_name)
+
+    symbol = ElementTree.Element('symbol', {'id': icon_id, 'viewBox': '0 0 24 24'})
+    ElementTree.SubElement(symbol, 'path', {'d': path})
+
+    return icon_id, ElementTree.tostring(symbol, encoding='unicode'), {'viewBox': '0 0 24 24', 'attrs': {}}
+
+
+class Command(BaseCommand):
+    help = "Build an SVG sprite of the icons used in templates, with its lookup file"
+
+    verbosity = 1
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('-i', '--icon',
+                            dest='icons',
+                            action='append',
+                            default=[],
+                            help='Also add the given icon (heroicon:style:name or svg_icon:type:name), can use multiple '
+                                 '--icon')
+
+        parser.add_argument('-o', '--output-dir',
+                            dest='output_dir',
+                            default=os.path.join(settings.BASE_DIR, 'static'),
+                            help='Static dir the sprite and lookup file are written to')
+
+        parser.add_argument('-n', '--dry-run',
+                            dest='dry_run',
+                            action='store_true',
+                            default=False,
+                            help='Only list the icons found')
+
+    def info(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def debug(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(message)
+
+    def handle(self, *args, **options):
+
+        if 'verbosity' in options:
+            self.verbosity = options['verbosity']
+
+        usages = find_icon_usages(get_template_dirs())
+
+        for icon in options['icons']:
+            try:
+                kind, style, name = icon.split(':')
+            except ValueError:
+                raise CommandError(f"Invalid --icon value: {icon}")
+
+            if kind not in ('heroicon', 'svg_icon'):
+                raise CommandError(f"Invalid --icon value: {icon}")
+
+            usages.add((kind, style, name))
+
+        for usage in sorted(usages):
+            self.debug(':'.join(usage))
+
+        self.info(f"Icons found: {len(usages)}")
+
+        if options['dry_run']:
+            self.info('Dry run. Exit.')
+            return
+
+        symbols = []
+        icons = {}
+
+        for kind, style, name in sorted(usages):
+            try:
+                if kind == 'heroicon':
+                    icon_id, symbol, lookup = build_heroicon_symbol(style, name)
+                else:
+                    icon_id, symbol, lookup = build_svg_icon_symbol(style, name)
+            except IconDoesNotExist as e:
+                self.stderr.write(str(e))
+                continue
+
+            symbols.append(symbol)
+            icons[icon_id] = lookup
+
+        sprite = '<svg xmlns="http://www.w3.org/2000/svg">{}</svg>'.format(''.join(symbols))
+        lookup = {
+            'version': hashlib.sha256(sprite.encode()).hexdigest()[:12],
+            'icons': icons,
+        }
+
+        sprite_path = os.path.join(options['output_dir'], ICON_SPRITE_PATH)
+        lookup_path = os.path.join(options['output_dir'], ICON_SPRITE_LOOKUP_PATH)
+        os.makedirs(os.path.dirname(sprite_path), exist_ok=True)
+
+        with open(sprite_path, 'w') as f:
+            f.write(sprite)
+
+        with open(lookup_path, 'w') as f:
+            json.dump(lookup, f, separators=(',', ':'))
+
+        self.info(f"Done. Total icons in sprite: {len(icons)}, written to {sprite_path}")
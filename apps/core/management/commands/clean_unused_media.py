@@ -4,14 +4,19 @@
 
 import os
 import re
+import sqlite3
+import tempfile
 import time
 
 from django.apps import apps
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
 from django.core.management.base import BaseCommand
-from django.core.validators import EMPTY_VALUES
 from django.db import models
 
+from apps.core.models import MediaReference, get_media_reference_models
+from apps.utils.helpers.storage import iter_storage_files, delete_storage_files
+
 
 def get_all_model_file_fields():
     all_models = apps.get_models()
@@ -25,75 +30,149 @@ def get_all_model_file_fields():
     return fields
 
 
-def get_all_media(exclude=None, minimum_file_age=None):
-    if not exclude:
-        exclude = []
+def get_exclude_regex(exclude=None):
+    """
+    Compiles the exclude masks (only * is supported) into a single regex, or returns None if there are no masks.
+    """
+    masks = list(getattr(settings, 'MEDIA_CLEAN_EXCLUDE', [])) + list(exclude or [])
+    if not masks:
+        return None
+
+    return re.compile('|'.join(r'(?:%s)' % re.escape(e).replace('\\*', '.*') for e in masks) + '$')
+
+
+def iter_used_media(chunk_size=2000, fields=None):
+    """
+    Yields the names of all files referenced by a file field, or by the given fields, streamed from the database.
+    """
+    for field in get_all_model_file_fields() if fields is None else fields:
+
+        is_null = {
+            '%s__isnull' % field.name: True,
+        }
+
+        is_empty = {
+            '%s' % field.name: '',
+        }
+
+        yield from field.model._base_manager \
+            .values_list(field.name, flat=True) \
+            .exclude(**is_empty).exclude(**is_null) \
+            .iterator(chunk_size=chunk_size)
+
+
+def iter_indexed_media(chunk_size=2000):
+    """
+    Yields the names of all files in the media reference index, and the files of the models left out of the index,
+    which are scanned.
+    """
+    yield from MediaReference.objects.values_list('name', flat=True).iterator(chunk_size=chunk_size)
+
+    indexed_models = set(get_media_reference_models())
+    fields = [field for field in get_all_model_file_fields() if field.model not in indexed_models]
+
+    yield from iter_used_media(chunk_size=chunk_size, fields=fields)
+
 
-    media = set()
+def iter_all_media(storage, exclude=None, minimum_file_age=None, workers=8):
+    """
+    Yields the names of all files in the storage, skipping excluded files and files younger than `minimum_file_age`.
+    """
+    exclude_regex = get_exclude_regex(exclude)
     initial_time = time.time()
 
-    for root, dirs, files in os.walk(str(settings.MEDIA_ROOT)):
+    for name, modified_time in iter_storage_files(storage, workers=workers):
+        if exclude_regex and exclude_regex.match(name):
+            continue
 
-        for name in files:
-            path = os.path.abspath(os.path.join(root, name))
-            relpath = os.path.relpath(path, settings.MEDIA_ROOT)
+        if minimum_file_age:
+            if modified_time is None:
+                modified_time = storage.get_modified_time(name)
 
-            if minimum_file_age:
-                file_age = initial_time - os.path.getmtime(path)
-                if file_age < minimum_file_age:
-                    continue
+            if initial_time - modified_time.timestamp() < minimum_file_age:
+                continue
 
-            for e in exclude:
-                if re.match(r'^%s$' % re.escape(e).replace('\\*', '.*'), relpath):
-                    break
-            else:
-                media.add(path)
+        yield name
 
-    return media
 
+class MediaIndex:
+    """
+    On-disk index of stored and used media names, so neither side has to be held in memory.
 
-def get_used_media():
-    media = set()
+    A sorted merge is not used as database collation and storage listing order do not necessarily agree.
+    """
 
-    for field in get_all_model_file_fields():
+    def __init__(self, batch_size=2000):
+        self.batch_size = batch_size
+        self.tmp_dir = tempfile.TemporaryDirectory(prefix='clean_unused_media_')
+        self.connection = sqlite3.connect(os.path.join(self.tmp_dir.name, 'index.sqlite3'))
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.execute('CREATE TABLE used (name TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.connection.execute('CREATE TABLE stored (name TEXT PRIMARY KEY) WITHOUT ROWID')
 
-        is_null = {
-            '%s__isnull' % field.name: True,
-        }
+    def __enter__(self):
+        return self
 
-        is_empty = {
-            '%s' % field.name: '',
-        }
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+        self.tmp_dir.cleanup()
+
+    def add(self, table, names):
+        batch = []
+        for name in names:
+            batch.append((name,))
+
+            if len(batch) >= self.batch_size:
+                self.connection.executemany(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', batch)
+                batch = []
+
+        if batch:
+            self.connection.executemany(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', batch)
+
+        self.connection.commit()
 
-        storage = field.storage
+    def count_unused(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM stored WHERE name NOT IN (SELECT name FROM used)'
+        ).fetchone()[0]
 
-        for value in field.model._base_manager \
-                .values_list(field.name, flat=True) \
-                .exclude(**is_empty).exclude(**is_null):
+    def iter_unused(self):
+        cursor = self.connection.execute(
+            'SELECT name FROM stored WHERE name NOT IN (SELECT name FROM used) ORDER BY name'
+        )
 
-            if value not in EMPTY_VALUES:
-                media.add(storage.path(value))
+        for name, in cursor:
+            yield name
 
-    return media
 
+def get_unused_media_index(storage, exclude=None, minimum_file_age=None, workers=8, batch_size=2000, use_index=False):
+    index = MediaIndex(batch_size=batch_size)
 
-def get_unused_media(exclude=None, minimum_file_age=None):
-    if not exclude:
-        exclude = []
+    try:
+        if use_index:
+            index.add('used', iter_indexed_media(chunk_size=batch_size))
+        else:
+            index.add('used', iter_used_media(chunk_size=batch_size))
 
-    all_media = get_all_media(exclude, minimum_file_age)
-    used_media = get_used_media()
+        index.add('stored', iter_all_media(storage, exclude, minimum_file_age, workers))
+    except Exception:
+        index.close()
+        raise
 
-    return all_media - used_media
+    return index
 
 
-def remove_media(files):
-    for filename in files:
-        os.remove(os.path.join(settings.MEDIA_ROOT, filename))
+def remove_media(storage, files, batch_size=1000, workers=8):
+    return delete_storage_files(storage, files, batch_size=batch_size, workers=workers)
 
 
-def remove_unused_media():
-    remove_media(get_unused_media())
+def remove_unused_media(storage, **kwargs):
+    with get_unused_media_index(storage, **kwargs) as index:
+        return remove_media(storage, index.iter_unused())
 
 
 def remove_empty_dirs(path=None):
@@ -145,7 +224,32 @@ class Command(BaseCommand):
                             dest='remove_empty_dirs',
                             action='store_true',
                             default=False,
-                            help='Remove empty dirs after files cleanup')
+                            help='Remove empty dirs after files cleanup (file system storage only)')
+
+        parser.add_argument('-s', '--storage',
+                            dest='storage',
+                            default='default',
+                            help='Alias of the storage to clean, as configured in STORAGES')
+
+        parser.add_argument('-w', '--workers',
+                            dest='workers',
+                            default=8,
+                            type=int,
+                            help='Number of threads used to list and delete files')
+
+        parser.add_argument('-b', '--batch-size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help='Number of files per database chunk and delete request')
+
+        parser.add_argument('--use-index',
+                            dest='use_index',
+                            action='store_true',
+                            default=False,
+                            help='Read references from the media reference index instead of scanning all file fields. '
+                                 'The index misses writes that send no signals (bulk_create, update(), raw SQL), '
+                                 'run run_backfill_media_reference first if other models were written that way')
 
         parser.add_argument('-n', '--dry-run',
                             dest='dry_run',
@@ -161,48 +265,60 @@ class Command(BaseCommand):
         if self.verbosity > 1:
             self.stdout.write(message)
 
-    def _show_files_to_delete(self, unused_media):
+    def _show_files_to_delete(self, index, total):
         self.debug('Files to remove:')
 
-        for f in unused_media:
-            self.debug(f)
+        if self.verbosity > 1:
+            for f in index.iter_unused():
+                self.debug(f)
 
-        self.info('Total files will be removed: {}'.format(len(unused_media)))
+        self.info('Total files will be removed: {}'.format(total))
 
     def handle(self, *args, **options):
 
         if 'verbosity' in options:
             self.verbosity = options['verbosity']
 
-        unused_media = get_unused_media(
+        storage = storages[options['storage']]
+        workers = max(options['workers'], 1)
+        batch_size = max(options['batch_size'], 1)
+
+        with get_unused_media_index(
+            storage,
             exclude=options.get('exclude'),
             minimum_file_age=options.get('minimum_file_age'),
-        )
+            workers=workers,
+            batch_size=batch_size,
+            use_index=options.get('use_index'),
+        ) as index:
 
-        if not unused_media:
-            self.info('Nothing to delete. Exit')
-            return
+            total = index.count_unused()
 
-        if options.get('dry_run'):
-            self._show_files_to_delete(unused_media)
-            self.info('Dry run. Exit.')
-            return
+            if not total:
+                self.info('Nothing to delete. Exit')
+                return
 
-        if options.get('interactive'):
-            self._show_files_to_delete(unused_media)
+            if options.get('dry_run'):
+                self._show_files_to_delete(index, total)
+                self.info('Dry run. Exit.')
+                return
 
-            # ask user
-            question = 'Are you sure you want to remove {} unused files? (y/N)'.format(len(unused_media))
+            if options.get('interactive'):
+                self._show_files_to_delete(index, total)
 
-            if input(question).upper() != 'Y':
-                self.info('Interrupted by user. Exit.')
-                return
+                # ask user
+                question = 'Are you sure you want to remove {} unused files? (y/N)'.format(total)
 
-        for f in unused_media:
-            self.debug('Remove %s' % f)
-            os.remove(os.path.join(settings.MEDIA_ROOT, f))
+                if input(question).upper() != 'Y':
+                    self.info('Interrupted by user. Exit.')
+                    return
+
+            removed = remove_media(storage, index.iter_unused(), batch_size=batch_size, workers=workers)
 
         if options.get('remove_empty_dirs'):
-            remove_empty_dirs()
+            if isinstance(storage, FileSystemStorage):
+                remove_empty_dirs(storage.location)
+            else:
+                self.info('Empty dirs are only removed on file system storage.')
 
-        self.info('Done. Total files removed: {}'.format(len(unused_media)))
+        self.info('Done. Total files removed: {}'.format(removed))
@@ -0,0 +1,63 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from apps.core.models import MediaReference, get_media_reference_models
+
+
+class Command(BaseCommand):
+    help = "Backfill the media reference index from the file fields of all models"
+
+    verbosity = 1
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('-m', '--model',
+                            dest='models',
+                            action='append',
+                            default=[],
+                            help='Only backfill the given model (app_label.ModelName), can use multiple --model')
+
+        parser.add_argument('-b', '--batch-size',
+                            dest='batch_size',
+                            default=1000,
+                            type=int,
+                            help='Number of instances reconciled per batch')
+
+        parser.add_argument('--clear',
+                            dest='clear',
+                            action='store_true',
+                            default=False,
+                            help='Remove the existing references of the models before the backfill')
+
+    def info(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def handle(self, *args, **options):
+
+        if 'verbosity' in options:
+            self.verbosity = options['verbosity']
+
+        file_models = get_media_reference_models()
+
+        if options['models']:
+            labels = {label.lower() for label in options['models']}
+            file_models = [model for model in file_models if model._meta.label_lower in labels]
+
+        if not file_models:
+            self.info('No models to backfill. Exit')
+            return
+
+        batch_size = max(options['batch_size'], 1)
+        totals = [0, 0, 0]
+
+        for model in file_models:
+            if options['clear']:
+                MediaReference.objects.filter(content_type=ContentType.objects.get_for_model(model)).delete()
+
+            created, updated, removed = MediaReference.objects.backfill(model, batch_size=batch_size)
+            totals = [total + count for total, count in zip(totals, (created, updated, removed))]
+
+            self.info(f"{model._meta.label}: {created} references created, {updated} updated, {removed} removed")
+
+        self.info('Done. Total references created: {}, updated: {}, removed: {}'.format(*totals))
@@ -0,0 +1,220 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def init_worker():
+    import django
+    django.setup()
+
+
+def rebuild_image(label, pk):
+    """
+    Renders the images of a single instance again. Runs in a worker process.
+    """
+    from apps.attachment.models import ImageAttachment
+
+    model = apps.get_model(label)
+    instance = model._base_manager.filter(pk=pk).first()
+    if not instance:
+        return pk, None
+
+    try:
+        if isinstance(instance, ImageAttachment):
+            instance.rebuild_image_out()
+        elif instance.process_image_out_fields() is False:
+            return pk, 'some resized images failed, see image_out_status'
+    except Exception as e:
+        return pk, str(e)
+
+    return pk, None
+
+
+def get_image_models():
+    from apps.attachment.models import ImageAttachment
+    from apps.utils.mixins.models.atoms import ResizeImageSaveMixin
+
+    return [
+        model for model in apps.get_models()
+        if issubclass(model, (ResizeImageSaveMixin, ImageAttachment))
+    ]
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise CommandError(f"Invalid --since value: {value}")
+
+        since = datetime(date.year, date.month, date.day)
+
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+
+    return since
+
+
+class Command(BaseCommand):
+    help = "Render the images of all models using ResizeImageSaveMixin or ImageAttachment again"
+
+    verbosity = 1
+
+    def add_arguments(self, parser):
+
+        parser.add_argument('-m', '--model',
+                            dest='models',
+                            action='append',
+                            default=[],
+                            help='Only rebuild the given model (app_label.ModelName), can use multiple --model')
+
+        parser.add_argument('--since',
+                            dest='since',
+                            default=None,
+                            help='Only rebuild instances modified since the given date or datetime')
+
+        parser.add_argument('-w', '--workers',
+                            dest='workers',
+                            default=os.cpu_count() or 1,
+                            type=int,
+                            help='Number of worker processes')
+
+        parser.add_argument('-b', '--batch-size',
+                            dest='batch_size',
+                            default=100,
+                            type=int,
+                            help='Number of instances per batch, a checkpoint is written after each batch')
+
+        parser.add_argument('--checkpoint',
+                            dest='checkpoint',
+                            default=os.path.join(settings.BASE_DIR, 'logs', 'run_rebuild_images.json'),
+                            help='Path of the checkpoint file')
+
+        parser.add_argument('--resume',
+                            dest='resume',
+                            action='store_true',
+                            default=False,
+                            help='Resume from the checkpoint file')
+
+        parser.add_argument('-n', '--dry-run',
+                            dest='dry_run',
+                            action='store_true',
+                            default=False,
+                            help='Only count the instances to rebuild')
+
+    def info(self, message):
+        if self.verbosity > 0:
+            self.stdout.write(message)
+
+    def load_checkpoint(self, path):
+        if not os.path.exists(path):
+            return {}
+
+        with open(path) as f:
+            return json.load(f)
+
+    def save_checkpoint(self, path, checkpoint):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+
+        os.replace(tmp_path, path)
+
+    def get_queryset(self, model, since, last_pk):
+        queryset = model._base_manager.all()
+
+        if since:
+            field_names = [f.name for f in model._meta.fields]
+            if 'modified_at' in field_names:
+                queryset = queryset.filter(modified_at__gte=since)
+            else:
+                self.info(f"{model._meta.label}: no modified_at field, --since ignored")
+
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+
+        return queryset.order_by('pk')
+
+    def iter_batches(self, queryset, batch_size):
+        batch = []
+        for pk in queryset.values_list('pk', flat=True).iterator(chunk_size=batch_size):
+            batch.append(pk)
+
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    def handle(self, *args, **options):
+
+        if 'verbosity' in options:
+            self.verbosity = options['verbosity']
+
+        image_models = get_image_models()
+
+        if options['models']:
+            labels = {label.lower() for label in options['models']}
+            image_models = [model for model in image_models if model._meta.label_lower in labels]
+
+        if not image_models:
+            self.info('No models to rebuild. Exit')
+            return
+
+        since = parse_since(options['since']) if options['since'] else None
+        batch_size = max(options['batch_size'], 1)
+        checkpoint_path = options['checkpoint']
+        checkpoint = self.load_checkpoint(checkpoint_path) if options['resume'] else {}
+
+        if options['dry_run']:
+            for model in image_models:
+                label = model._meta.label
+                queryset = self.get_queryset(model, since, checkpoint.get(label, None))
+                self.info(f"{label}: {queryset.count()} instances to rebuild")
+
+            self.info('Dry run. Exit.')
+            return
+
+        executor = ProcessPoolExecutor(
+            max_workers=max(options['workers'], 1),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker
+        )
+
+        total_done = 0
+        total_failed = 0
+
+        with executor:
+            for model in image_models:
+                label = model._meta.label
+                queryset = self.get_queryset(model, since, checkpoint.get(label, None))
+
+                total = queryset.count()
+                done = 0
+
+                self.info(f"{label}: {total} instances to rebuild")
+
+                for batch in self.iter_batches(queryset, batch_size):
+                    for pk, error in executor.map(rebuild_image, [label] * len(batch), batch):
+                        if error:
+                            total_failed += 1
+                            self.stderr.write(f"{label} {pk}: {error}")
+
+                    done += len(batch)
+                    total_done += len(batch)
+
+                    checkpoint[label] = batch[-1]
+                    self.save_checkpoint(checkpoint_path, checkpoint)
+
+                    self.info(f"{label}: {done}/{total}")
+
+        self.info('Done. Total instances rebuilt: {}, failed: {}'.format(total_done - total_failed, total_failed))
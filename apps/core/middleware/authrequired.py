@@ -1,10 +1,9 @@
-import re
-
-from django.core.exceptions import MiddlewareNotUsed
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from apps.core.helpers import get_auth_required_or_false
+from apps.core.middleware.routematcher import get_route_matcher
 
 
 class AuthRequiredMiddleware:
@@ -17,27 +16,22 @@ class AuthRequiredMiddleware:
         r'^/account/password-reset-complete/$',
         r'^/account/password-change-done/$',
         r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/(?P<token>[0-9A-Za-z]{1,13}-[0-9A-Za-z]{1,36})/$',
-        r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/set-password/$'
+        r'^/account/reset/(?P<uidb64>[0-9A-Za-z_\-]+)/set-password/$',
         r'^/maintenance/$',
     ]
 
     def __init__(self, get_response):
         self.get_response = get_response
 
-        if not get_auth_required_or_false():
-            raise MiddlewareNotUsed
+        self.route_matcher = get_route_matcher(
+            tuple(getattr(settings, 'AUTH_REQUIRED_ALLOWED_PATTERNS', self.allowed_patterns))
+        )
 
     def __call__(self, request):
-        if not request.user.is_authenticated:
-
-            match = False
-            for pattern in self.allowed_patterns:
-
-                if re.compile(pattern).match(request.path):
-                    match = True
-                    break
+        # the flag is read from the cached site config, so toggling it needs no restart
+        if get_auth_required_or_false() and not request.user.is_authenticated:
 
-            if not match:
+            if not self.route_matcher.match(request.path):
                 return redirect(reverse('account:login'))
 
         return self.get_response(request)
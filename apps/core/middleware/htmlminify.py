@@ -1,7 +1,11 @@
+import hashlib
+
 from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import MiddlewareNotUsed
-from django.utils.encoding import DjangoUnicodeDecodeError
-from django.utils.html import strip_spaces_between_tags as minify_html
+from django.utils.cache import get_max_age
+
+from apps.utils.helpers.html import minify_html_bytes, iter_minified_html
 
 
 class HTMLMinifyMiddleware:
@@ -12,15 +16,47 @@ class HTMLMinifyMiddleware:
         if not settings.HTML_MINIFY_ENABLED:
             raise MiddlewareNotUsed
 
+        self.cache_timeout = getattr(settings, 'HTML_MINIFY_CACHE_TIMEOUT', 0)
+
     def __call__(self, request):
         response = self.get_response(request)
-        if response.has_header('Content-Type') and 'text/html' in response['Content-Type']:
 
-            try:
-                response.content = minify_html(response.content.decode('utf-8', errors='ignore').strip())
-                response['Content-Length'] = str(len(response.content))
+        if 'text/html' not in response.get('Content-Type', ''):
+            return response
+
+        # compressed responses can not be minified, and responses served by the cache middleware already were
+        if response.has_header('Content-Encoding') or getattr(response, 'html_minified', False):
+            return response
+
+        if response.streaming:
+            response.streaming_content = iter_minified_html(response.streaming_content)
+            if response.has_header('Content-Length'):
+                del response['Content-Length']
+
+        else:
+            response.content = self.minify(response)
+            response['Content-Length'] = str(len(response.content))
 
-            except DjangoUnicodeDecodeError:
-                pass
+        response.html_minified = True
 
         return response
+
+    def is_cacheable(self, response):
+        cache_control = response.get('Cache-Control', '')
+        return not response.cookies and 'private' not in cache_control and 'no-store' not in cache_control \
+            and (get_max_age(response) or 0) > 0
+
+    def minify(self, response):
+        content = response.content.strip()
+
+        if not self.cache_timeout or not self.is_cacheable(response):
+            return minify_html_bytes(content)
+
+        key = f"html_minify:{hashlib.blake2b(content, digest_size=16).hexdigest()}"
+        minified = cache.get(key)
+
+        if minified is None:
+            minified = minify_html_bytes(content)
+            cache.set(key, minified, self.cache_timeout)
+
+        return minified
@@ -1,11 +1,10 @@
-import re
-
-from django.core.exceptions import MiddlewareNotUsed
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 
 from apps.account.helpers import is_user_active_staff
 from apps.core.helpers import get_maintenance_mode_or_false
+from apps.core.middleware.routematcher import get_route_matcher
 
 
 class MaintenanceModeMiddleware:
@@ -19,20 +18,15 @@ class MaintenanceModeMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
 
-        if not get_maintenance_mode_or_false():
-            raise MiddlewareNotUsed
+        self.route_matcher = get_route_matcher(
+            tuple(getattr(settings, 'MAINTENANCE_MODE_ALLOWED_PATTERNS', self.allowed_patterns))
+        )
 
     def __call__(self, request):
-        if not is_user_active_staff(request.user):
-
-            match = False
-            for pattern in self.allowed_patterns:
-
-                if re.compile(pattern).match(request.path):
-                    match = True
-                    break
+        # the flag is read from the cached site config, so toggling it needs no restart
+        if get_maintenance_mode_or_false() and not is_user_active_staff(request.user):
 
-            if not match:
+            if not self.route_matcher.match(request.path):
                 return redirect(reverse('maintenance'))
 
         return self.get_response(request)
@@ -0,0 +1,44 @@
+import re
+from functools import lru_cache
+
+# named groups are made non-capturing, so patterns sharing a group name can be joined in one alternation
+NAMED_GROUP_REGEX = re.compile(r'\(\?P<\w+>')
+
+
+class RouteMatcher:
+    """
+    Matches request paths against a list of regex patterns.
+
+    The patterns are compiled once into a single alternation, and results are cached per path in an LRU cache.
+    """
+
+    def __init__(self, patterns, cache_size=1024):
+        self.patterns = tuple(patterns)
+
+        try:
+            self.regex = re.compile('|'.join(
+                r'(?:%s)' % NAMED_GROUP_REGEX.sub('(?:', pattern) for pattern in self.patterns
+            ))
+        except re.error:
+            # patterns using back references to named groups can not be joined, match them one by one instead
+            self.regex = None
+            self.regexes = [re.compile(pattern) for pattern in self.patterns]
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, path):
+        if not self.patterns:
+            return False
+
+        if self.regex is not None:
+            return self.regex.match(path) is not None
+
+        return any(regex.match(path) for regex in self.regexes)
+
+
+@lru_cache(maxsize=None)
+def get_route_matcher(patterns):
+    """
+    Returns the shared route matcher of the given tuple of patterns.
+    """
+    return RouteMatcher(patterns)
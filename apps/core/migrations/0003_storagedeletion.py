@@ -0,0 +1,30 @@
+# Generated by Django 4.2.6 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_mediareference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('modified_at', models.DateTimeField(auto_now=True, verbose_name='Modified at')),
+                ('storage', models.CharField(db_index=True, max_length=100, verbose_name='Storage')),
+                ('name', models.CharField(max_length=255, verbose_name='Name')),
+                ('check_reference', models.BooleanField(default=True, verbose_name='Check reference')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last error')),
+            ],
+            options={
+                'verbose_name': 'Storage Deletion',
+                'verbose_name_plural': 'Storage Deletions',
+            },
+        ),
+    ]
@@ -1,10 +1,21 @@
+import logging
+from functools import lru_cache
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
 from django.contrib.sites.models import Site
+from django.core.files.storage import storages
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.utils.translation import gettext_lazy as _
 
+from apps.utils.helpers.django import remove_storage_files
+from apps.utils.helpers.list import chunk_list
 from apps.utils.mixins.models.atoms import TimestampMixin, TitleMixin, OrderMixin
 
+logger = logging.getLogger('custom')
+
 
 class SiteConfig(TimestampMixin, models.Model):
     site = models.ForeignKey(
@@ -78,3 +89,296 @@ class ConfigGoogleRecaptcha(TimestampMixin, models.Model):
 
     def __str__(self):
         return self.site_config.site.name
+
+
+@lru_cache(maxsize=None)
+def get_model_file_fields(model):
+    """
+    Returns the concrete FileField/ImageField fields of the given model.
+    """
+    return tuple(field for field in model._meta.concrete_fields if isinstance(field, models.FileField))
+
+
+def get_media_reference_models():
+    """
+    Returns the models whose files are tracked in the media reference index: models with file fields, except those
+    that set `media_reference_index = False` because they are written in bulk (bulk_create, update() or raw SQL), which
+    sends no signals.
+    """
+    return [
+        model for model in apps.get_models()
+        if model is not MediaReference and get_model_file_fields(model) and getattr(model, 'media_reference_index', True)
+    ]
+
+
+class MediaReferenceManager(models.Manager):
+
+    def sync(self, instance, field_names=None):
+        """
+        Brings the references of the given instance in line with its file fields. Only changed references are written.
+        """
+        file_fields = [
+            field for field in get_model_file_fields(instance.__class__)
+            if field_names is None or field.name in field_names
+        ]
+
+        if not file_fields:
+            return
+
+        content_type = ContentType.objects.get_for_model(instance)
+        object_id = str(instance.pk)
+
+        stored = dict(
+            self.filter(content_type=content_type, object_id=object_id).values_list('field_name', 'name')
+        )
+
+        for field in file_fields:
+            field_file = getattr(instance, field.attname)
+            name = field_file.name if field_file else ''
+            stored_name = stored.get(field.name, None)
+
+            if name == stored_name:
+                continue
+
+            if not name:
+                self.filter(content_type=content_type, object_id=object_id, field_name=field.name).delete()
+            elif stored_name is None:
+                self.create(content_type=content_type, object_id=object_id, field_name=field.name, name=name)
+            else:
+                self.filter(content_type=content_type, object_id=object_id, field_name=field.name).update(name=name)
+
+    def remove(self, instance):
+        """
+        Removes all references of the given instance.
+        """
+        if not get_model_file_fields(instance.__class__):
+            return
+
+        content_type = ContentType.objects.get_for_model(instance)
+        self.filter(content_type=content_type, object_id=str(instance.pk)).delete()
+
+    def is_referenced(self, name, instance=None):
+        """
+        Checks whether the given file name is referenced by any instance, other than the given instance.
+        """
+        queryset = self.filter(name=name)
+
+        if instance is not None and instance.pk is not None:
+            queryset = queryset.exclude(
+                content_type=ContentType.objects.get_for_model(instance),
+                object_id=str(instance.pk)
+            )
+
+        return queryset.exists()
+
+    def referenced_names(self, names):
+        """
+        Returns the set of the given file names that are referenced by any instance.
+        """
+        return set(self.filter(name__in=names).values_list('name', flat=True).distinct())
+
+    def backfill(self, model, batch_size=1000):
+        """
+        Brings the references of all instances of the given model in line with their file fields, and returns the
+        number of references created, updated and removed.
+
+        The stored references are compared per instance and field, so a re-run also repairs an index that drifted,
+        e.g. through queryset updates. The references of instances that no longer exist are removed.
+        """
+        file_fields = get_model_file_fields(model)
+        if not file_fields:
+            return 0, 0, 0
+
+        content_type = ContentType.objects.get_for_model(model)
+        field_names = [field.attname for field in file_fields]
+        counts = [0, 0, 0]
+        rows = []
+
+        def reconcile(rows):
+            stored = {
+                (object_id, field_name): (pk, name) for pk, object_id, field_name, name in self.filter(
+                    content_type=content_type, object_id__in=[str(values[0]) for values in rows]
+                ).values_list('pk', 'object_id', 'field_name', 'name')
+            }
+
+            references, changed, stale = [], [], []
+
+            for values in rows:
+                object_id = str(values[0])
+
+                for field, name in zip(file_fields, values[1:]):
+                    reference = stored.get((object_id, field.name))
+
+                    if not name:
+                        if reference:
+                            stale.append(reference[0])
+                    elif reference is None:
+                        references.append(
+                            MediaReference(content_type=content_type, object_id=object_id, field_name=field.name,
+                                           name=name)
+                        )
+                    elif reference[1] != name:
+                        changed.append(MediaReference(pk=reference[0], name=name))
+
+            self.bulk_create(references, ignore_conflicts=True)
+            self.bulk_update(changed, ['name'])
+            self.filter(pk__in=stale).delete()
+
+            return len(references), len(changed), len(stale)
+
+        for values in model._base_manager.values_list('pk', *field_names).iterator(chunk_size=batch_size):
+            rows.append(values)
+
+            if len(rows) >= batch_size:
+                counts = [total + count for total, count in zip(counts, reconcile(rows))]
+                rows = []
+
+        if rows:
+            counts = [total + count for total, count in zip(counts, reconcile(rows))]
+
+        created, updated, removed = counts
+
+        return created, updated, removed + self.remove_missing(model, batch_size=batch_size)
+
+    def remove_missing(self, model, batch_size=1000):
+        """
+        Removes the references of the instances of the given model that no longer exist, and returns their number.
+        """
+        content_type = ContentType.objects.get_for_model(model)
+        pk_field = model._meta.pk
+        object_ids = list(
+            self.filter(content_type=content_type).values_list('object_id', flat=True).distinct().order_by()
+        )
+        missing = []
+
+        for batch in chunk_list(object_ids, batch_size):
+            existing = {
+                str(pk) for pk in
+                model._base_manager.filter(pk__in=[pk_field.to_python(object_id) for object_id in batch])
+                .values_list('pk', flat=True)
+            }
+            missing.extend(object_id for object_id in batch if object_id not in existing)
+
+        removed = 0
+        for batch in chunk_list(missing, batch_size):
+            removed += self.filter(content_type=content_type, object_id__in=batch).delete()[0]
+
+        return removed
+
+
+class MediaReference(TimestampMixin, models.Model):
+    """
+    Index of the files referenced by FileField/ImageField fields, kept up to date by post_save/post_delete signals
+    connected for the models of `get_media_reference_models`.
+
+    Queryset updates, bulk operations and raw SQL do not send signals, run `run_backfill_media_reference` after those,
+    or set `media_reference_index = False` on models that are always written in bulk.
+    """
+    objects = MediaReferenceManager()
+
+    content_type = models.ForeignKey(
+        ContentType,
+        related_name='media_reference',
+        verbose_name=_('Content type'),
+        on_delete=models.CASCADE
+    )
+
+    object_id = models.CharField(_('Object ID'), max_length=255)
+    field_name = models.CharField(_('Field name'), max_length=255)
+    name = models.CharField(_('Name'), max_length=255, db_index=True)
+
+    class Meta:
+        verbose_name = "Media Reference"
+        verbose_name_plural = "Media References"
+        unique_together = ('content_type', 'object_id', 'field_name')
+
+    def __str__(self):
+        return self.name
+
+
+class StorageDeletionManager(models.Manager):
+
+    def flush(self, storage, batch_size=1000, max_attempts=5):
+        """
+        Removes the queued files of the given storage alias in batches and returns the number of files removed.
+
+        Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers do not remove the same files.
+        Files that could not be removed, or a whole batch that raised, are kept and retried by a later flush, up to
+        `max_attempts` times. Rows that run out of attempts are logged, and left for the StorageDeletion admin.
+        """
+        total = 0
+        failed_pks = set()
+
+        while True:
+            with transaction.atomic():
+                deletions = list(
+                    self.select_for_update(skip_locked=True)
+                    .filter(storage=storage, attempts__lt=max_attempts)
+                    .exclude(pk__in=failed_pks)
+                    .order_by('pk')[:batch_size]
+                )
+
+                if not deletions:
+                    return total
+
+                pks = [deletion.pk for deletion in deletions]
+                failed = []
+
+                try:
+                    for check_reference in (True, False):
+                        names = [deletion.name for deletion in deletions if deletion.check_reference is check_reference]
+                        if names:
+                            total += remove_storage_files(
+                                names, storages[storage], check_reference=check_reference, failed=failed
+                            )
+                except Exception as e:
+                    self.fail(storage, pks, str(e), max_attempts)
+                    return total
+
+                failed = set(failed)
+                batch_failed_pks = [deletion.pk for deletion in deletions if deletion.name in failed]
+
+                if batch_failed_pks:
+                    self.fail(storage, batch_failed_pks, 'The file could not be removed from the storage.', max_attempts)
+                    failed_pks.update(batch_failed_pks)
+
+                self.filter(pk__in=pks).exclude(pk__in=batch_failed_pks).delete()
+
+    def fail(self, storage, pks, error, max_attempts=5):
+        """
+        Counts a failed attempt for the given rows, and logs the rows that ran out of attempts.
+        """
+        self.filter(pk__in=pks).update(attempts=F('attempts') + 1, last_error=error)
+
+        exhausted = self.filter(pk__in=pks, attempts__gte=max_attempts).count()
+        if exhausted:
+            logger.error(
+                f"StorageDeletionManager.flush: {exhausted} files of the {storage} storage were not removed after "
+                f"{max_attempts} attempts: {error}"
+            )
+
+    def pending_storages(self, max_attempts=5):
+        return self.filter(attempts__lt=max_attempts).values_list('storage', flat=True).distinct().order_by()
+
+
+class StorageDeletion(TimestampMixin, models.Model):
+    """
+    Outbox of the files to remove from the storage.
+
+    Rows are written in the transaction that drops the files, so a rollback keeps them, and are flushed after the commit
+    by `task_flush_storage_deletions`, which removes the files in batches per storage.
+    """
+    objects = StorageDeletionManager()
+
+    storage = models.CharField(_('Storage'), max_length=100, db_index=True)
+    name = models.CharField(_('Name'), max_length=255)
+    check_reference = models.BooleanField(_('Check reference'), default=True)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    last_error = models.TextField(_('Last error'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = "Storage Deletion"
+        verbose_name_plural = "Storage Deletions"
+
+    def __str__(self):
+        return self.name
@@ -1,8 +1,11 @@
 from django.contrib.sites.models import Site
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from apps.core.models import SiteConfig, ConfigGoogleRecaptcha
+from apps.core.helpers import invalidate_site_config_cache
+from apps.core.models import SiteConfig, NavigationLink, ConfigGoogleRecaptcha, MediaReference, \
+    get_media_reference_models
 
 
 @receiver(post_save, sender=Site)
@@ -33,3 +36,33 @@ def post_save_site_config(sender, instance, created, **kwargs):
 
         if obj:
             obj.save()
+
+
+@receiver(post_save, sender=Site)
+@receiver(post_save, sender=SiteConfig)
+@receiver(post_save, sender=NavigationLink)
+@receiver(post_save, sender=ConfigGoogleRecaptcha)
+@receiver(post_delete, sender=Site)
+@receiver(post_delete, sender=SiteConfig)
+@receiver(post_delete, sender=NavigationLink)
+@receiver(post_delete, sender=ConfigGoogleRecaptcha)
+def invalidate_site_config(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_site_config_cache)
+
+
+def post_save_media_reference(sender, instance, update_fields=None, **kwargs):
+    MediaReference.objects.sync(instance, field_names=update_fields)
+
+
+def post_delete_media_reference(sender, instance, **kwargs):
+    MediaReference.objects.remove(instance)
+
+
+def connect_media_reference_signals():
+    """
+    Connects the media reference receivers to the models with file fields only, so deletes of other models keep
+    Django's fast delete path.
+    """
+    for model in get_media_reference_models():
+        post_save.connect(post_save_media_reference, sender=model, dispatch_uid=f"media_reference_{model._meta.label}")
+        post_delete.connect(post_delete_media_reference, sender=model, dispatch_uid=f"media_reference_{model._meta.label}")
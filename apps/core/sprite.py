@@ -0,0 +1,62 @@
+import functools
+import json
+import logging
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+logger = logging.getLogger('custom')
+
+ICON_SPRITE_PATH = 'icons/sprite.svg'
+ICON_SPRITE_LOOKUP_PATH = 'icons/sprite.json'
+
+
+def get_heroicon_sprite_id(icon_style, icon_name):
+    return f"heroicon-{icon_style}-{icon_name}"
+
+
+def get_svg_icon_sprite_id(icon_type, icon_name):
+    return f"svg-icon-{icon_type}-{icon_name}"
+
+
+@functools.lru_cache(maxsize=None)
+def get_icon_sprite_lookup():
+    """
+    Returns the lookup written by the `build_icon_sprite` command, or an empty lookup if the sprite is disabled or was
+    not built. It is read once per process.
+    """
+    if not getattr(settings, 'ICON_SPRITE_ENABLED', False):
+        return {}
+
+    path = finders.find(ICON_SPRITE_LOOKUP_PATH)
+    if not path:
+        logger.warning(f"get_icon_sprite_lookup: {ICON_SPRITE_LOOKUP_PATH} not found, run build_icon_sprite")
+        return {}
+
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_sprite_icon_or_none(icon_id):
+    """
+    Returns the lookup entry (view box and default svg attributes) of the given icon, or None if it is not in the sprite.
+    """
+    return get_icon_sprite_lookup().get('icons', {}).get(icon_id, None)
+
+
+@functools.lru_cache(maxsize=None)
+def get_icon_sprite_href(icon_id):
+    return f"{static(ICON_SPRITE_PATH)}?v={get_icon_sprite_lookup().get('version', '')}#{icon_id}"
+
+
+def render_sprite_icon(icon_id, svg_attrs):
+    """
+    Returns an svg tag referencing the icon of the sprite with `<use href>`.
+    """
+    return format_html(
+        '<svg {}><use href="{}"></use></svg>',
+        format_html_join(' ', '{}="{}"', svg_attrs.items()),
+        get_icon_sprite_href(icon_id)
+    )
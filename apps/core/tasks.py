@@ -1,6 +1,93 @@
+import logging
+import random
+
 from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management import call_command
+
+from apps.core.models import StorageDeletion
+from apps.utils.helpers.mail import get_email_message
+
+logger = logging.getLogger('custom')
 
 
 @shared_task
 def task_run_update():
     pass
+
+
+@shared_task
+def task_clean_unused_media(storage='default', minimum_file_age=60 * 60, remove_empty_dirs=False, use_index=False):
+    call_command(
+        'clean_unused_media',
+        interactive=False,
+        storage=storage,
+        minimum_file_age=minimum_file_age,
+        remove_empty_dirs=remove_empty_dirs,
+        use_index=use_index,
+        verbosity=0
+    )
+
+
+@shared_task
+def task_refresh_exists(kind, target, model_label=None, field_name=None):
+    from apps.core.helpers import refresh_exists
+
+    storage = None
+    if kind == 'file':
+        storage = apps.get_model(model_label)._meta.get_field(field_name).storage
+
+    refresh_exists(kind, target, storage=storage)
+
+
+@shared_task
+def task_flush_storage_deletions(batch_size=1000):
+    """
+    Removes the files queued in the storage deletion outbox, in batches per storage.
+    """
+    max_attempts = settings.STORAGE_DELETION_MAX_ATTEMPTS
+
+    total = 0
+
+    for storage in list(StorageDeletion.objects.pending_storages(max_attempts=max_attempts)):
+        total += StorageDeletion.objects.flush(storage, batch_size=batch_size, max_attempts=max_attempts)
+
+    return total
+
+
+@shared_task(bind=True, max_retries=None)
+def task_send_emails(self, messages):
+    """
+    Sends email messages serialized by `get_email_message_data` over a single connection.
+
+    The messages that could not be sent are retried with exponential backoff, from EMAIL_QUEUE_RETRY_DELAY seconds, up
+    to EMAIL_QUEUE_MAX_RETRIES times. Backends that do not report `failed_messages` are only retried if nothing was sent.
+    """
+    email_messages = [get_email_message(data) for data in messages]
+
+    connection = get_connection(fail_silently=True)
+    num_sent = connection.send_messages(email_messages) or 0
+
+    failed_messages = getattr(connection, 'failed_messages', None)
+    if failed_messages is None:
+        failed_messages = email_messages if not num_sent else []
+
+    # the email log ids set by the backend are kept, so retries do not log the messages again
+    failed_ids = {id(message) for message in failed_messages}
+    failed = [
+        dict(data, email_log_id=getattr(message, 'email_log_id', None))
+        for data, message in zip(messages, email_messages) if id(message) in failed_ids
+    ]
+
+    if failed:
+        if self.request.retries >= settings.EMAIL_QUEUE_MAX_RETRIES:
+            logger.error(f"task_send_emails: {len(failed)} messages not sent after {self.request.retries} retries")
+            return num_sent
+
+        countdown = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** self.request.retries
+        # jitter, so batches throttled together are not retried together
+        raise self.retry(args=(failed,), countdown=countdown * random.uniform(1, 1.5))
+
+    return num_sent
@@ -2,25 +2,57 @@ import re
 
 from django import template
 from django.template import Node
+from django.template.base import TextNode
 from django.utils.encoding import force_str
 
 register = template.Library()
 
+WHITESPACE_REGEX = re.compile(r'\s+')
+TAG_SPACE_REGEX = re.compile(r'(?<=>) | (?=<)')
+
 
 def strip_spaces_in_tags(value):
     value = force_str(value)
-    value = re.sub(r'\s+', ' ', value)
-    value = re.sub(r'>\s+', '>', value)
-    value = re.sub(r'\s+<', '<', value)
+    value = WHITESPACE_REGEX.sub(' ', value)
+    value = TAG_SPACE_REGEX.sub('', value)
     return value
 
 
 class NoSpacesNode(Node):
+    """
+    Text nodes, including the nested ones, are stripped once when the template is compiled. On render, only the output
+    of the other nodes is stripped, and the bits are joined with a fix-up of the whitespace at their seams, so static
+    text is not scanned again.
+    """
+
     def __init__(self, nodelist):
         self.nodelist = nodelist
 
+        for node in nodelist.get_nodes_by_type(TextNode):
+            node.s = strip_spaces_in_tags(node.s)
+
     def render(self, context):
-        return strip_spaces_in_tags(self.nodelist.render(context).strip())
+        bits = []
+
+        for node in self.nodelist:
+            if isinstance(node, TextNode):
+                bit = node.s
+            else:
+                bit = strip_spaces_in_tags(node.render_annotated(context))
+
+            if bits and bit:
+                # the bits are stripped, so a seam can only hold one space next to a tag, or two spaces
+                if bit[0] == ' ' and bits[-1][-1] in '> ':
+                    bit = bit[1:]
+                elif bit[0] == '<' and bits[-1][-1] == ' ':
+                    bits[-1] = bits[-1][:-1]
+                    if not bits[-1]:
+                        bits.pop()
+
+            if bit:
+                bits.append(bit)
+
+        return ''.join(bits).strip()
 
 
 @register.tag
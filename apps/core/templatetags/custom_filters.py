@@ -2,12 +2,10 @@ import decimal
 import re
 from datetime import date, datetime
 
-import requests
 from django import template
-from django.core.files.storage import default_storage
-from django.db import models
+from django.db.models.fields.files import FieldFile
 
-from apps.utils.helpers.requests import get_agent_head_or_default
+from apps.core.helpers import get_url_exists, get_file_exists
 
 register = template.Library()
 
@@ -108,17 +106,15 @@ def divide(value, divisor):
 
 @register.filter
 def file_exists(file):
-    if isinstance(file, models.FileField):
-        return default_storage.exists(file.path)
+    if isinstance(file, FieldFile) and file.name:
+        return get_file_exists(file)
 
     return False
 
 
 @register.filter
 def url_exists(url):
-    if isinstance(url, str):
-        head = get_agent_head_or_default()
-        req = requests.get(url, headers=head, timeout=2)
-        return req.status_code == requests.codes.ok
+    if isinstance(url, str) and url:
+        return get_url_exists(url)
 
     return False
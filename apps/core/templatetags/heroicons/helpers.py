@@ -1,34 +1,33 @@
 import os
 import functools
-from contextlib import closing
 from copy import deepcopy
 from xml.etree import ElementTree
-from zipfile import ZipFile
+
+from apps.core.sprite import get_heroicon_sprite_id, get_sprite_icon_or_none, render_sprite_icon
+from apps.utils.helpers.file import get_mapped_zip_archive
 
 
 class IconDoesNotExist(Exception):
     pass
 
 
-@functools.lru_cache(maxsize=128)
+@functools.lru_cache(maxsize=None)
 def _load_icon(icon_style, icon_name):
     path = os.path.join(os.path.dirname(__file__), 'data/heroicons.zip')
-    if path:
-        f = open(path, 'rb')
-        with closing(ZipFile(f, 'r')) as zip_file:
-            try:
-                svg_bytes = zip_file.read(f"{icon_style}/{icon_name}.svg")
-            except KeyError:
-                raise IconDoesNotExist(
-                    f"The icon {icon_name!r} with style {icon_style!r} does not exist."
-                )
-
-            svg = ElementTree.fromstring(svg_bytes.decode())
-            for node in svg.iter():
-                node.tag = ElementTree.QName(
-                    str.removeprefix(node.tag, '{http://www.w3.org/2000/svg}')
-                )
-            return svg
+
+    try:
+        svg_bytes = get_mapped_zip_archive(path).read(f"{icon_style}/{icon_name}.svg")
+    except KeyError:
+        raise IconDoesNotExist(
+            f"The icon {icon_name!r} with style {icon_style!r} does not exist."
+        )
+
+    svg = ElementTree.fromstring(svg_bytes.decode())
+    for node in svg.iter():
+        node.tag = ElementTree.QName(
+            str.removeprefix(node.tag, '{http://www.w3.org/2000/svg}')
+        )
+    return svg
 
 
 _PATH_ATTR_NAMES = frozenset(
@@ -41,13 +40,51 @@ _PATH_ATTR_NAMES = frozenset(
 
 
 def render_icon(icon_style, icon_name, icon_size, **kwargs):
+    """
+    Returns the SVG string of the icon. The string is cached per combination of arguments, if they are hashable.
+    """
+    attrs = tuple(sorted(kwargs.items()))
+
+    try:
+        return _render_icon_cached(icon_style, icon_name, icon_size, attrs)
+    except TypeError:
+        return _render_icon(icon_style, icon_name, icon_size, attrs)
+
+
+@functools.lru_cache(maxsize=2048)
+def _render_icon_cached(icon_style, icon_name, icon_size, attrs):
+    return _render_icon(icon_style, icon_name, icon_size, attrs)
+
+
+def _render_sprite_icon_or_none(icon_style, icon_name, icon_size, attrs):
+    icon_id = get_heroicon_sprite_id(icon_style, icon_name)
+    sprite_icon = get_sprite_icon_or_none(icon_id)
+
+    # path attributes can not be set through <use>, such icons are rendered inline
+    if not sprite_icon or any(raw_name.replace('_', '-') in _PATH_ATTR_NAMES for raw_name, _ in attrs):
+        return None
+
+    svg_attrs = dict(sprite_icon['attrs'], viewBox=sprite_icon['viewBox'])
+    if icon_size is not None:
+        svg_attrs['width'] = svg_attrs['height'] = str(icon_size)
+
+    svg_attrs.update({raw_name.replace('_', '-'): str(value) for raw_name, value in attrs})
+
+    return render_sprite_icon(icon_id, svg_attrs)
+
+
+def _render_icon(icon_style, icon_name, icon_size, attrs):
+    sprite_icon = _render_sprite_icon_or_none(icon_style, icon_name, icon_size, attrs)
+    if sprite_icon is not None:
+        return sprite_icon
+
     svg = deepcopy(_load_icon(icon_style, icon_name))
     if icon_size is not None:
         svg.attrib['width'] = svg.attrib['height'] = str(icon_size)
 
     svg_attrs = {}
     path_attrs = {}
-    for raw_name, value in kwargs.items():
+    for raw_name, value in attrs:
         icon_name = raw_name.replace('_', '-')
         if icon_name in _PATH_ATTR_NAMES:
             path_attrs[icon_name] = str(value)
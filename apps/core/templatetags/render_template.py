@@ -1,5 +1,7 @@
 from django import template
-from django.template import Template, Variable, VariableDoesNotExist, TemplateSyntaxError
+from django.template import Variable, VariableDoesNotExist, TemplateSyntaxError
+
+from apps.core.helpers import compiled_template_cache
 
 register = template.Library()
 
@@ -11,7 +13,18 @@ class RenderTemplateNode(template.Node):
     def render(self, context):
         try:
             resolved_content = self.content.resolve(context)
-            return Template(resolved_content).render(context)
+        except VariableDoesNotExist:
+            return ''
+
+        if not resolved_content:
+            return ''
+
+        compiled_template = compiled_template_cache.get_template_or_none(str(resolved_content))
+        if compiled_template is None:
+            return ''
+
+        try:
+            return compiled_template.render(context)
         except (VariableDoesNotExist, TemplateSyntaxError):
             return ''
 
@@ -1,7 +1,10 @@
 import functools
 import os
-from contextlib import closing
-from zipfile import ZipFile
+
+from django.utils.html import format_html
+
+from apps.core.sprite import get_svg_icon_sprite_id, get_sprite_icon_or_none, get_icon_sprite_href
+from apps.utils.helpers.file import get_mapped_zip_archive
 
 icon_zip_paths = {
     'material': 'data/material_icons.zip',  # https://github.com/livingdocsIO/material-design-icons-svg
@@ -13,20 +16,43 @@ class IconDoesNotExist(Exception):
     pass
 
 
-@functools.lru_cache(maxsize=128)
+@functools.lru_cache(maxsize=None)
 def load_path(icon_type, icon_name):
     path = None
 
     icon_zip_path = icon_zip_paths.get(icon_type, None)
-    icon_zip_path = os.path.join(os.path.dirname(__file__), icon_zip_path)
     if icon_zip_path:
+        icon_zip_path = os.path.join(os.path.dirname(__file__), icon_zip_path)
+
         if os.path.exists(icon_zip_path):
-            f = open(icon_zip_path, 'rb')
-            with closing(ZipFile(f, 'r')) as zip_file:
-                try:
-                    zf = zip_file.open(f"{icon_name}.json")
-                    path = zf.read().decode('utf-8').strip('"')
-                except IconDoesNotExist:
-                    pass
+            try:
+                path = get_mapped_zip_archive(icon_zip_path).read(f"{icon_name}.json").decode('utf-8').strip('"')
+            except KeyError:
+                pass
 
     return path
+
+
+# typed, so safe and plain strings of the same value are not mixed up
+@functools.lru_cache(maxsize=2048, typed=True)
+def render_icon(icon_type, icon_name, view_box, size, fill_color, fill_rule, opacity, extra_class, extra_style):
+    icon_id = get_svg_icon_sprite_id(icon_type, icon_name)
+
+    if get_sprite_icon_or_none(icon_id):
+        return format_html(
+            '<svg viewBox="0 0 {view_box} {view_box}" width="{size}" height="{size}" fill="{fill_color}" xmlns="http://www.w3.org/2000/svg" '
+            'class="{extra_class}" style="{extra_style}" fill-rule="{fill_rule}" clip-rule="{fill_rule}" opacity="{opacity}">'
+            '<use href="{href}"></use>'
+            '</svg>',
+            href=get_icon_sprite_href(icon_id), view_box=view_box, size=size, fill_color=fill_color,
+            fill_rule=fill_rule, opacity=opacity, extra_class=extra_class, extra_style=extra_style)
+
+    icon_path = load_path(icon_type, icon_name)
+
+    return format_html(
+        '<svg viewBox="0 0 {view_box} {view_box}" width="{size}" height="{size}" fill="{fill_color}" xmlns="http://www.w3.org/2000/svg"'
+        'class="{extra_class}" style="{extra_style}" fill-rule="{fill_rule}" clip-rule="{fill_rule}">'
+        '<path d="{path}" fill={fill_color} opacity={opacity}></path>'
+        '</svg>',
+        path=icon_path, view_box=view_box, size=size, fill_color=fill_color, fill_rule=fill_rule, opacity=opacity,
+        extra_class=extra_class, extra_style=extra_style)
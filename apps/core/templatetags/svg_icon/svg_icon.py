@@ -1,8 +1,7 @@
 from django import template
-from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
-from .helpers import load_path
+from .helpers import render_icon
 
 register = template.Library()
 
@@ -18,14 +17,9 @@ def svg_icon(
         opacity=1,
         extra_class='',
         extra_style=''):
-    icon_path = load_path(icon_type, icon_name)
-
-    svg_tag = format_html(
-        '<svg viewBox="0 0 {view_box} {view_box}" width="{size}" height="{size}" fill="{fill_color}" xmlns="http://www.w3.org/2000/svg"'
-        'class="{extra_class}" style="{extra_style}" fill-rule="{fill_rule}" clip-rule="{fill_rule}">'
-        '<path d="{path}" fill={fill_color} opacity={opacity}></path>'
-        '</svg>',
-        path=icon_path, view_box=view_box, size=size, fill_color=fill_color, fill_rule=fill_rule, opacity=opacity,
-        extra_class=extra_class, extra_style=extra_style)
+    # the rendered string is cached per combination of arguments
+    svg_tag = render_icon(
+        icon_type, icon_name, view_box, size, fill_color, fill_rule, opacity, extra_class, extra_style
+    )
 
     return mark_safe(svg_tag)
@@ -0,0 +1,49 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+
+
+def get_image_file(name='image.png', size=(640, 480), fmt='PNG', color=(200, 40, 40)):
+    """
+    Returns an in-memory image file of the given size and format.
+    """
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=fmt)
+
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+class ModelTestCase(TestCase):
+    """
+    TestCase that creates the tables of the models defined by the tests in `test_models`, and stores the media files
+    in a temporary directory.
+    """
+    test_models = ()
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+
+        with connection.schema_editor() as editor:
+            for model in cls.test_models:
+                editor.create_model(model)
+
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+
+        with connection.schema_editor() as editor:
+            for model in cls.test_models:
+                editor.delete_model(model)
+
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.attachment.models import Category, FileAttachment
+from apps.core.tests.base import ModelTestCase
+from apps.log.models import VisitLog
+from apps.utils.helpers import django as django_helpers
+from apps.utils.helpers.django import EstimatedCountPaginator, get_estimated_count_or_none
+
+
+class AutoModelAdminTests(ModelTestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_superuser(
+            username='admin', email='admin@example.com', password='secret'
+        )
+        self.url = reverse('admin:attachment_category_changelist')
+
+    def create_categories(self, count):
+        start = Category.objects.count()
+
+        for index in range(start, start + count):
+            category = Category.objects.create(title=f"Category {index}", slug=f"category-{index}")
+            FileAttachment.objects.create(category=category, file=f"docs/{index}.txt")
+
+    def get_request(self):
+        request = RequestFactory().get(self.url)
+        request.user = self.user
+        return request
+
+    def get_links(self):
+        """
+        Returns the changelist links of the page, as the result list of the changelist renders them.
+        """
+        model_admin = admin.site._registry[Category]
+        changelist = model_admin.get_changelist_instance(self.get_request())
+
+        return {obj.slug: model_admin.file_attachment_link(obj) for obj in changelist.result_list}
+
+    def get_num_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.get_links()
+
+        return len(queries)
+
+    def test_foreign_keys_are_selected_with_the_rows(self):
+        model_admin = admin.site._registry[FileAttachment]
+
+        self.assertIn('category', model_admin.list_display)
+        self.assertEqual(model_admin.list_select_related, ('category', ))
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.create_categories(2)
+        num_queries = self.get_num_queries()
+
+        self.create_categories(5)
+        self.assertEqual(self.get_num_queries(), num_queries)
+
+    def test_changelist_links_only_for_existing_rows(self):
+        self.create_categories(1)
+        Category.objects.create(title='Empty', slug='empty')
+
+        links = self.get_links()
+        file_attachment_url = reverse('admin:attachment_fileattachment_changelist')
+
+        category = Category.objects.get(slug='category-0')
+
+        self.assertIn(f"{file_attachment_url}?category={category.pk}", links['category-0'])
+        self.assertIsNone(links['empty'])
+
+    def test_links_are_annotated_on_the_changelist_only(self):
+        queryset = admin.site._registry[Category].get_queryset(self.get_request())
+
+        self.assertFalse(queryset.query.annotations)
+
+    def test_estimated_counts_are_opt_in(self):
+        self.assertTrue(admin.site._registry[Category].show_full_result_count)
+        self.assertIs(admin.site._registry[Category].paginator, Paginator)
+
+        self.assertFalse(admin.site._registry[VisitLog].show_full_result_count)
+        self.assertIs(admin.site._registry[VisitLog].paginator, EstimatedCountPaginator)
+
+
+class EstimatedCountPaginatorTests(ModelTestCase):
+
+    def setUp(self):
+        Category.objects.create(title='Category', slug='category')
+
+    def test_estimate_is_used_for_large_tables(self):
+        with mock.patch.object(django_helpers, 'get_estimated_count_or_none', return_value=50000):
+            self.assertEqual(EstimatedCountPaginator(Category.objects.all(), 10).count, 50000)
+
+        with mock.patch.object(django_helpers, 'get_estimated_count_or_none', return_value=100):
+            self.assertEqual(EstimatedCountPaginator(Category.objects.all(), 10).count, 1)
+
+    def test_filtered_querysets_are_counted(self):
+        self.assertIsNone(get_estimated_count_or_none(Category.objects.filter(slug='category')))
+        self.assertIsNone(get_estimated_count_or_none(Category.objects.all()[:5]))
+        self.assertEqual(EstimatedCountPaginator(Category.objects.filter(slug='category'), 10).count, 1)
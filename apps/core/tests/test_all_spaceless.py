@@ -0,0 +1,44 @@
+from itertools import product
+from unittest import mock
+
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from apps.core.templatetags import all_spaceless
+from apps.core.templatetags.all_spaceless import strip_spaces_in_tags
+
+BODIES = [
+    '<div>\n  <p> {{ a }} </p>\n  {{ b }}\n</div>',
+    '  {{ a }}{{ b }}  text  {{ a }}<br>  ',
+    '<ul>{% for item in items %}\n  <li> {{ item }} </li>\n{% endfor %}</ul>',
+    '{% if a %} <b>{{ a }}</b> {% else %} none {% endif %} <i> {{ b }} </i>',
+]
+
+VALUES = ['', ' ', 'x', ' x ', '<em> x </em>', ' <em>x</em> ', 'x\n\ty', '  ']
+
+
+class AllSpacelessTests(SimpleTestCase):
+
+    def render(self, body, **context):
+        template = Template('{% load all_spaceless %}{% all_spaceless %}' + body + '{% end_all_spaceless %}')
+        return template.render(Context(context))
+
+    def test_output_matches_stripping_the_whole_render(self):
+        for body, a, b in product(BODIES, VALUES, VALUES):
+            with self.subTest(body=body, a=a, b=b):
+                context = {'a': a, 'b': b, 'items': [a, b]}
+                expected = strip_spaces_in_tags(Template(body).render(Context(context))).strip()
+
+                self.assertEqual(self.render(body, **context), expected)
+
+    def test_text_nodes_are_stripped_once_at_compile_time(self):
+        template = Template(
+            '{% load all_spaceless %}{% all_spaceless %}<div>\n  <p>  text  </p>\n  {{ a }}\n</div>{% end_all_spaceless %}'
+        )
+
+        with mock.patch.object(all_spaceless, 'strip_spaces_in_tags', wraps=strip_spaces_in_tags) as strip:
+            output = template.render(Context({'a': ' a '}))
+
+        self.assertEqual(output, '<div><p>text</p>a</div>')
+        # only the variable output is stripped on render
+        self.assertEqual(strip.call_count, 1)
@@ -0,0 +1,135 @@
+import os
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import models
+from django.test import SimpleTestCase
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from apps.core.management.commands import clean_unused_media
+from apps.core.models import MediaReference
+from apps.core.tests.base import ModelTestCase
+from apps.utils.helpers.storage import delete_storage_files, iter_storage_files
+
+
+class CleanMediaItem(models.Model):
+    media_reference_index = False
+
+    file = models.FileField(upload_to='clean', blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+class CleanUnusedMediaTests(ModelTestCase):
+    test_models = (CleanMediaItem, )
+
+    def setUp(self):
+        # the test models of other test cases have no table outside of their own test case
+        fields = mock.patch.object(
+            clean_unused_media, 'get_all_model_file_fields', return_value=[CleanMediaItem._meta.get_field('file')]
+        )
+        fields.start()
+        self.addCleanup(fields.stop)
+
+        self.used = CleanMediaItem.objects.create(file=ContentFile(b'used', name='used.txt')).file.name
+        self.unused = default_storage.save('clean/unused.txt', ContentFile(b'unused'))
+        self.excluded = default_storage.save('keep/unused.txt', ContentFile(b'unused'))
+
+    def tearDown(self):
+        for name in (self.used, self.unused, self.excluded):
+            default_storage.delete(name)
+
+    def run_command(self, *args, **kwargs):
+        stdout = StringIO()
+        kwargs.setdefault('minimum_file_age', 0)
+        kwargs.setdefault('exclude', ['keep/*'])
+        call_command('clean_unused_media', *args, interactive=False, stdout=stdout, **kwargs)
+        return stdout.getvalue()
+
+    def test_unused_files_are_removed(self):
+        output = self.run_command()
+
+        self.assertIn('Total files removed: 1', output)
+        self.assertTrue(default_storage.exists(self.used))
+        self.assertTrue(default_storage.exists(self.excluded))
+        self.assertFalse(default_storage.exists(self.unused))
+
+    def test_dry_run_removes_nothing(self):
+        output = self.run_command(dry_run=True)
+
+        self.assertIn('Total files will be removed: 1', output)
+        self.assertTrue(default_storage.exists(self.unused))
+
+    def test_young_files_are_kept(self):
+        old = time.time() - 120
+        os.utime(default_storage.path(self.used), (old, old))
+        os.utime(default_storage.path(self.excluded), (old, old))
+
+        output = self.run_command(minimum_file_age=60, exclude=[])
+
+        self.assertIn('Total files removed: 1', output)
+        self.assertTrue(default_storage.exists(self.unused))
+        self.assertFalse(default_storage.exists(self.excluded))
+
+    def test_index_references_are_kept(self):
+        MediaReference.objects.create(
+            content_type=ContentType.objects.get_for_model(MediaReference), object_id='1', field_name='file',
+            name=self.unused
+        )
+
+        output = self.run_command(use_index=True)
+
+        self.assertIn('Nothing to delete', output)
+        self.assertTrue(default_storage.exists(self.used))
+        self.assertTrue(default_storage.exists(self.unused))
+
+
+class StorageFilesTests(SimpleTestCase):
+
+    def test_iter_storage_files_is_recursive(self):
+        storage = mock.Mock()
+        storage.listdir.side_effect = lambda path: {
+            '': (['a'], ['root.txt']),
+            'a': (['b'], ['a.txt']),
+            'a/b': ([], ['b.txt']),
+        }[path]
+
+        files = sorted(name for name, _ in iter_storage_files(storage, workers=2))
+
+        self.assertEqual(files, ['a/a.txt', 'a/b/b.txt', 'root.txt'])
+
+    def test_delete_storage_files_keeps_failed_names(self):
+        storage = mock.Mock()
+        storage.delete.side_effect = lambda name: (_ for _ in ()).throw(OSError()) if name == 'b' else None
+        failed = []
+
+        with self.assertLogs('custom', 'ERROR'):
+            self.assertEqual(delete_storage_files(storage, ['a', 'b', 'c'], batch_size=2, failed=failed), 2)
+
+        self.assertEqual(failed, ['b'])
+
+    def test_s3_files_are_deleted_in_batches(self):
+        storage = S3Boto3Storage(bucket_name='bucket', location='media')
+        client = mock.Mock()
+        client.delete_objects.side_effect = [
+            {'Errors': [{'Key': 'media/b', 'Message': 'AccessDenied'}]},
+            {},
+        ]
+        failed = []
+
+        with mock.patch.object(S3Boto3Storage, 'connection', new_callable=mock.PropertyMock) as connection:
+            connection.return_value.meta.client = client
+
+            with self.assertLogs('custom', 'ERROR'):
+                self.assertEqual(delete_storage_files(storage, ['a', 'b', 'c'], batch_size=2, failed=failed), 2)
+
+        self.assertEqual(client.delete_objects.call_count, 2)
+        objects = client.delete_objects.call_args_list[0].kwargs['Delete']['Objects']
+        self.assertEqual(objects, [{'Key': 'media/a'}, {'Key': 'media/b'}])
+        self.assertEqual(failed, ['b'])
@@ -0,0 +1,54 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.utils.helpers.django import get_url_as_field_file_or_false
+
+
+def get_response(chunks, status_code=200, headers=None):
+    response = mock.MagicMock(status_code=status_code, headers=headers or {})
+    response.__enter__.return_value = response
+    response.iter_content.return_value = iter(chunks)
+    return response
+
+
+@override_settings(MAX_UPLOAD_SIZE=10)
+@mock.patch('apps.utils.helpers.django.requests.get')
+class GetUrlAsFieldFileTests(SimpleTestCase):
+
+    def test_body_is_streamed_into_file(self, get):
+        get.return_value = get_response([b'abc', b'def'])
+
+        field_file = get_url_as_field_file_or_false('https://example.com/a.png', 'a.png')
+
+        self.assertEqual(field_file.name, 'a.png')
+        self.assertEqual(field_file.read(), b'abcdef')
+        self.assertTrue(get.call_args.kwargs['stream'])
+
+    def test_failed_request_returns_false(self, get):
+        get.return_value = get_response([], status_code=404)
+
+        self.assertFalse(get_url_as_field_file_or_false('https://example.com/a.png', 'a.png'))
+
+    def test_declared_size_over_limit_is_not_read(self, get):
+        response = get_response([b'abc'], headers={'Content-Length': '11'})
+        get.return_value = response
+
+        with self.assertLogs('custom', 'WARNING'):
+            self.assertFalse(get_url_as_field_file_or_false('https://example.com/a.png', 'a.png'))
+
+        response.iter_content.assert_not_called()
+
+    def test_body_over_limit_is_dropped(self, get):
+        chunks = iter([b'123456', b'789012', b'never read'])
+        get.return_value = get_response(chunks)
+
+        with self.assertLogs('custom', 'WARNING'):
+            self.assertFalse(get_url_as_field_file_or_false('https://example.com/a.png', 'a.png'))
+
+        self.assertEqual(next(chunks), b'never read')
+
+    def test_max_size_argument_overrides_setting(self, get):
+        get.return_value = get_response([b'123456', b'789012'])
+
+        self.assertTrue(get_url_as_field_file_or_false('https://example.com/a.png', 'a.png', max_size=100))
@@ -0,0 +1,276 @@
+import json
+from unittest import mock
+
+from celery.exceptions import Retry
+from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core.helpers import send_email_messages
+from apps.core.tasks import task_send_emails
+from apps.log.backendmixins import EmailLogBackendMixin
+from apps.log.models import EmailLog
+from apps.utils.helpers.mail import get_email_message, get_email_message_data
+from apps.utils.helpers.ratelimit import TokenBucket
+from apps.utils.services.amazon_ses import AmazonSesHandler, get_ses_client, get_ses_rate_limiter
+
+TEST_EMAIL_BACKEND = f'{__name__}.FailingEmailLogBackend'
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """
+    Email backend that fails the messages sent to the addresses in `failing`.
+    """
+    failing = set()
+    sent_messages = []
+
+    def send_messages(self, email_messages):
+        sent = [message for message in email_messages if message.to[0] not in self.failing]
+        self.sent_messages.extend(sent)
+        return len(sent)
+
+
+class FailingEmailLogBackend(EmailLogBackendMixin, FailingEmailBackend):
+    pass
+
+
+class NoReportEmailBackend(BaseEmailBackend):
+    """
+    Email backend that does not report `failed_messages`, and sends nothing.
+    """
+
+    def send_messages(self, email_messages):
+        return 0
+
+
+def get_message(to='user@example.com'):
+    message = EmailMultiAlternatives(
+        subject='Hello', body='Hello text', from_email='from@example.com', to=[to], bcc=['admin@example.com'],
+        reply_to=['reply@example.com'], headers={'X-Tag': 'test'}
+    )
+    message.attach_alternative('<p>Hello</p>', 'text/html')
+
+    return message
+
+
+class TokenBucketTests(SimpleTestCase):
+
+    def setUp(self):
+        self.now = 100.0
+
+        patcher = mock.patch('apps.utils.helpers.ratelimit.time')
+        self.time = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.time.monotonic.side_effect = lambda: self.now
+        self.time.sleep.side_effect = self.sleep
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def test_burst_up_to_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+
+        for _ in range(3):
+            bucket.acquire()
+
+        self.time.sleep.assert_not_called()
+
+    def test_waits_for_tokens(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+
+        bucket.acquire()
+        bucket.acquire()
+
+        self.time.sleep.assert_called_once_with(0.5)
+        self.assertEqual(self.now, 100.5)
+
+    def test_refill_is_capped_at_capacity(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        bucket.acquire(2)
+
+        self.now += 60
+        bucket.refill()
+
+        self.assertEqual(bucket.tokens, 2)
+
+    def test_capacity_defaults_to_rate(self):
+        self.assertEqual(TokenBucket(rate=14).capacity, 14)
+        self.assertEqual(TokenBucket(rate=0.5).capacity, 1)
+
+
+class EmailMessageDataTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        message = get_message()
+        message.email_log_id = 7
+
+        data = json.loads(json.dumps(get_email_message_data(message)))
+        restored = get_email_message(data)
+
+        for name in ('subject', 'body', 'from_email', 'to', 'cc', 'bcc', 'reply_to', 'extra_headers'):
+            self.assertEqual(getattr(restored, name), getattr(message, name))
+
+        self.assertEqual(restored.alternatives, [('<p>Hello</p>', 'text/html')])
+        self.assertEqual(restored.email_log_id, 7)
+
+    def test_plain_message(self):
+        message = EmailMessage(subject='Hello', body='Hello text', to=['user@example.com'])
+
+        data = get_email_message_data(message)
+
+        self.assertEqual(data['alternatives'], [])
+        self.assertIsNone(data['email_log_id'])
+        self.assertEqual(get_email_message(data).body, 'Hello text')
+
+
+@override_settings(EMAIL_BACKEND=TEST_EMAIL_BACKEND, EMAIL_QUEUE_BATCH_SIZE=2, EMAIL_QUEUE_NAME='queue_test')
+class SendEmailMessagesTests(TestCase):
+
+    def setUp(self):
+        FailingEmailBackend.failing = set()
+        FailingEmailBackend.sent_messages = []
+
+    @override_settings(EMAIL_QUEUE_ENABLED=False)
+    @mock.patch('apps.core.tasks.task_send_emails.apply_async')
+    def test_sent_right_away_without_queue(self, apply_async):
+        self.assertEqual(send_email_messages([get_message()]), 1)
+
+        self.assertEqual(len(FailingEmailBackend.sent_messages), 1)
+        apply_async.assert_not_called()
+
+    @override_settings(EMAIL_QUEUE_ENABLED=True)
+    @mock.patch('apps.core.tasks.task_send_emails.apply_async')
+    def test_queued_in_batches_on_commit(self, apply_async):
+        messages = [get_message(to=f'user{i}@example.com') for i in range(3)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_email_messages(messages), 3)
+            apply_async.assert_not_called()
+
+        self.assertEqual(FailingEmailBackend.sent_messages, [])
+        batches = [call.kwargs['args'][0] for call in apply_async.call_args_list]
+        self.assertEqual([[data['to'] for data in batch] for batch in batches],
+                         [[['user0@example.com'], ['user1@example.com']], [['user2@example.com']]])
+        self.assertEqual({call.kwargs['queue'] for call in apply_async.call_args_list}, {'queue_test'})
+
+    @override_settings(EMAIL_QUEUE_ENABLED=True)
+    @mock.patch('apps.core.tasks.task_send_emails.apply_async')
+    def test_messages_with_attachments_sent_right_away(self, apply_async):
+        attached = get_message(to='attached@example.com')
+        attached.attach('file.txt', 'content', 'text/plain')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(send_email_messages([attached, get_message()]), 2)
+
+        self.assertEqual(FailingEmailBackend.sent_messages, [attached])
+        self.assertEqual(apply_async.call_args.kwargs['args'][0][0]['to'], ['user@example.com'])
+
+
+@override_settings(EMAIL_BACKEND=TEST_EMAIL_BACKEND, EMAIL_QUEUE_MAX_RETRIES=2, EMAIL_QUEUE_RETRY_DELAY=30)
+class SendEmailsTaskTests(TestCase):
+
+    def setUp(self):
+        FailingEmailBackend.failing = set()
+        FailingEmailBackend.sent_messages = []
+
+        self.messages = [get_email_message_data(get_message(to=to)) for to in ('ok@example.com', 'fail@example.com')]
+
+    def run_task(self, messages, retries=0):
+        task_send_emails.push_request(retries=retries)
+        try:
+            return task_send_emails.run(messages)
+        finally:
+            task_send_emails.pop_request()
+
+    def test_all_sent(self):
+        self.assertEqual(self.run_task(self.messages), 2)
+        self.assertEqual(EmailLog.objects.filter(sent=True).count(), 2)
+
+    @mock.patch('apps.core.tasks.random.uniform', return_value=1)
+    @mock.patch.object(task_send_emails, 'retry', side_effect=Retry)
+    def test_failed_messages_retried_with_backoff(self, retry, uniform):
+        FailingEmailBackend.failing = {'fail@example.com'}
+
+        with self.assertRaises(Retry):
+            self.run_task(self.messages, retries=1)
+
+        failed = retry.call_args.kwargs['args'][0]
+        self.assertEqual([data['to'] for data in failed], [['fail@example.com']])
+        self.assertEqual(retry.call_args.kwargs['countdown'], 60)
+
+        # the retry keeps the email log of the failed message
+        email_log = EmailLog.objects.get(pk=failed[0]['email_log_id'])
+        self.assertFalse(email_log.sent)
+
+    @mock.patch.object(task_send_emails, 'retry', side_effect=Retry)
+    def test_retry_reuses_email_log(self, retry):
+        FailingEmailBackend.failing = {'fail@example.com'}
+
+        with self.assertRaises(Retry):
+            self.run_task(self.messages)
+
+        FailingEmailBackend.failing = set()
+        failed = retry.call_args.kwargs['args'][0]
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.run_task(failed, retries=1), 1)
+
+        self.assertEqual(EmailLog.objects.count(), 2)
+        self.assertEqual(EmailLog.objects.filter(sent=True).count(), 2)
+
+    @mock.patch.object(task_send_emails, 'retry')
+    def test_gives_up_after_max_retries(self, retry):
+        FailingEmailBackend.failing = {'fail@example.com'}
+
+        with self.assertLogs('custom', level='ERROR') as logs:
+            self.assertEqual(self.run_task(self.messages, retries=2), 1)
+
+        retry.assert_not_called()
+        self.assertIn('1 messages not sent after 2 retries', logs.output[0])
+
+    @override_settings(EMAIL_BACKEND=f'{__name__}.NoReportEmailBackend')
+    @mock.patch.object(task_send_emails, 'retry', side_effect=Retry)
+    def test_backend_without_failed_messages(self, retry):
+        with self.assertRaises(Retry):
+            self.run_task(self.messages)
+
+        self.assertEqual(retry.call_args.kwargs['args'][0], self.messages)
+
+
+@override_settings(AWS_SES_ACCESS_KEY_ID='key', AWS_SES_SECRET_ACCESS_KEY='secret', AWS_SES_REGION_NAME='eu-west-1')
+class AmazonSesHandlerTests(SimpleTestCase):
+
+    def setUp(self):
+        get_ses_client.cache_clear()
+        get_ses_rate_limiter.cache_clear()
+        self.addCleanup(get_ses_client.cache_clear)
+        self.addCleanup(get_ses_rate_limiter.cache_clear)
+
+    @override_settings(AWS_SES_MAX_SEND_RATE=0)
+    @mock.patch('apps.utils.services.amazon_ses.boto3')
+    def test_client_is_shared(self, boto3):
+        first = AmazonSesHandler()
+        second = AmazonSesHandler()
+
+        self.assertIs(first.ses, second.ses)
+        boto3.client.assert_called_once()
+        self.assertIsNone(first.rate_limiter)
+
+    @override_settings(AWS_SES_MAX_SEND_RATE=5)
+    @mock.patch('apps.utils.services.amazon_ses.boto3')
+    def test_sends_are_rate_limited(self, boto3):
+        boto3.client.return_value.send_raw_email.return_value = {'ResponseMetadata': {'HTTPStatusCode': 200}}
+        handler = AmazonSesHandler()
+
+        self.assertEqual(handler.rate_limiter.rate, 5)
+
+        message = get_message()
+        message.reply_to = []
+
+        with mock.patch.object(handler.rate_limiter, 'acquire') as acquire:
+            self.assertTrue(handler.send_email(message))
+
+        acquire.assert_called_once_with()
+        destinations = boto3.client.return_value.send_raw_email.call_args.kwargs['Destinations']
+        self.assertEqual(destinations, ['user@example.com', 'admin@example.com'])
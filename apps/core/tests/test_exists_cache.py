@@ -0,0 +1,127 @@
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+
+from apps.core import helpers
+from apps.core.helpers import get_file_exists, get_url_exists, refresh_exists
+from apps.core.tasks import task_refresh_exists
+from apps.utils.helpers.requests import check_url_exists
+
+URL = 'https://example.com/image.png'
+
+
+@override_settings(EXISTS_CACHE_TIMEOUT=100, EXISTS_CACHE_NEGATIVE_TIMEOUT=10, EXISTS_CACHE_MISS_DEFAULT=True)
+@mock.patch('apps.core.tasks.task_refresh_exists')
+class ExistsCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def refresh(self, exists, now):
+        with mock.patch.object(helpers, 'check_url_exists', return_value=exists), \
+                mock.patch.object(helpers.time, 'time', return_value=now):
+            refresh_exists('url', URL)
+
+    def get_url_exists(self, now):
+        with mock.patch.object(helpers.time, 'time', return_value=now):
+            return get_url_exists(URL)
+
+    def test_miss_returns_default_and_queues_one_refresh(self, task):
+        self.assertTrue(self.get_url_exists(1000))
+        self.assertTrue(self.get_url_exists(1000))
+
+        task.delay.assert_called_once_with('url', URL)
+
+    def test_results_are_served_from_cache(self, task):
+        self.refresh(True, 1000)
+
+        self.assertTrue(self.get_url_exists(1099))
+        task.delay.assert_not_called()
+
+        self.refresh(False, 1000)
+
+        self.assertFalse(self.get_url_exists(1009))
+        task.delay.assert_not_called()
+
+    def test_stale_result_is_served_while_refreshed(self, task):
+        self.refresh(False, 1000)
+
+        self.assertFalse(self.get_url_exists(1011))
+        task.delay.assert_called_once_with('url', URL)
+
+        self.refresh(True, 1011)
+
+        self.assertTrue(self.get_url_exists(1012))
+        self.assertEqual(task.delay.call_count, 1)
+
+    def test_failed_queue_is_retried(self, task):
+        task.delay.side_effect = Exception('broker down')
+
+        with self.assertLogs('custom', 'ERROR'):
+            self.assertTrue(self.get_url_exists(1000))
+
+        task.delay.side_effect = None
+        self.get_url_exists(1000)
+        self.assertEqual(task.delay.call_count, 2)
+
+    def test_remote_file_is_checked_in_background(self, task):
+        field_file = mock.Mock(name='field_file')
+        field_file.name = 'docs/a.txt'
+        field_file.instance._meta.label = 'attachment.FileAttachment'
+        field_file.field.name = 'file'
+
+        self.assertTrue(get_file_exists(field_file))
+
+        field_file.storage.exists.assert_not_called()
+        task.delay.assert_called_once_with('file', 'docs/a.txt', 'attachment.FileAttachment', 'file')
+
+    def test_filters_render_without_network(self, task):
+        self.refresh(False, 1000)
+        template = Template('{% load custom_filters %}{{ url|url_exists }} {{ empty|url_exists }}')
+
+        with mock.patch.object(helpers.time, 'time', return_value=1000):
+            self.assertEqual(template.render(Context({'url': URL, 'empty': ''})), 'False False')
+
+
+class RefreshExistsTaskTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_file_is_checked_in_the_field_storage(self):
+        task_refresh_exists('file', 'docs/missing.txt', 'attachment.FileAttachment', 'file')
+
+        with mock.patch('apps.core.tasks.task_refresh_exists') as task:
+            self.assertFalse(helpers.get_cached_exists('file', 'docs/missing.txt', ()))
+
+        task.delay.assert_not_called()
+
+
+@mock.patch('apps.utils.helpers.requests.get_pooled_session')
+class CheckUrlExistsTests(SimpleTestCase):
+
+    def test_head_request(self, get_pooled_session):
+        session = get_pooled_session.return_value
+        session.head.return_value.status_code = 200
+
+        self.assertTrue(check_url_exists(URL))
+        session.get.assert_not_called()
+
+        session.head.return_value.status_code = 404
+        self.assertFalse(check_url_exists(URL))
+
+    def test_get_fallback_when_head_is_not_allowed(self, get_pooled_session):
+        session = get_pooled_session.return_value
+        session.head.return_value.status_code = 405
+        session.get.return_value.__enter__.return_value.status_code = 200
+
+        self.assertTrue(check_url_exists(URL))
+        self.assertTrue(session.get.call_args.kwargs['stream'])
+
+    def test_request_error(self, get_pooled_session):
+        get_pooled_session.return_value.head.side_effect = requests.ConnectionError
+
+        self.assertFalse(check_url_exists(URL))
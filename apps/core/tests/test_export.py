@@ -0,0 +1,145 @@
+import csv
+import io
+import os
+import time
+from unittest import mock
+
+from django.contrib.admin import AdminSite
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import models
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from apps.core.tests.base import ModelTestCase
+from apps.utils.helpers.export import dump_queryset_query, iter_export_rows, load_queryset_query
+from apps.utils.mixins.admin.core import ExportCsvMixin
+from apps.utils.tasks import task_clean_exports, task_export_queryset
+
+
+class ExportItem(models.Model):
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    name = models.CharField(max_length=50)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        app_label = 'core'
+
+
+class ExportItemAdmin(ExportCsvMixin):
+    export_chunk_size = 2
+
+
+class ExportTests(ModelTestCase):
+    test_models = (ExportItem, )
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='owner', email='owner@example.com')
+        self.other = get_user_model().objects.create_user(username='other', email='other@example.com')
+        ExportItem.objects.bulk_create([
+            ExportItem(user=self.user, name='a'),
+            ExportItem(user=self.other, name='b'),
+            ExportItem(user=self.user, name='c'),
+        ])
+
+        self.model_admin = ExportItemAdmin(ExportItem, AdminSite())
+
+    def get_request(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        return request
+
+    def read_csv(self, content):
+        return list(csv.reader(io.StringIO(content.decode())))
+
+    def test_foreign_keys_are_fetched_with_the_rows(self):
+        queryset = ExportItem.objects.order_by('pk')
+
+        with self.assertNumQueries(1):
+            rows = list(iter_export_rows(queryset, ['id', 'user', 'name'], chunk_size=2))
+
+        self.assertEqual(rows[0], ['id', 'user', 'name'])
+        self.assertEqual(
+            [(row[1], row[2]) for row in rows[1:]], [(self.user, 'a'), (self.other, 'b'), (self.user, 'c')]
+        )
+
+    def test_csv_export_is_streamed(self):
+        response = self.model_admin.export_as_csv(self.get_request(), ExportItem.objects.order_by('pk'))
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename=core.exportitem.csv')
+
+        rows = self.read_csv(b''.join(response.streaming_content))
+        self.assertEqual(rows[0], ['id', 'user', 'name', 'created_at'])
+        self.assertEqual(
+            [row[1:3] for row in rows[1:]], [[str(self.user), 'a'], [str(self.other), 'b'], [str(self.user), 'c']]
+        )
+
+    def test_xlsx_export(self):
+        response = self.model_admin.export_as_xlsx(self.get_request(), ExportItem.objects.order_by('pk'))
+
+        worksheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        rows = list(worksheet.values)
+
+        self.assertEqual(rows[0], ('id', 'user', 'name', 'created_at'))
+        self.assertEqual(rows[1][1:3], (str(self.user), 'a'))
+        self.assertEqual(len(rows), 4)
+
+    @override_settings(EXPORT_ASYNC_THRESHOLD=2, EXPORT_STORAGE='private')
+    @mock.patch('apps.utils.mixins.admin.core.task_export_queryset')
+    @mock.patch('apps.utils.mixins.admin.core.reverse', return_value='/export/')
+    def test_large_export_is_generated_in_a_task(self, reverse, task):
+        request = self.get_request()
+        queryset = ExportItem.objects.filter(user=self.user)
+
+        self.assertEqual(self.model_admin.export_as_csv(request, queryset).status_code, 200)
+        task.delay.assert_not_called()
+
+        self.assertIsNone(self.model_admin.export_as_csv(request, ExportItem.objects.all()))
+
+        app_label, model_name, query, fmt, file_name = task.delay.call_args.args
+        self.assertEqual((app_label, model_name, fmt), ('core', 'exportitem', 'csv'))
+        self.assertRegex(file_name, r'^export/core/exportitem/[0-9a-f]{32}\.csv$')
+        self.assertEqual(task.delay.call_args.kwargs, {'storage': 'private'})
+        self.assertIn('The export of 3 rows', str(list(request._messages)[0]))
+
+    def test_dumped_query_is_loaded(self):
+        queryset = ExportItem.objects.filter(user=self.user).exclude(name='c')
+
+        loaded = load_queryset_query(ExportItem, dump_queryset_query(queryset))
+
+        self.assertEqual(list(loaded.values_list('name', flat=True)), ['a'])
+
+    def test_task_saves_export(self):
+        query = dump_queryset_query(ExportItem.objects.filter(user=self.other))
+
+        name = task_export_queryset(
+            'core', 'exportitem', query, 'csv', 'export/core/exportitem/a.csv', storage='private'
+        )
+
+        with storages['private'].open(name) as f:
+            rows = self.read_csv(f.read())
+
+        self.assertEqual([row[1:3] for row in rows[1:]], [[str(self.other), 'b']])
+
+    def test_old_exports_are_removed(self):
+        storage = storages['private']
+        old = storage.save('export/core/exportitem/old.csv', ContentFile(b'old'))
+        new = storage.save('export/core/exportitem/new.csv', ContentFile(b'new'))
+
+        modified = time.time() - 8 * 24 * 60 * 60
+        os.utime(storage.path(old), (modified, modified))
+
+        with override_settings(EXPORT_STORAGE='private'):
+            self.assertEqual(task_clean_exports(), 1)
+
+        self.assertFalse(storage.exists(old))
+        self.assertTrue(storage.exists(new))
+
+    def test_clean_without_exports(self):
+        self.assertEqual(task_clean_exports(storage='private'), 0)
@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.cache import patch_cache_control
+
+from apps.core.middleware import htmlminify
+from apps.core.middleware.htmlminify import HTMLMinifyMiddleware
+from apps.utils.helpers.html import iter_minified_html, minify_html_bytes
+
+HTML = b"""<html>
+  <head>
+    <script>
+      if (a < b) {
+        <!-- </div> <p> -->
+      }
+    </script>
+  </head>
+  <body>
+    <div> <span>a b</span>   <span>c</span> </div>
+    <PRE>
+  keep   this
+    </PRE>
+    <textarea name="text">  also
+  this  </textarea>
+    <p>end</p>
+  </body>
+</html>"""
+
+
+def get_chunks(content, size):
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+class MinifyHtmlTests(SimpleTestCase):
+
+    def test_whitespace_between_tags_is_removed(self):
+        minified = minify_html_bytes(HTML)
+
+        self.assertTrue(minified.startswith(b'<html><head><script>'))
+        self.assertIn(b'</script></head><body><div><span>a b</span><span>c</span></div><PRE>', minified)
+        self.assertTrue(minified.endswith(b'</textarea><p>end</p></body></html>'))
+
+    def test_preserved_blocks_are_kept(self):
+        minified = minify_html_bytes(HTML)
+
+        self.assertIn(b'<PRE>\n  keep   this\n    </PRE>', minified)
+        self.assertIn(b'<textarea name="text">  also\n  this  </textarea>', minified)
+        self.assertIn(b'if (a < b) {\n        <!-- </div> <p> -->\n      }', minified)
+
+    def test_streamed_chunks_are_minified_like_the_whole(self):
+        expected = minify_html_bytes(HTML)
+
+        for size in range(1, 40):
+            with self.subTest(size=size):
+                self.assertEqual(b''.join(iter_minified_html(get_chunks(HTML, size))), expected)
+
+        for cut in range(len(HTML)):
+            with self.subTest(cut=cut):
+                self.assertEqual(b''.join(iter_minified_html([HTML[:cut], HTML[cut:]])), expected)
+
+    def test_chunks_are_yielded_before_the_end(self):
+        chunks = iter_minified_html(iter([b'<div> <p>a</p> ', b'<p>b</p>', b' </div>']))
+
+        # the part after the last `<` is kept back, as the tag may continue in the next chunk
+        self.assertEqual(next(chunks), b'<div><p>a')
+        self.assertEqual(b''.join(chunks), b'</p><p>b</p></div>')
+
+
+@override_settings(HTML_MINIFY_ENABLED=True, HTML_MINIFY_CACHE_TIMEOUT=60)
+class HTMLMinifyMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def get_response(self, response):
+        return HTMLMinifyMiddleware(lambda request: response)(RequestFactory().get('/'))
+
+    def test_html_response_is_minified(self):
+        response = self.get_response(HttpResponse(b'<div>  <p>a</p>  </div>\n'))
+
+        self.assertEqual(response.content, b'<div><p>a</p></div>')
+        self.assertEqual(response['Content-Length'], '19')
+
+    def test_other_responses_are_untouched(self):
+        content = b'<div>  <p>a</p>  </div>'
+
+        self.assertEqual(self.get_response(HttpResponse(content, content_type='text/plain')).content, content)
+
+        response = HttpResponse(content)
+        response['Content-Encoding'] = 'gzip'
+        self.assertEqual(self.get_response(response).content, content)
+
+    def test_streaming_response_is_minified_per_chunk(self):
+        response = StreamingHttpResponse(iter([b'<div>  <p>a</p>', b'  </div>']))
+        response['Content-Length'] = '23'
+
+        response = self.get_response(response)
+
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(b''.join(response.streaming_content), b'<div><p>a</p></div>')
+
+    def test_only_cacheable_responses_are_cached(self):
+        private = HttpResponse(b'<div>  <p>private</p>  </div>')
+        patch_cache_control(private, private=True, max_age=60)
+
+        public = HttpResponse(b'<div>  <p>public</p>  </div>')
+        patch_cache_control(public, public=True, max_age=60)
+
+        with mock.patch.object(htmlminify, 'minify_html_bytes', wraps=minify_html_bytes) as minify:
+            self.get_response(private)
+            self.get_response(HttpResponse(b'<div>  <p>private</p>  </div>'))
+            self.get_response(public)
+
+            public = HttpResponse(b'<div>  <p>public</p>  </div>')
+            patch_cache_control(public, public=True, max_age=60)
+            self.assertEqual(self.get_response(public).content, b'<div><p>public</p></div>')
+
+        self.assertEqual(minify.call_count, 3)
@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from apps.core import sprite
+from apps.core.management.commands import build_icon_sprite
+from apps.core.management.commands.build_icon_sprite import find_icon_usages
+from apps.core.templatetags.heroicons import helpers as heroicons_helpers
+from apps.core.templatetags.svg_icon import helpers as svg_icon_helpers
+
+TEMPLATE = """
+{% load heroicons svg_icon %}
+{% heroicon_mini "academic-cap" size=16 %}
+{% heroicon_outline 'x-mark' %}
+{%svg_icon 'material' "abacus" size=24 %}
+{% svg_icon icon_type icon_name %}
+"""
+
+
+def clear_icon_caches():
+    sprite.get_icon_sprite_lookup.cache_clear()
+    sprite.get_icon_sprite_href.cache_clear()
+    heroicons_helpers._render_icon_cached.cache_clear()
+    svg_icon_helpers.render_icon.cache_clear()
+
+
+class BuildIconSpriteTests(SimpleTestCase):
+
+    def setUp(self):
+        self.template_dir = tempfile.mkdtemp()
+        self.static_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.template_dir, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.static_dir, ignore_errors=True)
+        self.addCleanup(clear_icon_caches)
+
+        with open(os.path.join(self.template_dir, 'page.html'), 'w') as f:
+            f.write(TEMPLATE)
+
+    def build(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+
+        with mock.patch.object(build_icon_sprite, 'get_template_dirs', return_value=[self.template_dir]):
+            call_command('build_icon_sprite', *args, output_dir=self.static_dir, stdout=stdout, stderr=stderr)
+
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_literal_icon_usages_are_found(self):
+        self.assertEqual(find_icon_usages([self.template_dir]), {
+            ('heroicon', 'mini', 'academic-cap'),
+            ('heroicon', 'outline', 'x-mark'),
+            ('svg_icon', 'material', 'abacus'),
+        })
+
+    def test_sprite_and_lookup_are_written(self):
+        stdout, stderr = self.build('--icon', 'heroicon:solid:missing-icon')
+
+        self.assertIn('Total icons in sprite: 3', stdout)
+        self.assertIn('missing-icon', stderr)
+
+        with open(os.path.join(self.static_dir, sprite.ICON_SPRITE_PATH)) as f:
+            content = f.read()
+
+        with open(os.path.join(self.static_dir, sprite.ICON_SPRITE_LOOKUP_PATH)) as f:
+            lookup = json.load(f)
+
+        self.assertIn('<symbol id="heroicon-mini-academic-cap" viewBox="0 0 20 20">', content)
+        self.assertIn('<symbol id="svg-icon-material-abacus" viewBox="0 0 24 24"><path d=', content)
+        self.assertEqual(
+            set(lookup['icons']), {'heroicon-mini-academic-cap', 'heroicon-outline-x-mark', 'svg-icon-material-abacus'}
+        )
+        self.assertEqual(len(lookup['version']), 12)
+
+    def test_invalid_icon_argument(self):
+        with self.assertRaises(build_icon_sprite.CommandError):
+            self.build('--icon', 'other:solid:x-mark')
+
+    def test_icons_of_the_sprite_are_referenced(self):
+        self.build()
+        clear_icon_caches()
+
+        with override_settings(ICON_SPRITE_ENABLED=True, STATICFILES_DIRS=[self.static_dir]):
+            version = sprite.get_icon_sprite_lookup()['version']
+
+            heroicon = heroicons_helpers.render_icon('mini', 'academic-cap', 16, fill='red')
+            inline_heroicon = heroicons_helpers.render_icon('mini', 'academic-cap', 16, stroke_linecap='round')
+            svg_icon = svg_icon_helpers.render_icon('material', 'abacus', 24, 20, 'red', 'evenodd', 1, '', '')
+            other_svg_icon = svg_icon_helpers.render_icon('custom', 'badge', 24, 20, 'red', 'evenodd', 1, '', '')
+
+        self.assertIn(f'<use href="/static/icons/sprite.svg?v={version}#heroicon-mini-academic-cap">', heroicon)
+        self.assertIn('width="16"', heroicon)
+        self.assertIn('fill="red"', heroicon)
+        self.assertIn('viewBox="0 0 20 20"', heroicon)
+        self.assertNotIn('<use', inline_heroicon)
+        self.assertIn('#svg-icon-material-abacus', svg_icon)
+        self.assertNotIn('<use', other_svg_icon)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.test import SimpleTestCase
+
+from apps.core.templatetags.heroicons import helpers as heroicons_helpers
+from apps.core.templatetags.svg_icon import helpers as svg_icon_helpers
+from apps.utils.helpers.file import MappedZipArchive, get_mapped_zip_archive
+
+ICON_ZIP_PATHS = [
+    os.path.join(os.path.dirname(svg_icon_helpers.__file__), 'data/material_icons.zip'),
+    os.path.join(os.path.dirname(svg_icon_helpers.__file__), 'data/custom_icons.zip'),
+    os.path.join(os.path.dirname(heroicons_helpers.__file__), 'data/heroicons.zip'),
+]
+
+
+class MappedZipArchiveTests(SimpleTestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir, ignore_errors=True)
+
+    def get_zip_path(self, members):
+        path = os.path.join(self.tmp_dir, 'test.zip')
+
+        with zipfile.ZipFile(path, 'w') as zip_file:
+            for info, data in members:
+                zip_file.writestr(info, data)
+
+        return path
+
+    def test_members_are_read_like_zipfile(self):
+        stored = zipfile.ZipInfo('stored.txt')
+        deflated = zipfile.ZipInfo('dir/deflated.txt')
+        deflated.compress_type = zipfile.ZIP_DEFLATED
+        # the local header has its own extra field, which the offset of the data must skip
+        extra = zipfile.ZipInfo('extra.txt')
+        extra.extra = b'\xfe\xca\x04\x00abcd'
+
+        path = self.get_zip_path([(stored, b'stored ' * 10), (deflated, b'deflated ' * 100), (extra, b'extra')])
+        archive = MappedZipArchive(path)
+
+        with zipfile.ZipFile(path) as zip_file:
+            for name in zip_file.namelist():
+                self.assertEqual(archive.read(name), zip_file.read(name))
+
+        self.assertIn('dir/deflated.txt', archive)
+        self.assertEqual(archive.namelist(), ['stored.txt', 'dir/deflated.txt', 'extra.txt'])
+
+    def test_missing_member_raises_key_error(self):
+        archive = MappedZipArchive(self.get_zip_path([(zipfile.ZipInfo('a.txt'), b'a')]))
+
+        with self.assertRaises(KeyError):
+            archive.read('b.txt')
+
+    def test_unsupported_compression_raises(self):
+        info = zipfile.ZipInfo('a.txt')
+        info.compress_type = zipfile.ZIP_BZIP2
+        archive = MappedZipArchive(self.get_zip_path([(info, b'a')]))
+
+        with self.assertRaises(NotImplementedError):
+            archive.read('a.txt')
+
+    def test_icon_archives_are_read_like_zipfile(self):
+        for path in ICON_ZIP_PATHS:
+            archive = get_mapped_zip_archive(path)
+            self.assertIs(archive, get_mapped_zip_archive(path))
+
+            with zipfile.ZipFile(path) as zip_file:
+                for name in zip_file.namelist():
+                    self.assertEqual(archive.read(name), zip_file.read(name), name)
+
+
+class IconLoaderTests(SimpleTestCase):
+
+    def test_svg_icon_path(self):
+        path = svg_icon_helpers.load_path('material', 'abacus')
+
+        self.assertTrue(path)
+        self.assertFalse(path.startswith('"'))
+        self.assertIsNone(svg_icon_helpers.load_path('material', 'missing-icon'))
+        self.assertIsNone(svg_icon_helpers.load_path('missing', 'abacus'))
+
+    def test_heroicon_is_loaded(self):
+        svg = heroicons_helpers._load_icon('mini', 'academic-cap')
+        self.assertEqual(svg.tag, 'svg')
+
+        with self.assertRaises(heroicons_helpers.IconDoesNotExist):
+            heroicons_helpers._load_icon('mini', 'missing-icon')
+
+    def test_rendered_heroicon_is_cached(self):
+        first = heroicons_helpers.render_icon('mini', 'academic-cap', 24, stroke_linecap='round')
+        second = heroicons_helpers.render_icon('mini', 'academic-cap', 24, stroke_linecap='round')
+
+        self.assertIs(first, second)
+        self.assertIn('width="24"', first)
+        self.assertIn('stroke-linecap="round"', first)
+
+        # unhashable arguments are rendered without the cache
+        self.assertIn('class="[', heroicons_helpers.render_icon('mini', 'academic-cap', 24, **{'class': ['a']}))
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+from PIL import Image
+
+from apps.core.tests.base import get_image_file
+from apps.utils.helpers import image as image_helpers
+from apps.utils.helpers.image import get_processed_images, get_draft_size_or_none
+
+
+class GetProcessedImagesTests(SimpleTestCase):
+
+    def test_outputs_keep_params_order(self):
+        params_list = [
+            {'size': [160, 120], 'force_format': 'WEBP', 'prefix': 'xs-'},
+            {'size': [800, 600], 'force_format': 'WEBP', 'prefix': 'md-'},
+            {'size': [480, 360], 'force_format': 'JPEG', 'prefix': 'sm-'},
+        ]
+
+        outputs = get_processed_images(get_image_file(size=(1024, 768)), 'photo.png', params_list)
+
+        self.assertEqual([name for _, name in outputs], ['xs-photo.webp', 'md-photo.webp', 'sm-photo.jpg'])
+
+        sizes = []
+        for out_file, _ in outputs:
+            with Image.open(out_file) as image:
+                sizes.append(image.size)
+
+        self.assertEqual(sizes, [(160, 120), (800, 600), (480, 360)])
+
+    def test_source_is_decoded_once(self):
+        params_list = [{'size': [40, 30]}, {'size': [160, 120]}, {'size': [480, 360]}]
+
+        with mock.patch.object(image_helpers.Image, 'open', wraps=Image.open) as image_open:
+            get_processed_images(get_image_file(), 'photo.png', params_list)
+
+        self.assertEqual(image_open.call_count, 1)
+
+    def test_jpeg_is_drafted_to_the_largest_size(self):
+        self.assertEqual(get_draft_size_or_none([{'size': [40, 30]}, {'size': [160, 120]}]), (160, 160))
+        self.assertIsNone(get_draft_size_or_none([{'size': [160, 120]}, {'size': [None, 120]}]))
+
+        outputs = get_processed_images(
+            get_image_file(size=(2048, 1536), fmt='JPEG'), 'photo.jpg', [{'size': [160, 120]}, {'size': [40, 30]}]
+        )
+
+        for (out_file, _), size in zip(outputs, [(160, 120), (40, 30)]):
+            with Image.open(out_file) as image:
+                self.assertEqual(image.size, size)
+
+    def test_invalid_image_returns_empty_outputs(self):
+        outputs = get_processed_images(ContentFile(b'not an image'), 'photo.png', [{'size': [40, 30]}] * 2)
+
+        self.assertEqual(outputs, [(None, ''), (None, '')])
+
+    def test_image_over_max_pixels_is_rejected(self):
+        outputs = get_processed_images(get_image_file(), 'photo.png', [{'size': [40, 30]}], max_pixels=1000)
+        self.assertEqual(outputs, [(None, '')])
+
+        with mock.patch.object(image_helpers.Image, 'open', side_effect=Image.DecompressionBombError):
+            outputs = get_processed_images(get_image_file(), 'photo.png', [{'size': [40, 30]}])
+
+        self.assertEqual(outputs, [(None, '')])
+
+    def test_large_outputs_are_spooled_to_disk(self):
+        params_list = [{'size': [40, 30], 'force_format': 'PNG'}]
+
+        (small, _), = get_processed_images(get_image_file(), 'photo.png', params_list)
+        (large, _), = get_processed_images(get_image_file(), 'photo.png', params_list, spool_max_size=10)
+
+        self.assertFalse(small._rolled)
+        self.assertTrue(large._rolled)
+        self.assertEqual(small.read(), large.read())
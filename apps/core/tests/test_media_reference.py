@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+
+from apps.attachment.models import FileAttachment
+from apps.core.helpers import check_media_reference_exists
+from apps.core.models import MediaReference, NavigationLink, get_media_reference_models
+from apps.core.signals import post_delete_media_reference, post_save_media_reference
+from apps.core.tests.base import ModelTestCase
+
+
+class BackfillItem(models.Model):
+    file = models.FileField(blank=True)
+    thumbnail = models.FileField(blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+def get_references(instance):
+    return dict(
+        MediaReference.objects.filter(
+            content_type=ContentType.objects.get_for_model(instance), object_id=str(instance.pk)
+        ).values_list('field_name', 'name')
+    )
+
+
+class MediaReferenceSignalTests(ModelTestCase):
+
+    def test_references_follow_saves_and_deletes(self):
+        attachment = FileAttachment.objects.create(file='docs/a.txt')
+        self.assertEqual(get_references(attachment), {'file': 'docs/a.txt'})
+
+        attachment.file = 'docs/b.txt'
+        attachment.save()
+        self.assertEqual(get_references(attachment), {'file': 'docs/b.txt'})
+
+        attachment.delete()
+        self.assertFalse(MediaReference.objects.filter(name='docs/b.txt').exists())
+
+    def test_save_with_update_fields_only_syncs_those_fields(self):
+        attachment = FileAttachment.objects.create(file='docs/a.txt')
+
+        attachment.file = 'docs/b.txt'
+        attachment.save(update_fields=['name'])
+        self.assertEqual(get_references(attachment), {'file': 'docs/a.txt'})
+
+        attachment.save(update_fields=['file'])
+        self.assertEqual(get_references(attachment), {'file': 'docs/b.txt'})
+
+    def test_reference_of_other_instances_is_checked(self):
+        first = FileAttachment.objects.create(file='docs/a.txt')
+
+        self.assertTrue(check_media_reference_exists('docs/a.txt'))
+        self.assertFalse(check_media_reference_exists('docs/a.txt', instance=first))
+
+        FileAttachment.objects.create(file='docs/a.txt')
+        self.assertTrue(check_media_reference_exists('docs/a.txt', instance=first))
+        self.assertEqual(MediaReference.objects.referenced_names(['docs/a.txt', 'docs/b.txt']), {'docs/a.txt'})
+
+    def test_receivers_are_connected_to_file_models_only(self):
+        self.assertIn(FileAttachment, get_media_reference_models())
+        self.assertNotIn(NavigationLink, get_media_reference_models())
+
+        self.assertIn(post_save_media_reference, post_save._live_receivers(FileAttachment))
+        self.assertNotIn(post_save_media_reference, post_save._live_receivers(NavigationLink))
+        self.assertNotIn(post_delete_media_reference, post_delete._live_receivers(NavigationLink))
+
+
+class MediaReferenceBackfillTests(ModelTestCase):
+    test_models = (BackfillItem, )
+
+    def setUp(self):
+        # the content type of the test model is rolled back after each test, but stays cached
+        ContentType.objects.clear_cache()
+
+    def test_backfill_reconciles_references(self):
+        # bulk_create sends no signals, the index is empty
+        first, second, third = BackfillItem.objects.bulk_create([
+            BackfillItem(file='a.txt', thumbnail='a.png'),
+            BackfillItem(file='b.txt'),
+            BackfillItem(file='c.txt'),
+        ])
+
+        self.assertEqual(MediaReference.objects.backfill(BackfillItem, batch_size=2), (4, 0, 0))
+        self.assertEqual(get_references(first), {'file': 'a.txt', 'thumbnail': 'a.png'})
+
+        # queryset updates and deletes send no signals either, a re-run repairs the index
+        BackfillItem.objects.filter(pk=first.pk).update(file='d.txt', thumbnail='')
+        BackfillItem.objects.filter(pk=third.pk).delete()
+
+        self.assertEqual(MediaReference.objects.backfill(BackfillItem, batch_size=2), (0, 1, 2))
+        self.assertEqual(get_references(first), {'file': 'd.txt'})
+        self.assertEqual(get_references(second), {'file': 'b.txt'})
+        self.assertEqual(get_references(third), {})
+
+        self.assertEqual(MediaReference.objects.backfill(BackfillItem), (0, 0, 0))
+
+    def test_command_reports_counts(self):
+        BackfillItem.objects.bulk_create([BackfillItem(file='a.txt')])
+        stdout = StringIO()
+
+        call_command('run_backfill_media_reference', model=['attachment.FileAttachment'], stdout=stdout)
+        self.assertNotIn('core.BackfillItem', stdout.getvalue())
+
+        call_command('run_backfill_media_reference', model=['core.BackfillItem'], stdout=stdout)
+        self.assertIn('core.BackfillItem: 1 references created, 0 updated, 0 removed', stdout.getvalue())
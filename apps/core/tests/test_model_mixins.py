@@ -0,0 +1,194 @@
+from unittest import mock
+
+from django.db import models
+
+from apps.core.tests.base import ModelTestCase
+from apps.utils.mixins.models.atoms import SoftDeleteModelMixin
+from apps.utils.mixins.models.core import (
+    RemoveFieldFileOnChangeMixin, RemoveFieldFileOnDeleteMixin, StoredFieldsMixin, get_stored_fields,
+)
+
+
+class BulkDeleteItem(RemoveFieldFileOnDeleteMixin, models.Model):
+    file = models.FileField(blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+class SoftDeleteItem(SoftDeleteModelMixin, RemoveFieldFileOnDeleteMixin, models.Model):
+    file = models.FileField(blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+class KeepFileItem(RemoveFieldFileOnDeleteMixin, models.Model):
+    file = models.FileField(blank=True)
+    thumbnail = models.FileField(blank=True)
+
+    filefields_to_remove_on_delete = ('thumbnail', )
+
+    class Meta:
+        app_label = 'core'
+
+
+class TrackedItem(StoredFieldsMixin, models.Model):
+    title = models.CharField(max_length=50, blank=True)
+    body = models.TextField(blank=True)
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL)
+
+    class Meta:
+        app_label = 'core'
+
+    @classmethod
+    def get_stored_field_names(cls):
+        return super().get_stored_field_names() + ('title', 'parent', 'missing')
+
+
+class ChangeFileItem(RemoveFieldFileOnChangeMixin, models.Model):
+    title = models.CharField(max_length=50, blank=True)
+    file = models.FileField(blank=True)
+    thumbnail = models.FileField(blank=True)
+
+    class Meta:
+        app_label = 'core'
+
+
+class QuerySetByInstanceDeleteTests(ModelTestCase):
+    test_models = (BulkDeleteItem, SoftDeleteItem, KeepFileItem)
+
+    def test_delete_in_bulk(self):
+        BulkDeleteItem.objects.bulk_create(BulkDeleteItem() for _ in range(3))
+
+        # one select to collect the files, one set-based delete
+        with self.assertNumQueries(2):
+            deleted, _ = BulkDeleteItem.objects.all().delete()
+
+        self.assertEqual(deleted, 3)
+        self.assertFalse(BulkDeleteItem.objects.exists())
+
+    def test_delete_override_runs_per_instance(self):
+        SoftDeleteItem.objects.bulk_create(SoftDeleteItem() for _ in range(3))
+
+        # one select, then one update per soft deleted instance
+        with self.assertNumQueries(4):
+            deleted, _ = SoftDeleteItem.objects.all().delete()
+
+        self.assertEqual(deleted, 3)
+        self.assertEqual(SoftDeleteItem.objects.filter(deleted=True).count(), 3)
+
+    @mock.patch('apps.utils.mixins.models.core.remove_storage_files_on_commit')
+    def test_delete_removes_only_listed_file_fields(self, remove_storage_files_on_commit):
+        KeepFileItem.objects.create(file='keep/a.txt', thumbnail='remove/a.txt')
+        KeepFileItem.objects.create(file='keep/b.txt', thumbnail='remove/b.txt')
+
+        KeepFileItem.objects.all().delete()
+
+        removed = [name for call in remove_storage_files_on_commit.call_args_list for name in call.args[0]]
+        self.assertEqual(sorted(removed), ['remove/a.txt', 'remove/b.txt'])
+
+    @mock.patch('apps.utils.mixins.models.core.remove_storage_files_on_commit')
+    def test_instance_delete_removes_only_listed_file_fields(self, remove_storage_files_on_commit):
+        KeepFileItem.objects.create(file='keep/a.txt', thumbnail='remove/a.txt').delete()
+
+        removed = [name for call in remove_storage_files_on_commit.call_args_list for name in call.args[0]]
+        self.assertEqual(removed, ['remove/a.txt'])
+
+
+class StoredFieldsMixinTests(ModelTestCase):
+    test_models = (TrackedItem, ChangeFileItem)
+
+    def test_stored_fields_resolved_per_model(self):
+        attnames, indexes, lookup = get_stored_fields(TrackedItem)
+
+        # unknown names are left out, foreign keys are kept by attname
+        self.assertEqual(attnames, ('title', 'parent_id'))
+        self.assertEqual(indexes, (1, 3))
+        self.assertEqual(lookup, {'title': 0, 'parent': 1, 'parent_id': 1})
+        self.assertEqual(get_stored_fields(ChangeFileItem)[0], ('file', 'thumbnail'))
+
+    def test_from_db_keeps_only_watched_values(self):
+        parent = TrackedItem.objects.create(title='parent')
+        TrackedItem.objects.create(title='child', body='long body', parent=parent)
+
+        item = TrackedItem.objects.get(title='child')
+
+        self.assertEqual(item._stored, ('child', parent.pk))
+        self.assertEqual(item.get_stored_value('title'), 'child')
+        self.assertEqual(item.get_stored_value('parent'), parent.pk)
+        self.assertEqual(item.get_stored_value('parent_id'), parent.pk)
+        self.assertIsNone(item.get_stored_value('body'))
+
+    def test_from_db_with_deferred_fields(self):
+        parent = TrackedItem.objects.create(title='parent')
+        TrackedItem.objects.create(title='child', parent=parent)
+
+        item = TrackedItem.objects.only('parent').get(parent=parent)
+
+        self.assertEqual(item._stored, (None, parent.pk))
+
+        with self.assertNumQueries(0):
+            item.set_stored()
+
+        # deferred fields are not loaded to be kept
+        self.assertEqual(item._stored, (None, parent.pk))
+
+    def test_unsaved_instance_has_no_stored_values(self):
+        item = TrackedItem(title='new')
+
+        self.assertIsNone(item._stored)
+        self.assertIsNone(item.get_stored_value('title'))
+
+    def test_save_keeps_current_values(self):
+        item = TrackedItem.objects.create(title='first')
+        self.assertEqual(item.get_stored_value('title'), 'first')
+
+        item.title = 'second'
+        item.save()
+        self.assertEqual(item.get_stored_value('title'), 'second')
+
+    def test_save_with_update_fields_keeps_only_updated_values(self):
+        parent = TrackedItem.objects.create(title='parent')
+        item = TrackedItem.objects.create(title='first')
+
+        item.title = 'second'
+        item.parent = parent
+        item.save(update_fields=['parent'])
+
+        self.assertEqual(item.get_stored_value('title'), 'first')
+        self.assertEqual(item.get_stored_value('parent'), parent.pk)
+
+    @mock.patch('apps.utils.mixins.models.core.remove_storage_files_on_commit')
+    def test_changed_file_removed_on_save(self, remove_storage_files_on_commit):
+        ChangeFileItem.objects.create(file='files/a.txt', thumbnail='thumbs/a.txt')
+        item = ChangeFileItem.objects.get()
+
+        item.file = 'files/b.txt'
+        item.save()
+
+        remove_storage_files_on_commit.assert_called_once_with(['files/a.txt'], storage=item.file.storage)
+        self.assertEqual(item.get_stored_value('file'), 'files/b.txt')
+
+    @mock.patch('apps.utils.mixins.models.core.remove_storage_files_on_commit')
+    def test_unchanged_files_kept_on_later_saves(self, remove_storage_files_on_commit):
+        item = ChangeFileItem.objects.create(file='files/a.txt', thumbnail='thumbs/a.txt')
+
+        item.title = 'first'
+        item.save()
+        item.title = 'second'
+        item.save()
+
+        remove_storage_files_on_commit.assert_not_called()
+
+    @mock.patch('apps.utils.mixins.models.core.remove_storage_files_on_commit')
+    def test_file_replaced_twice_removes_each_previous_file(self, remove_storage_files_on_commit):
+        item = ChangeFileItem.objects.create(file='files/a.txt')
+
+        item.file = 'files/b.txt'
+        item.save()
+        item.file = 'files/c.txt'
+        item.save()
+
+        removed = [call.args[0] for call in remove_storage_files_on_commit.call_args_list]
+        self.assertEqual(removed, [['files/a.txt'], ['files/b.txt']])
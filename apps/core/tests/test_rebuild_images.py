@@ -0,0 +1,104 @@
+import json
+import os
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import models
+from django.test import override_settings
+from django.utils import timezone
+
+from apps.attachment.models import ImageAttachment
+from apps.core.management.commands.run_rebuild_images import get_image_models, rebuild_image
+from apps.core.tests.base import ModelTestCase, get_image_file
+from apps.utils.mixins.models.atoms import LogoSizeImageMixin
+
+PARAMS = {'size': [160, 120], 'prefix': 'xs-', 'force_format': 'WEBP'}
+
+
+class RebuildImageItem(LogoSizeImageMixin, models.Model):
+
+    class Meta:
+        app_label = 'core'
+
+
+@override_settings(STORAGE_DELETE_QUEUE=None)
+class RebuildImagesTests(ModelTestCase):
+    test_models = (RebuildImageItem, )
+
+    def run_command(self, *args):
+        stdout = StringIO()
+        call_command('run_rebuild_images', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_image_models(self):
+        image_models = get_image_models()
+
+        self.assertIn(RebuildImageItem, image_models)
+        self.assertIn(ImageAttachment, image_models)
+
+    def test_rebuild_replaces_resized_images(self):
+        item = RebuildImageItem.objects.create(image=get_image_file())
+        stored_name = item.image_xs.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(rebuild_image('core.RebuildImageItem', item.pk), (item.pk, None))
+
+        item.refresh_from_db()
+        self.assertEqual(item.image_out_status, {'image_xs': 'ready', 'image_md': 'ready'})
+        self.assertNotEqual(item.image_xs.name, stored_name)
+        self.assertTrue(default_storage.exists(item.image_xs.name))
+        self.assertFalse(default_storage.exists(stored_name))
+
+    def test_failed_rebuild_is_reported(self):
+        item = RebuildImageItem.objects.create(image=get_image_file())
+
+        with mock.patch('apps.utils.mixins.models.atoms.get_processed_images_as_field_files', side_effect=OSError):
+            with self.assertLogs('custom', 'ERROR'):
+                pk, error = rebuild_image('core.RebuildImageItem', item.pk)
+
+        self.assertEqual(pk, item.pk)
+        self.assertTrue(error)
+
+        item.refresh_from_db()
+        self.assertEqual(item.image_out_status, {'image_xs': 'failed', 'image_md': 'failed'})
+
+    def test_rebuild_of_missing_instance_is_skipped(self):
+        self.assertEqual(rebuild_image('core.RebuildImageItem', 0), (0, None))
+
+    def test_rebuild_image_attachment(self):
+        attachment = ImageAttachment.objects.create(image_raw=get_image_file(), params=PARAMS)
+        image_out = attachment.image_out.name
+
+        self.assertEqual(rebuild_image('attachment.ImageAttachment', attachment.pk), (attachment.pk, None))
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.image_out.name, image_out)
+        self.assertTrue(default_storage.exists(image_out))
+
+    def test_dry_run_counts_filtered_instances(self):
+        ImageAttachment.objects.create(image_raw=get_image_file(), params=PARAMS)
+        RebuildImageItem.objects.create(image=get_image_file())
+
+        output = self.run_command('--dry-run', '--model', 'attachment.ImageAttachment')
+        self.assertIn('attachment.ImageAttachment: 1 instances to rebuild', output)
+        self.assertNotIn('core.RebuildImageItem', output)
+
+        since = (timezone.now() + timedelta(days=1)).isoformat()
+        output = self.run_command('--dry-run', '--model', 'attachment.ImageAttachment', '--since', since)
+        self.assertIn('attachment.ImageAttachment: 0 instances to rebuild', output)
+
+    def test_dry_run_resumes_from_checkpoint(self):
+        first = ImageAttachment.objects.create(image_raw=get_image_file(), params=PARAMS)
+        ImageAttachment.objects.create(image_raw=get_image_file(), params=PARAMS)
+
+        checkpoint = os.path.join(self.media_root, 'checkpoint.json')
+        with open(checkpoint, 'w') as f:
+            json.dump({'attachment.ImageAttachment': first.pk}, f)
+
+        output = self.run_command(
+            '--dry-run', '--model', 'attachment.ImageAttachment', '--resume', '--checkpoint', checkpoint
+        )
+        self.assertIn('attachment.ImageAttachment: 1 instances to rebuild', output)
@@ -0,0 +1,86 @@
+from django.template import Context, Template
+from django.test import SimpleTestCase
+
+from apps.core.helpers import CompiledTemplateCache, compiled_template_cache
+
+
+class CompiledTemplateCacheTests(SimpleTestCase):
+
+    def test_templates_are_compiled_once(self):
+        templates = CompiledTemplateCache()
+
+        first = templates.get_template_or_none('{{ a }}')
+        second = templates.get_template_or_none('{{ a }}')
+
+        self.assertIs(first, second)
+        self.assertEqual(first.render(Context({'a': 1})), '1')
+        self.assertEqual(templates.stats()['hits'], 1)
+        self.assertEqual(templates.stats()['misses'], 1)
+
+    def test_least_recently_used_template_is_evicted(self):
+        templates = CompiledTemplateCache(max_size=2)
+
+        templates.get_template_or_none('a')
+        templates.get_template_or_none('b')
+        templates.get_template_or_none('a')
+        templates.get_template_or_none('c')
+
+        self.assertEqual(templates.stats()['size'], 2)
+
+        templates.get_template_or_none('a')
+        templates.get_template_or_none('b')
+        self.assertEqual(templates.stats()['hits'], 2)
+        self.assertEqual(templates.stats()['misses'], 4)
+
+    def test_content_size_is_bounded(self):
+        templates = CompiledTemplateCache(max_content_size=10)
+
+        templates.get_template_or_none('aaaa')
+        templates.get_template_or_none('bbbb')
+        templates.get_template_or_none('cccc')
+        self.assertEqual((templates.stats()['size'], templates.stats()['content_size']), (2, 8))
+
+        # too large to be cached at all
+        self.assertEqual(templates.get_template_or_none('d' * 11).render(Context()), 'd' * 11)
+        self.assertEqual((templates.stats()['size'], templates.stats()['content_size']), (2, 8))
+
+    def test_syntax_error_is_cached(self):
+        templates = CompiledTemplateCache()
+
+        with self.assertLogs('custom', 'WARNING'):
+            self.assertIsNone(templates.get_template_or_none('{% if %}'))
+
+        self.assertIsNone(templates.get_template_or_none('{% if %}'))
+        self.assertEqual(templates.stats()['hits'], 1)
+
+    def test_clear(self):
+        templates = CompiledTemplateCache()
+        templates.get_template_or_none('a')
+
+        templates.clear()
+
+        self.assertEqual(templates.stats(), {
+            'hits': 0, 'misses': 0, 'size': 0, 'max_size': 256, 'content_size': 0, 'max_content_size': 4 * 1024 * 1024
+        })
+
+
+class RenderTemplateTagTests(SimpleTestCase):
+
+    def setUp(self):
+        compiled_template_cache.clear()
+
+    def render(self, **context):
+        return Template('{% load render_template %}{% render_template content %}').render(Context(context))
+
+    def test_content_is_rendered_with_context(self):
+        self.assertEqual(self.render(content='Hello {{ name }}', name='World'), 'Hello World')
+        self.assertEqual(self.render(content='Hello {{ name }}', name='again'), 'Hello again')
+
+        self.assertEqual(compiled_template_cache.stats()['hits'], 1)
+
+    def test_missing_empty_or_invalid_content_renders_nothing(self):
+        self.assertEqual(self.render(), '')
+        self.assertEqual(self.render(content=''), '')
+
+        with self.assertLogs('custom', 'WARNING'):
+            self.assertEqual(self.render(content='{% if %}'), '')
@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.db import models
+from django.test import override_settings
+from PIL import Image
+
+from apps.core.tests.base import ModelTestCase, get_image_file
+from apps.utils.mixins.models.atoms import LogoSizeImageMixin
+from apps.utils.tasks import task_process_image_out_fields
+
+
+class ResizeImageItem(LogoSizeImageMixin, models.Model):
+
+    class Meta:
+        app_label = 'core'
+
+
+class ResizeImageSaveMixinTests(ModelTestCase):
+    test_models = (ResizeImageItem, )
+
+    def test_save_resizes_images(self):
+        item = ResizeImageItem.objects.create(image=get_image_file())
+
+        self.assertEqual(item.image_out_status, {'image_xs': 'ready', 'image_md': 'ready'})
+        self.assertTrue(item.image_xs.name.endswith('.webp'))
+
+        with Image.open(item.image_xs) as image:
+            self.assertEqual(image.size, (160, 120))
+
+        self.assertEqual(item.get_image_out_url('image_xs'), item.image_xs.url)
+
+    @override_settings(IMAGE_OUT_ASYNC=True)
+    @mock.patch('apps.utils.mixins.models.atoms.task_process_image_out_fields')
+    def test_async_save_queues_images_once_committed(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            item = ResizeImageItem.objects.create(image=get_image_file())
+
+        task.delay.assert_called_once_with('core', 'resizeimageitem', item.pk, item.image.name)
+
+        self.assertFalse(item.image_xs)
+        self.assertEqual(item.image_out_status, {'image_xs': 'pending', 'image_md': 'pending'})
+        # falls back to the original until the resized image is ready
+        self.assertEqual(item.get_image_out_url('image_xs'), item.image.url)
+
+        task_process_image_out_fields('core', 'resizeimageitem', item.pk, item.image.name)
+        item.refresh_from_db()
+
+        self.assertEqual(item.image_out_status, {'image_xs': 'ready', 'image_md': 'ready'})
+        self.assertEqual(item.get_image_out_url('image_xs'), item.image_xs.url)
+
+    @override_settings(IMAGE_OUT_ASYNC=True)
+    @mock.patch('apps.utils.mixins.models.atoms.task_process_image_out_fields')
+    def test_task_skips_replaced_image(self, task):
+        item = ResizeImageItem.objects.create(image=get_image_file())
+
+        task_process_image_out_fields('core', 'resizeimageitem', item.pk, 'core/replaced.png')
+        item.refresh_from_db()
+
+        self.assertFalse(item.image_xs)
+        self.assertEqual(item.image_out_status, {'image_xs': 'pending', 'image_md': 'pending'})
@@ -0,0 +1,66 @@
+import re
+
+from django.test import SimpleTestCase
+
+from apps.core.middleware.authrequired import AuthRequiredMiddleware
+from apps.core.middleware.routematcher import RouteMatcher, get_route_matcher
+
+PATHS = [
+    '/',
+    '/admin/',
+    '/admin/log/visitlog/',
+    '/static/css/app.css',
+    '/account/login/',
+    '/account/login/next/',
+    '/account/reset/MQ/set-password/',
+    '/account/reset/MQ/abc-0123456789abcdef0123456789abcdef/',
+    '/account/reset/MQ/abc_0123456789abcdef0123456789abcdef/',
+    '/maintenance/',
+    '/blog/admin/',
+]
+
+
+class RouteMatcherTests(SimpleTestCase):
+
+    def assertMatchesLikeRegexes(self, patterns, paths=PATHS):
+        matcher = RouteMatcher(patterns)
+
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertEqual(matcher.match(path), any(re.match(pattern, path) for pattern in patterns))
+
+    def test_matches_like_separate_patterns(self):
+        self.assertMatchesLikeRegexes(AuthRequiredMiddleware.allowed_patterns)
+        self.assertMatchesLikeRegexes([r'^/$'])
+
+    def test_patterns_sharing_group_names_are_joined(self):
+        patterns = [r'^/a/(?P<slug>\w+)/$', r'^/b/(?P<slug>\w+)/$']
+        matcher = RouteMatcher(patterns)
+
+        self.assertIsNotNone(matcher.regex)
+        self.assertMatchesLikeRegexes(patterns, ['/a/x/', '/b/x/', '/c/x/'])
+
+    def test_back_references_fall_back_to_separate_patterns(self):
+        patterns = [r'^/(?P<part>\w+)/(?P=part)/$', r'^/static/']
+        matcher = RouteMatcher(patterns)
+
+        self.assertIsNone(matcher.regex)
+        self.assertMatchesLikeRegexes(patterns, ['/a/a/', '/a/b/', '/static/app.css'])
+
+    def test_no_patterns_match_nothing(self):
+        self.assertFalse(RouteMatcher([]).match('/'))
+
+    def test_results_are_cached_per_path(self):
+        matcher = RouteMatcher([r'^/admin/'], cache_size=2)
+
+        for path in ('/admin/', '/admin/', '/', '/other/', '/admin/'):
+            matcher.match(path)
+
+        info = matcher.match.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 4, 2))
+
+    def test_matchers_are_shared_per_pattern_list(self):
+        patterns = (r'^/admin/', r'^/static/')
+
+        self.assertIs(get_route_matcher(patterns), get_route_matcher(tuple(patterns)))
+        self.assertIsNot(get_route_matcher(patterns), get_route_matcher(patterns[:1]))
@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.core import helpers
+from apps.core.helpers import get_auth_required_or_false, get_maintenance_mode_or_false, get_site_config_or_none, \
+    invalidate_site_config_cache, SITE_CONFIG_VERSION_KEY
+from apps.core.models import NavigationLink, SiteConfig
+
+
+@override_settings(SITE_CONFIG_LOCAL_TTL=5)
+class SiteConfigSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        invalidate_site_config_cache()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.site_config = SiteConfig.objects.create(site=Site.objects.get_current(), is_active=True)
+            NavigationLink.objects.create(site_config=self.site_config, title='Home', target='/')
+
+    def test_snapshot_is_preloaded_and_reused(self):
+        site_config = get_site_config_or_none()
+        self.assertEqual(site_config.pk, self.site_config.pk)
+
+        with self.assertNumQueries(0):
+            site_config = get_site_config_or_none()
+
+            self.assertEqual(site_config.site.domain, 'example.com')
+            self.assertEqual([link.title for link in site_config.navigation_link.all()], ['Home'])
+            self.assertFalse(site_config.config_google_recaptcha.is_active)
+            self.assertFalse(get_maintenance_mode_or_false())
+            self.assertFalse(get_auth_required_or_false())
+
+    @override_settings(SITE_CONFIG_LOCAL_TTL=0)
+    def test_snapshot_of_other_process_is_read_from_cache(self):
+        get_site_config_or_none()
+
+        # another process with the same version only reads the shared cache
+        helpers._site_config_local['version'] = None
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_site_config_or_none().pk, self.site_config.pk)
+
+    def test_save_invalidates_snapshot(self):
+        get_site_config_or_none()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.site_config.maintenance_mode = True
+            self.site_config.save()
+
+        self.assertTrue(get_maintenance_mode_or_false())
+
+    def test_version_is_checked_after_local_ttl(self):
+        with mock.patch.object(helpers.time, 'monotonic', return_value=1000.0):
+            get_site_config_or_none()
+
+        # a save in another process only replaces the shared version
+        SiteConfig.objects.filter(pk=self.site_config.pk).update(auth_required=True)
+        cache.set(SITE_CONFIG_VERSION_KEY, 'other')
+
+        with mock.patch.object(helpers.time, 'monotonic', return_value=1004.0):
+            self.assertFalse(get_auth_required_or_false())
+
+        with mock.patch.object(helpers.time, 'monotonic', return_value=1006.0):
+            self.assertTrue(get_auth_required_or_false())
+
+    def test_no_active_site_config(self):
+        # queryset updates send no signals
+        SiteConfig.objects.update(is_active=False)
+        invalidate_site_config_cache()
+
+        self.assertIsNone(get_site_config_or_none())
+        self.assertFalse(get_maintenance_mode_or_false())
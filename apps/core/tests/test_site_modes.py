@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sites.models import Site
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from apps.core.helpers import invalidate_site_config_cache
+from apps.core.middleware.authrequired import AuthRequiredMiddleware
+from apps.core.middleware.maintenancemode import MaintenanceModeMiddleware
+from apps.core.models import SiteConfig
+
+
+class SiteModeMiddlewareTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        invalidate_site_config_cache()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.site_config = SiteConfig.objects.create(site=Site.objects.get_current(), is_active=True)
+
+    def set_mode(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in kwargs.items():
+                setattr(self.site_config, name, value)
+
+            self.site_config.save()
+
+    def get_response(self, middleware, path, user=None):
+        request = RequestFactory().get(path)
+        request.user = user or AnonymousUser()
+        return middleware(request)
+
+    def test_maintenance_mode_is_toggled_at_runtime(self):
+        middleware = MaintenanceModeMiddleware(lambda request: HttpResponse())
+        staff = get_user_model().objects.create_user(username='staff', password='secret', is_staff=True)
+
+        self.assertEqual(self.get_response(middleware, '/').status_code, 200)
+
+        self.set_mode(maintenance_mode=True)
+
+        response = self.get_response(middleware, '/')
+        self.assertRedirects(response, reverse('maintenance'), fetch_redirect_response=False)
+        self.assertEqual(self.get_response(middleware, '/account/login/').status_code, 200)
+        self.assertEqual(self.get_response(middleware, '/', user=staff).status_code, 200)
+
+        self.set_mode(maintenance_mode=False)
+
+        self.assertEqual(self.get_response(middleware, '/').status_code, 200)
+
+    def test_auth_required_is_toggled_at_runtime(self):
+        middleware = AuthRequiredMiddleware(lambda request: HttpResponse())
+        user = get_user_model().objects.create_user(username='user', password='secret')
+
+        self.assertEqual(self.get_response(middleware, '/').status_code, 200)
+
+        self.set_mode(auth_required=True)
+
+        response = self.get_response(middleware, '/')
+        self.assertRedirects(response, reverse('account:login'), fetch_redirect_response=False)
+        self.assertEqual(self.get_response(middleware, '/account/reset/MQ/set-password/').status_code, 200)
+        self.assertEqual(self.get_response(middleware, '/', user=user).status_code, 200)
+
+    def test_disabled_modes_cost_no_queries(self):
+        middleware = MaintenanceModeMiddleware(AuthRequiredMiddleware(lambda request: HttpResponse()))
+        self.get_response(middleware, '/')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_response(middleware, '/').status_code, 200)
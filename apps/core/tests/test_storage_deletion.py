@@ -0,0 +1,151 @@
+from unittest import mock
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import QuerySet
+
+from apps.core import models as core_models
+from apps.core.models import MediaReference, StorageDeletion
+from apps.core.tasks import task_flush_storage_deletions
+from apps.core.tests.base import ModelTestCase
+from apps.utils.helpers.django import remove_storage_files, remove_storage_files_on_commit
+
+
+@mock.patch('apps.core.tasks.task_flush_storage_deletions')
+class StorageDeletionQueueTests(ModelTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.name = default_storage.save('outbox/a.txt', ContentFile(b'a'))
+
+    def test_deletions_are_queued_and_flushed_once_committed(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_storage_files_on_commit([self.name, self.name, ''])
+            remove_storage_files_on_commit(['outbox/b.txt'], check_reference=False)
+
+            task.apply_async.assert_not_called()
+
+        self.assertEqual(
+            list(StorageDeletion.objects.order_by('pk').values_list('storage', 'name', 'check_reference')),
+            [('default', self.name, True), ('default', 'outbox/b.txt', False)]
+        )
+        self.assertTrue(default_storage.exists(self.name))
+        # the flushes of many requests are grouped
+        task.apply_async.assert_called_once_with(countdown=10)
+
+    def test_rollback_keeps_the_files(self, task):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    remove_storage_files_on_commit([self.name])
+                    raise ValueError
+            except ValueError:
+                pass
+
+        self.assertFalse(StorageDeletion.objects.exists())
+        task.apply_async.assert_not_called()
+
+    def test_storage_outside_of_storages_is_removed_after_commit(self, task):
+        storage = FileSystemStorage(location=self.media_root)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            remove_storage_files_on_commit([self.name], storage=storage)
+
+        self.assertFalse(StorageDeletion.objects.exists())
+        self.assertFalse(default_storage.exists(self.name))
+
+
+class StorageDeletionFlushTests(ModelTestCase):
+
+    def setUp(self):
+        self.names = [default_storage.save(f'outbox/{name}.txt', ContentFile(name.encode())) for name in 'abc']
+
+    def queue(self, names, check_reference=True):
+        StorageDeletion.objects.bulk_create([
+            StorageDeletion(storage='default', name=name, check_reference=check_reference) for name in names
+        ])
+
+    def reference(self, name):
+        MediaReference.objects.create(
+            content_type=ContentType.objects.get_for_model(MediaReference), object_id=name, field_name='file', name=name
+        )
+
+    def test_files_are_removed_in_batches(self):
+        self.queue(self.names)
+
+        select_for_update = QuerySet.select_for_update
+        calls = []
+
+        def lock(queryset, **kwargs):
+            calls.append(kwargs)
+            return select_for_update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'select_for_update', lock):
+            self.assertEqual(task_flush_storage_deletions(batch_size=2), 3)
+
+        # two batches and the final empty claim, skipping rows locked by other workers
+        self.assertEqual(calls, [{'skip_locked': True}] * 3)
+        self.assertFalse(StorageDeletion.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in self.names))
+
+    def test_referenced_files_are_kept(self):
+        self.reference(self.names[0])
+        self.reference(self.names[1])
+        self.queue(self.names[:1])
+        self.queue(self.names[1:2], check_reference=False)
+
+        self.assertEqual(task_flush_storage_deletions(), 1)
+
+        self.assertFalse(StorageDeletion.objects.exists())
+        self.assertTrue(default_storage.exists(self.names[0]))
+        self.assertFalse(default_storage.exists(self.names[1]))
+
+    def test_references_are_checked_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(remove_storage_files(self.names), 3)
+
+    def test_failed_files_are_kept_for_retry(self):
+        self.queue(self.names)
+        delete = default_storage.delete
+
+        def delete_or_fail(name):
+            if name == self.names[1]:
+                raise OSError('denied')
+            delete(name)
+
+        with mock.patch.object(default_storage, 'delete', side_effect=delete_or_fail):
+            with self.assertLogs('custom', 'ERROR'):
+                self.assertEqual(task_flush_storage_deletions(batch_size=2), 2)
+
+        deletion = StorageDeletion.objects.get()
+        self.assertEqual((deletion.name, deletion.attempts), (self.names[1], 1))
+        self.assertTrue(deletion.last_error)
+
+        self.assertEqual(task_flush_storage_deletions(), 1)
+        self.assertFalse(StorageDeletion.objects.exists())
+
+    def test_failed_batch_is_kept_for_retry(self):
+        self.queue(self.names)
+
+        with mock.patch.object(core_models, 'remove_storage_files', side_effect=Exception('storage down')):
+            self.assertEqual(task_flush_storage_deletions(), 0)
+
+        self.assertEqual(list(StorageDeletion.objects.values_list('attempts', flat=True)), [1, 1, 1])
+        self.assertTrue(all(default_storage.exists(name) for name in self.names))
+
+    def test_exhausted_rows_are_logged_and_left(self):
+        self.queue(self.names[:1])
+
+        with self.settings(STORAGE_DELETION_MAX_ATTEMPTS=1), \
+                mock.patch.object(core_models, 'remove_storage_files', side_effect=Exception('storage down')):
+            with self.assertLogs('custom', 'ERROR') as logs:
+                task_flush_storage_deletions()
+
+            self.assertIn('were not removed after 1 attempts', logs.output[0])
+            self.assertEqual(task_flush_storage_deletions(), 0)
+
+        self.assertEqual(StorageDeletion.objects.get().attempts, 1)
+        self.assertFalse(StorageDeletion.objects.pending_storages(max_attempts=1).exists())
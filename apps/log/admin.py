@@ -7,16 +7,16 @@ from pygments.formatters import HtmlFormatter
 from pygments.lexers import JsonLexer
 
 from apps.log.models import AdminLog, ActionLog, EmailLog, VisitLog
-from apps.utils.mixins.admin.core import NoAddAdminMixin, AutoModelAdminMixin
+from apps.utils.mixins.admin.core import NoAddAdminMixin, AutoModelAdminMixin, EstimatedCountAdminMixin
 
 
 @admin.register(AdminLog)
-class AdminLog(AutoModelAdminMixin, NoAddAdminMixin, admin.ModelAdmin):
+class AdminLog(AutoModelAdminMixin, NoAddAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin):
     pass
 
 
 @admin.register(ActionLog)
-class ActionLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, admin.ModelAdmin):
+class ActionLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin):
 
     def get_readonly_fields(self, request, obj=None):
         readonly_fields = list(super(ActionLogAdmin, self).get_readonly_fields(request, obj))
@@ -34,12 +34,18 @@ class ActionLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, admin.ModelAdmin):
 
 
 @admin.register(EmailLog)
-class EmailLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, admin.ModelAdmin):
-    pass
+class EmailLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin):
+
+    def get_readonly_fields(self, request, obj=None):
+        readonly_fields = list(super(EmailLogAdmin, self).get_readonly_fields(request, obj))
+        return readonly_fields + ['get_body', ]
+
+    def get_body(self, obj):
+        return obj.get_body()
 
 
 @admin.register(VisitLog)
-class VisitLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, admin.ModelAdmin):
+class VisitLogAdmin(AutoModelAdminMixin, NoAddAdminMixin, EstimatedCountAdminMixin, admin.ModelAdmin):
 
     def get_readonly_fields(self, request, obj=None):
         readonly_fields = list(super(VisitLogAdmin, self).get_readonly_fields(request, obj))
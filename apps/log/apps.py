@@ -14,6 +14,11 @@ class LogConfig(AppConfig):
     def signal_imports():
         pass
 
+    @staticmethod
+    def task_imports():
+        import apps.log.tasks  # noqa
+
     def ready(self):
         self.model_imports()
-        self.signal_imports()
\ No newline at end of file
+        self.signal_imports()
+        self.task_imports()
\ No newline at end of file
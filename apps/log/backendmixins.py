@@ -4,25 +4,50 @@ from apps.log.models import EmailLog
 class EmailLogBackendMixin(object):
     """
     A backend mixin to log emails.
+
+    The logs of a batch of messages are inserted with a single bulk_create before sending, the messages are sent over a
+    single connection, and their sent statuses are written back with a single bulk_update. The messages that were not
+    sent are kept in `failed_messages`, so a caller can retry them.
+
+    Each message gets the id of its log as `email_log_id`. Messages that already carry one, e.g. retried by
+    `task_send_emails`, reuse their log instead of inserting a new one.
     """
+    failed_messages = None
 
     def send_messages(self, email_messages):
-        num_sent = 0
+        email_messages = list(email_messages)
+        self.failed_messages = []
+
+        if not email_messages:
+            return 0
 
+        existing = EmailLog.objects.in_bulk(
+            [message.email_log_id for message in email_messages if getattr(message, 'email_log_id', None)]
+        )
+        created = iter(EmailLog.objects.bulk_create(EmailLog.objects.build_many(
+            [message for message in email_messages if getattr(message, 'email_log_id', None) not in existing]
+        )))
+
+        emails = []
         for message in email_messages:
-            recipients = ";".join(message.to)
+            email = existing.get(getattr(message, 'email_log_id', None)) or next(created)
+            message.email_log_id = email.pk
+            emails.append(email)
+
+        num_sent = 0
+
+        new_conn_created = self.open()
 
-            email = EmailLog.objects.create(
-                from_email=message.from_email,
-                recipients=recipients,
-                subject=message.subject,
-                body=message.body
-            )
+        try:
+            for message, email in zip(email_messages, emails):
+                email.sent = super().send_messages([message]) > 0
+                num_sent += email.sent
+        finally:
+            if new_conn_created:
+                self.close()
 
-            num_sent += super().send_messages([message])
+            EmailLog.objects.bulk_update([email for email in emails if email.sent and email.pk], ['sent'])
 
-            if num_sent > 0:
-                email.sent = True
-                email.save()
+            self.failed_messages = [message for message, email in zip(email_messages, emails) if not email.sent]
 
         return num_sent
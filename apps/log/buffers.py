@@ -0,0 +1,150 @@
+import atexit
+import json
+import logging
+import threading
+from collections import deque
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from apps.log.models import VisitLog
+
+logger = logging.getLogger('custom')
+
+
+class LocalVisitLogBuffer:
+    """
+    In-process ring buffer of visit log records, written by a daemon thread every `flush_interval` seconds or as soon
+    as `batch_size` records are buffered. The oldest records are dropped when the buffer is full.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.records = deque(maxlen=max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+        atexit.register(self.flush)
+
+    def push(self, record):
+        self.records.append(record)
+
+        # the thread is (re)started lazily, so it also runs in forked worker processes
+        if self.thread is None or not self.thread.is_alive():
+            self.start()
+
+        if len(self.records) >= self.batch_size:
+            self.event.set()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='visit-log-flush', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            self.event.wait(self.flush_interval)
+            self.event.clear()
+            self.flush()
+
+    def pop_batch(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.records.popleft())
+            except IndexError:
+                break
+
+        return batch
+
+    def flush(self):
+        total = 0
+
+        try:
+            while batch := self.pop_batch():
+                try:
+                    VisitLog.objects.bulk_create_records(batch, batch_size=self.batch_size)
+                except Exception:
+                    # put the batch back, it is retried by the next flush
+                    self.records.extendleft(reversed(batch))
+                    raise
+
+                total += len(batch)
+        except Exception as e:
+            logger.error(f"LocalVisitLogBuffer: {e}")
+        finally:
+            connection.close()
+
+        return total
+
+
+class RedisVisitLogBuffer:
+    """
+    Redis list of visit log records, shared by all processes and written by the `task_flush_visit_log` task. A flush
+    is queued every `batch_size` records, and the list is trimmed to the newest `max_size` records.
+    """
+    key = 'visit_log:buffer'
+
+    def __init__(self, url, max_size, batch_size):
+        self.client = redis.Redis.from_url(url)
+        self.max_size = max_size
+        self.batch_size = batch_size
+
+    def push(self, record):
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.rpush(self.key, json.dumps(record))
+            pipeline.ltrim(self.key, -self.max_size, -1)
+            length, _ = pipeline.execute()
+        except redis.RedisError as e:
+            logger.error(f"RedisVisitLogBuffer: {e}")
+            return
+
+        if length % self.batch_size == 0:
+            from apps.log.tasks import task_flush_visit_log
+            task_flush_visit_log.delay()
+
+    def flush(self):
+        total = 0
+
+        while batch := self.client.lpop(self.key, self.batch_size):
+            try:
+                VisitLog.objects.bulk_create_records([json.loads(record) for record in batch], batch_size=self.batch_size)
+            except Exception:
+                # put the batch back at the head of the list, it is retried by the next flush
+                self.client.lpush(self.key, *reversed(batch))
+                raise
+
+            total += len(batch)
+
+        return total
+
+
+_visit_log_buffer = None
+
+
+def get_visit_log_buffer():
+    """
+    Returns the visit log buffer of the process, as configured by the VISIT_LOG_BUFFER setting.
+    """
+    global _visit_log_buffer
+
+    if _visit_log_buffer is None:
+        if settings.VISIT_LOG_BUFFER == "redis":
+            _visit_log_buffer = RedisVisitLogBuffer(
+                url=settings.VISIT_LOG_REDIS_URL,
+                max_size=settings.VISIT_LOG_BUFFER_MAX_SIZE,
+                batch_size=settings.VISIT_LOG_BATCH_SIZE,
+            )
+        else:
+            _visit_log_buffer = LocalVisitLogBuffer(
+                max_size=settings.VISIT_LOG_BUFFER_MAX_SIZE,
+                batch_size=settings.VISIT_LOG_BATCH_SIZE,
+                flush_interval=settings.VISIT_LOG_FLUSH_INTERVAL,
+            )
+
+    return _visit_log_buffer
@@ -1,9 +1,9 @@
-import re
-
 from django.conf import settings
 from django.core.exceptions import MiddlewareNotUsed
 from django.utils import timezone
 
+from apps.core.middleware.routematcher import get_route_matcher
+from apps.log.buffers import get_visit_log_buffer
 from apps.log.models import VisitLog
 
 
@@ -22,17 +22,17 @@ class VisitLogMiddleware:
         if not settings.VISIT_LOG_ENABLED:
             raise MiddlewareNotUsed
 
+        self.route_matcher = get_route_matcher(
+            tuple(getattr(settings, 'VISIT_LOG_TRACKED_PATTERNS', self.tracked_patterns))
+        )
+
     def __call__(self, request):
-        match = False
-        for pattern in self.tracked_patterns:
+        match = self.route_matcher.match(request.path)
 
-            if re.compile(pattern).match(request.path):
-                match = True
-                break
+        response = self.get_response(request)
 
         if match:
-            visit_log = VisitLog.objects.build(request, timezone.now())
-            if not VisitLog.objects.filter(hash=visit_log.hash).exists():
-                visit_log.save()
+            # the record is buffered and written in batches, no query runs in the request
+            get_visit_log_buffer().push(VisitLog.objects.build_record(request, timezone.now()))
 
-        return self.get_response(request)
+        return response
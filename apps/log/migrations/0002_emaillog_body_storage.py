@@ -0,0 +1,29 @@
+# Generated by Django 4.2.6 on 2026-10-18 15:10
+
+import apps.log.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('log', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='body_compressed',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Body compressed'),
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='body_file',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=apps.log.models.get_email_log_body_storage, upload_to='', verbose_name='Body file'),
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='body_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True, verbose_name='Body hash'),
+        ),
+    ]
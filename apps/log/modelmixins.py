@@ -30,3 +30,21 @@ class ActionLogMixin(models.Model):
     def log_action(self, **kwargs):
         action_log_model = apps.get_model('log', 'ActionLog')
         action_log_model.objects.build(instance=self, **kwargs).save()
+
+    @classmethod
+    def collect_bulk_delete(cls, instances, **kwargs):
+        """
+        Builds the delete action logs of instances deleted by a `QuerySetByInstanceDelete` queryset, before the delete.
+        """
+        action_kwargs = dict((k, kwargs[k]) for k in cls.action_fields if k in kwargs)
+        if not action_kwargs:
+            return []
+
+        action_kwargs.update({'action_type': 3})
+        action_log_model = apps.get_model('log', 'ActionLog')
+        return action_log_model.objects.build_many(instances, **action_kwargs)
+
+    @classmethod
+    def after_bulk_delete(cls, action_logs, batch_size=1000):
+        action_log_model = apps.get_model('log', 'ActionLog')
+        action_log_model.objects.bulk_create(action_logs, batch_size=batch_size)
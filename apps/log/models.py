@@ -1,16 +1,27 @@
+import gzip
 import hashlib
+import json
+import posixpath
+import zlib
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.admin.models import LogEntry
-from django.contrib.auth import get_user_model
+from django.contrib.auth import SESSION_KEY, get_user_model
 from django.contrib.contenttypes.models import ContentType
 from django.core import serializers
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
 from ua_parser import user_agent_parser
 
 from apps.utils.helpers.requests import get_or_create_request_session_key, get_request_remote_addr, \
     get_request_ua_string
+from apps.utils.helpers.storage import iter_storage_files, delete_storage_files
 from apps.utils.mixins.models.atoms import TimestampMixin, UuidMixin
 
 
@@ -37,6 +48,28 @@ class ActionLogManager(models.Manager):
 
         return action_log
 
+    def build_many(self, instances, **kwargs):
+        """
+        Builds unsaved action logs for instances of the same model, serialized in a single pass. The object_instance
+        value of each log is the same as `build` would give.
+        """
+        if not instances:
+            return []
+
+        content_type = ContentType.objects.get_for_model(instances[0])
+        data = serializers.serialize('python', instances)
+
+        return [
+            ActionLog(
+                app_name=content_type.app_label,
+                model_name=content_type.model,
+                object_id=instance.id if hasattr(instance, 'id') else 0,
+                object_instance=json.dumps([obj], cls=DjangoJSONEncoder, ensure_ascii=False),
+                **kwargs
+            )
+            for instance, obj in zip(instances, data)
+        ]
+
 
 class ActionLog(TimestampMixin, models.Model):
     ACTION_TYPE_CHOICES = (
@@ -81,6 +114,55 @@ class VisitLogManager(models.Manager):
 
         return visit_log
 
+    def build_record(self, request, timestamp):
+        """
+        Returns the visit log of the given request as a JSON serializable dict, to be written later in a batch.
+
+        As in `build`, a session is created for first visits, so records are deduplicated by the same session key. The
+        user is read from the session, without a query.
+        """
+        session = getattr(request, 'session', None)
+        user_id = session.get(SESSION_KEY, None) if session is not None else None
+
+        visit_log = VisitLog(
+            user_id=get_user_model()._meta.pk.to_python(user_id) if user_id else None,
+            session_key=get_or_create_request_session_key(request) if session is not None else '',
+            timestamp=timestamp,
+            path=request.path,
+            remote_addr=get_request_remote_addr(request),
+            ua_string=get_request_ua_string(request),
+        )
+
+        return {
+            'user_id': visit_log.user_id,
+            'session_key': visit_log.session_key,
+            'timestamp': timestamp.isoformat(),
+            'path': visit_log.path,
+            'remote_addr': visit_log.remote_addr,
+            'ua_string': visit_log.ua_string,
+            'hash': visit_log.md5().hexdigest(),
+        }
+
+    def bulk_create_records(self, records, batch_size=500):
+        """
+        Creates visit logs from records built by `build_record`. Records with an existing hash are skipped, and the
+        user of records whose user no longer exists is cleared.
+        """
+        user_ids = {record['user_id'] for record in records if record.get('user_id') is not None}
+        if user_ids:
+            user_ids = set(get_user_model()._base_manager.filter(pk__in=user_ids).values_list('pk', flat=True))
+
+        visit_logs = [
+            VisitLog(**dict(
+                record,
+                timestamp=parse_datetime(record['timestamp']),
+                user_id=record['user_id'] if record.get('user_id') in user_ids else None
+            ))
+            for record in records
+        ]
+
+        return self.bulk_create(visit_logs, batch_size=batch_size, ignore_conflicts=True)
+
 
 class VisitLog(TimestampMixin, UuidMixin, models.Model):
     """
@@ -137,11 +219,111 @@ class VisitLog(TimestampMixin, UuidMixin, models.Model):
         return hash
 
 
+def get_email_log_body_storage():
+    return storages[settings.EMAIL_LOG_BODY_STORAGE]
+
+
+class EmailLogManager(models.Manager):
+
+    def build_many(self, email_messages):
+        """
+        Builds unsaved email logs for the given messages.
+
+        Bodies over EMAIL_LOG_BODY_COMPRESS_SIZE bytes are stored zlib-compressed, and bodies over
+        EMAIL_LOG_BODY_OFFLOAD_SIZE bytes are stored gzipped in the EMAIL_LOG_BODY_STORAGE storage, under a name derived
+        from their hash. A body sent to many recipients is compressed or stored only once.
+        """
+        compress_size = settings.EMAIL_LOG_BODY_COMPRESS_SIZE
+        offload_size = settings.EMAIL_LOG_BODY_OFFLOAD_SIZE
+        bodies = {}
+        email_logs = []
+
+        for message in email_messages:
+            body = message.body or ''
+
+            if body not in bodies:
+                data = body.encode()
+
+                if offload_size and len(data) > offload_size:
+                    body_hash = hashlib.sha256(data).hexdigest()
+                    bodies[body] = {'body_hash': body_hash, 'body_file': self.offload_body(body_hash, data)}
+                elif compress_size and len(data) > compress_size:
+                    bodies[body] = {'body_compressed': zlib.compress(data)}
+                else:
+                    bodies[body] = {'body': body}
+
+            email_logs.append(EmailLog(
+                from_email=message.from_email,
+                recipients=";".join(message.to),
+                subject=message.subject,
+                **bodies[body]
+            ))
+
+        return email_logs
+
+    @staticmethod
+    def offload_body(body_hash, data):
+        storage = get_email_log_body_storage()
+        name = f"log/email/{body_hash[:2]}/{body_hash}.gz"
+
+        if storage.exists(name):
+            return name
+
+        return storage.save(name, ContentFile(gzip.compress(data)))
+
+    def clean_body_files(self, minimum_file_age=60 * 60, batch_size=1000):
+        """
+        Removes the offloaded bodies whose hash is no longer used by any email log, and returns the number of files
+        removed. Files younger than `minimum_file_age` seconds are kept, as their email logs may not be saved yet.
+        """
+        storage = get_email_log_body_storage()
+        cutoff = timezone.now() - timedelta(seconds=minimum_file_age)
+        total = 0
+        files = {}
+
+        def remove(files):
+            used = set(self.filter(body_hash__in=list(files)).values_list('body_hash', flat=True).distinct())
+            names = [name for body_hash, names in files.items() if body_hash not in used for name in names]
+            return delete_storage_files(storage, names)
+
+        try:
+            for name, modified_time in iter_storage_files(storage, 'log/email/'):
+                if modified_time is None:
+                    modified_time = storage.get_modified_time(name)
+
+                if modified_time >= cutoff:
+                    continue
+
+                # names are <hash>.gz, or <hash>_<suffix>.gz if the storage renamed a concurrent save
+                body_hash = posixpath.basename(name).split('.')[0].split('_')[0]
+                files.setdefault(body_hash, []).append(name)
+
+                if len(files) >= batch_size:
+                    total += remove(files)
+                    files = {}
+        except FileNotFoundError:
+            pass
+
+        if files:
+            total += remove(files)
+
+        return total
+
+
 class EmailLog(TimestampMixin, models.Model):
+    objects = EmailLogManager()
+
+    # written with bulk_create, clean_unused_media scans the body files instead
+    media_reference_index = False
+
     from_email = models.EmailField(_('From email'), max_length=75, blank=True)
     recipients = models.TextField(_('Recipients'), blank=True, null=True)
     subject = models.CharField(_('Subject'), max_length=255, blank=True, null=True)
     body = models.TextField(_('Body'), blank=True, null=True)
+    body_compressed = models.BinaryField(_('Body compressed'), blank=True, null=True)
+    body_file = models.FileField(_('Body file'), storage=get_email_log_body_storage, max_length=255, blank=True,
+                                 null=True)
+    body_hash = models.CharField(_('Body hash'), max_length=64, db_index=True, blank=True, null=True)
     sent = models.BooleanField(_('Sent'), default=False)
 
     class Meta:
@@ -151,3 +333,16 @@ class EmailLog(TimestampMixin, models.Model):
 
     def __str__(self):
         return str(self.id)
+
+    def get_body(self):
+        """
+        Returns the body, decompressed or read from the storage if it was stored that way.
+        """
+        if self.body_file:
+            with self.body_file.open('rb') as f:
+                return gzip.decompress(f.read()).decode()
+
+        if self.body_compressed is not None:
+            return zlib.decompress(self.body_compressed).decode()
+
+        return self.body
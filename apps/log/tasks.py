@@ -0,0 +1,28 @@
+import logging
+
+from celery import shared_task
+
+from apps.log.buffers import get_visit_log_buffer
+from apps.log.models import EmailLog
+
+logger = logging.getLogger('custom')
+
+
+@shared_task
+def task_flush_visit_log():
+    """
+    Writes the buffered visit log records to the database.
+    """
+    total = get_visit_log_buffer().flush()
+    logger.debug(f"task_flush_visit_log: {total} records flushed")
+
+
+@shared_task
+def task_clean_email_log_bodies(minimum_file_age=60 * 60):
+    """
+    Removes the offloaded email log bodies that are no longer used by any email log.
+    """
+    total = EmailLog.objects.clean_body_files(minimum_file_age=minimum_file_age)
+    logger.info(f"task_clean_email_log_bodies: {total} files removed")
+
+    return total
@@ -0,0 +1,195 @@
+import os
+import shutil
+import time
+from unittest import mock
+
+from django.core.files.storage import storages
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import override_settings
+
+from apps.core.tests.base import ModelTestCase
+from apps.log.backendmixins import EmailLogBackendMixin
+from apps.log.models import EmailLog
+from apps.log.tasks import task_clean_email_log_bodies
+
+
+class RecordingEmailBackend(BaseEmailBackend):
+    """
+    Email backend that keeps the sent messages, and fails the messages with the 'fail' subject.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sent_messages = []
+        self.opened = 0
+
+    def open(self):
+        self.opened += 1
+        return True
+
+    def send_messages(self, email_messages):
+        sent = [message for message in email_messages if message.subject != 'fail']
+        self.sent_messages.extend(sent)
+        return len(sent)
+
+
+class RecordingEmailLogBackend(EmailLogBackendMixin, RecordingEmailBackend):
+    pass
+
+
+def get_message(subject='Hello', body='body', to='user@example.com'):
+    return EmailMessage(subject=subject, body=body, from_email='from@example.com', to=[to])
+
+
+@override_settings(EMAIL_LOG_BODY_COMPRESS_SIZE=100, EMAIL_LOG_BODY_OFFLOAD_SIZE=1000)
+class EmailLogBuildTests(ModelTestCase):
+
+    def test_small_body_is_stored_as_text(self):
+        email_log = EmailLog.objects.build_many([get_message(body='short')])[0]
+
+        self.assertEqual(email_log.body, 'short')
+        self.assertIsNone(email_log.body_compressed)
+        self.assertFalse(email_log.body_file)
+        self.assertEqual(email_log.recipients, 'user@example.com')
+        self.assertEqual(email_log.get_body(), 'short')
+
+    def test_medium_body_is_compressed(self):
+        body = 'medium ' * 50
+        email_log = EmailLog.objects.build_many([get_message(body=body)])[0]
+
+        self.assertIsNone(email_log.body)
+        self.assertLess(len(email_log.body_compressed), len(body))
+        self.assertEqual(email_log.get_body(), body)
+
+    def test_large_body_is_offloaded(self):
+        body = 'large ' * 500
+        email_log = EmailLog.objects.build_many([get_message(body=body)])[0]
+
+        self.assertIsNone(email_log.body)
+        self.assertIsNone(email_log.body_compressed)
+        self.assertTrue(email_log.body_file.name.startswith(f'log/email/{email_log.body_hash[:2]}/'))
+        self.assertTrue(storages['private'].exists(email_log.body_file.name))
+
+        email_log.save()
+        self.assertEqual(EmailLog.objects.get().get_body(), body)
+
+    def test_shared_body_is_stored_once(self):
+        body = 'large ' * 500
+        messages = [get_message(body=body, to=f'user{i}@example.com') for i in range(3)]
+
+        with mock.patch.object(EmailLog.objects, 'offload_body', wraps=EmailLog.objects.offload_body) as offload:
+            email_logs = EmailLog.objects.build_many(messages)
+
+        offload.assert_called_once()
+        self.assertEqual(len({email_log.body_file.name for email_log in email_logs}), 1)
+        self.assertEqual([email_log.recipients for email_log in email_logs],
+                         ['user0@example.com', 'user1@example.com', 'user2@example.com'])
+
+    def test_offloaded_body_reused_across_batches(self):
+        body = 'large ' * 500
+
+        first = EmailLog.objects.build_many([get_message(body=body)])[0]
+        second = EmailLog.objects.build_many([get_message(body=body)])[0]
+
+        self.assertEqual(first.body_file.name, second.body_file.name)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.body_file.path))), 1)
+
+
+class EmailLogBackendTests(ModelTestCase):
+
+    def test_batch_is_logged_with_two_writes(self):
+        backend = RecordingEmailLogBackend()
+        messages = [get_message(to=f'user{i}@example.com') for i in range(3)]
+
+        # one bulk insert, one bulk update of the sent statuses
+        with self.assertNumQueries(2):
+            num_sent = backend.send_messages(messages)
+
+        self.assertEqual(num_sent, 3)
+        self.assertEqual(backend.opened, 1)
+        self.assertEqual(len(backend.sent_messages), 3)
+        self.assertEqual(EmailLog.objects.filter(sent=True).count(), 3)
+        self.assertEqual(sorted(message.email_log_id for message in messages),
+                         sorted(EmailLog.objects.values_list('pk', flat=True)))
+
+    def test_failed_messages_are_kept(self):
+        backend = RecordingEmailLogBackend()
+        failed = get_message(subject='fail')
+
+        num_sent = backend.send_messages([get_message(), failed])
+
+        self.assertEqual(num_sent, 1)
+        self.assertEqual(backend.failed_messages, [failed])
+        self.assertFalse(EmailLog.objects.get(pk=failed.email_log_id).sent)
+        self.assertEqual(EmailLog.objects.filter(sent=True).count(), 1)
+
+    def test_no_messages(self):
+        backend = RecordingEmailLogBackend()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.send_messages([]), 0)
+
+        self.assertEqual(backend.failed_messages, [])
+
+
+@override_settings(EMAIL_LOG_BODY_COMPRESS_SIZE=100, EMAIL_LOG_BODY_OFFLOAD_SIZE=1000)
+class EmailLogBodyCleanTests(ModelTestCase):
+
+    def setUp(self):
+        self.storage = storages['private']
+        shutil.rmtree(os.path.join(self.media_root, 'log'), ignore_errors=True)
+
+    def offload(self, body, age=2 * 60 * 60):
+        email_log = EmailLog.objects.build_many([get_message(body=body)])[0]
+
+        modified = time.time() - age
+        os.utime(email_log.body_file.path, (modified, modified))
+
+        return email_log
+
+    def test_unused_bodies_are_removed(self):
+        used = self.offload('used ' * 500)
+        used.save()
+        unused = self.offload('unused ' * 500)
+
+        self.assertEqual(EmailLog.objects.clean_body_files(), 1)
+
+        self.assertTrue(self.storage.exists(used.body_file.name))
+        self.assertFalse(self.storage.exists(unused.body_file.name))
+
+    def test_recent_bodies_are_kept(self):
+        unused = self.offload('unused ' * 500, age=60)
+
+        self.assertEqual(EmailLog.objects.clean_body_files(), 0)
+        self.assertTrue(self.storage.exists(unused.body_file.name))
+
+    def test_renamed_body_files_are_matched_by_hash(self):
+        used = self.offload('used ' * 500)
+        used.save()
+
+        # a concurrent save of the same body got a suffixed name
+        duplicate = self.storage.save(used.body_file.name, self.storage.open(used.body_file.name))
+        modified = time.time() - 2 * 60 * 60
+        os.utime(self.storage.path(duplicate), (modified, modified))
+        self.assertNotEqual(duplicate, used.body_file.name)
+
+        self.assertEqual(EmailLog.objects.clean_body_files(), 0)
+
+        EmailLog.objects.all().delete()
+        self.assertEqual(EmailLog.objects.clean_body_files(), 2)
+
+    def test_removal_in_batches(self):
+        for i in range(3):
+            self.offload(f'unused {i} ' * 500)
+
+        with self.assertNumQueries(2):
+            self.assertEqual(EmailLog.objects.clean_body_files(batch_size=2), 3)
+
+    def test_no_body_files(self):
+        self.assertEqual(EmailLog.objects.clean_body_files(), 0)
+
+    def test_task(self):
+        self.offload('unused ' * 500)
+
+        self.assertEqual(task_clean_email_log_bodies(), 1)
@@ -0,0 +1,163 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from apps.core.tests.base import ModelTestCase
+from apps.log.buffers import LocalVisitLogBuffer, RedisVisitLogBuffer
+from apps.log.middleware import VisitLogMiddleware
+from apps.log.models import VisitLog
+
+
+class VisitLogTestCase(ModelTestCase):
+
+    def get_request(self, path='/', session=None):
+        request = RequestFactory().get(path, HTTP_USER_AGENT='test-agent')
+        request.session = SessionStore() if session is None else session
+        return request
+
+    def build_record(self, **kwargs):
+        return VisitLog.objects.build_record(self.get_request(**kwargs), timezone.now())
+
+
+class VisitLogRecordTests(VisitLogTestCase):
+
+    def test_first_visit_creates_a_session(self):
+        record = self.build_record()
+
+        self.assertTrue(record['session_key'])
+        self.assertTrue(Session.objects.filter(session_key=record['session_key']).exists())
+        self.assertIsNone(record['user_id'])
+        self.assertEqual(json.loads(json.dumps(record)), record)
+
+    def test_user_is_read_from_the_session(self):
+        user = get_user_model().objects.create_user(username='visitor', password='secret')
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session.create()
+
+        # only the session lookup, the user is not loaded
+        with self.assertNumQueries(1):
+            record = self.build_record(session=session)
+
+        self.assertEqual(record['user_id'], user.pk)
+        self.assertEqual(record['session_key'], session.session_key)
+
+    def test_records_are_deduplicated_by_hash(self):
+        session = SessionStore()
+        session.create()
+        records = [self.build_record(session=session), self.build_record(session=session), self.build_record()]
+
+        VisitLog.objects.bulk_create_records(records)
+        VisitLog.objects.bulk_create_records(records[:1])
+
+        self.assertEqual(VisitLog.objects.count(), 2)
+
+    def test_missing_user_is_cleared(self):
+        record = dict(self.build_record(), user_id=1234)
+
+        VisitLog.objects.bulk_create_records([record])
+
+        self.assertIsNone(VisitLog.objects.get().user_id)
+
+
+# the buffers close the connection of their flush thread, the test connection is kept
+@mock.patch('apps.log.buffers.connection')
+class VisitLogBufferTests(VisitLogTestCase):
+
+    def get_buffer(self, max_size=10, batch_size=2):
+        visit_log_buffer = LocalVisitLogBuffer(max_size=max_size, batch_size=batch_size, flush_interval=60)
+        visit_log_buffer.start = mock.Mock()
+        return visit_log_buffer
+
+    def test_flush_writes_in_batches(self, connection):
+        visit_log_buffer = self.get_buffer()
+        for path in ('/a', '/b', '/c'):
+            visit_log_buffer.push(self.build_record(path=path))
+
+        with mock.patch.object(
+            VisitLog.objects, 'bulk_create_records', wraps=VisitLog.objects.bulk_create_records
+        ) as bulk_create_records:
+            self.assertEqual(visit_log_buffer.flush(), 3)
+
+        self.assertEqual(bulk_create_records.call_count, 2)
+        self.assertEqual(VisitLog.objects.count(), 3)
+        self.assertFalse(visit_log_buffer.records)
+
+    def test_full_buffer_drops_oldest_records(self, connection):
+        visit_log_buffer = self.get_buffer(max_size=2, batch_size=10)
+        for path in ('/a', '/b', '/c'):
+            visit_log_buffer.push(self.build_record(path=path))
+
+        self.assertEqual([record['path'] for record in visit_log_buffer.records], ['/b', '/c'])
+
+    def test_failed_batch_is_kept(self, connection):
+        visit_log_buffer = self.get_buffer()
+        for path in ('/a', '/b', '/c'):
+            visit_log_buffer.push(self.build_record(path=path))
+
+        with mock.patch.object(VisitLog.objects, 'bulk_create_records', side_effect=Exception('db down')):
+            with self.assertLogs('custom', 'ERROR'):
+                self.assertEqual(visit_log_buffer.flush(), 0)
+
+        self.assertEqual([record['path'] for record in visit_log_buffer.records], ['/a', '/b', '/c'])
+
+        self.assertEqual(visit_log_buffer.flush(), 3)
+        self.assertEqual(VisitLog.objects.count(), 3)
+
+
+class RedisVisitLogBufferTests(VisitLogTestCase):
+
+    def get_buffer(self):
+        visit_log_buffer = RedisVisitLogBuffer(url='redis://localhost:6379', max_size=10, batch_size=2)
+        visit_log_buffer.client = mock.Mock()
+        return visit_log_buffer
+
+    @mock.patch('apps.log.tasks.task_flush_visit_log')
+    def test_flush_is_queued_every_batch(self, task):
+        visit_log_buffer = self.get_buffer()
+        pipeline = visit_log_buffer.client.pipeline.return_value
+
+        pipeline.execute.return_value = [1, True]
+        visit_log_buffer.push(self.build_record())
+        task.delay.assert_not_called()
+
+        pipeline.execute.return_value = [2, True]
+        visit_log_buffer.push(self.build_record())
+        task.delay.assert_called_once_with()
+
+        pipeline.ltrim.assert_called_with(visit_log_buffer.key, -10, -1)
+
+    def test_failed_batch_is_pushed_back(self):
+        visit_log_buffer = self.get_buffer()
+        batch = [json.dumps(self.build_record(path=path)) for path in ('/a', '/b')]
+        visit_log_buffer.client.lpop.side_effect = [batch, None]
+
+        with mock.patch.object(VisitLog.objects, 'bulk_create_records', side_effect=Exception('db down')):
+            with self.assertRaises(Exception):
+                visit_log_buffer.flush()
+
+        visit_log_buffer.client.lpush.assert_called_once_with(visit_log_buffer.key, batch[1], batch[0])
+
+
+@override_settings(VISIT_LOG_ENABLED=True, VISIT_LOG_TRACKED_PATTERNS=[r'^/$'])
+class VisitLogMiddlewareTests(VisitLogTestCase):
+
+    @mock.patch('apps.log.middleware.get_visit_log_buffer')
+    def test_tracked_requests_are_buffered_without_queries(self, get_visit_log_buffer):
+        session = SessionStore()
+        session.create()
+        middleware = VisitLogMiddleware(lambda request: HttpResponse())
+
+        # only the session lookup of the tracked request, the visit log is not written
+        with self.assertNumQueries(1):
+            middleware(self.get_request('/', session=session))
+            middleware(self.get_request('/other/', session=session))
+
+        get_visit_log_buffer.return_value.push.assert_called_once()
+        self.assertEqual(get_visit_log_buffer.return_value.push.call_args.args[0]['path'], '/')
@@ -1,17 +1,24 @@
 import logging
 import os
-from io import BytesIO
+from functools import partial
+from tempfile import SpooledTemporaryFile
 from uuid import uuid4
 
 import requests
+from django.conf import settings
 from django.core.files import File
 from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import connections, transaction
 from django.http import JsonResponse
+from django.utils.module_loading import import_string
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.functional import cached_property
 
-from .image import get_processed_image
+from .image import get_processed_images
 from .requests import get_agent_head_or_default
+from .storage import delete_storage_files
 
 logger = logging.getLogger('custom')
 
@@ -56,6 +63,57 @@ def get_all_related_m2m_objects(model):
     ]
 
 
+def get_estimated_count_or_none(queryset):
+    """
+    Returns the row count estimated by the database statistics for an unfiltered queryset, or None if the queryset is
+    filtered or the database does not provide an estimate.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.group_by or query.low_mark or query.high_mark is not None:
+        return None
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == 'mysql':
+        sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        params = [table]
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if not row or row[0] is None or row[0] < 0:
+        return None
+
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the database row estimate instead of COUNT(*) for large unfiltered querysets.
+
+    The exact count is used below `exact_count_threshold` rows, where it is cheap and an estimate would be noticeable.
+    """
+    exact_count_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = None
+        if hasattr(self.object_list, 'query'):
+            estimate = get_estimated_count_or_none(self.object_list)
+
+        if estimate is not None and estimate >= self.exact_count_threshold:
+            return estimate
+
+        return super().count
+
+
 def get_upload_path(instance, filename):
     """
     Returns the upload path for the given instance and filename.
@@ -90,29 +148,136 @@ def remove_storage_file_if_exists(file_path, storage=default_storage):
             logger.error(e)
 
 
-def get_url_as_field_file_or_false(url, filename):
+def check_storage_file_referenced(file_path, instance=None):
+    """
+    Checks whether the file is still referenced by an instance other than the given one, using the callable set by the
+    MEDIA_REFERENCE_CHECK setting. Returns False if no check is configured.
+    """
+    check = getattr(settings, 'MEDIA_REFERENCE_CHECK', None)
+    if not check or not file_path:
+        return False
+
+    return import_string(check)(file_path, instance=instance)
+
+
+def get_referenced_storage_files(names):
+    """
+    Returns the set of the given file names that are still referenced by an instance, using the callable set by the
+    MEDIA_REFERENCE_BULK_CHECK setting, in one query, or the MEDIA_REFERENCE_CHECK setting per name without it.
+    """
+    names = [name for name in names if name]
+    check = getattr(settings, 'MEDIA_REFERENCE_BULK_CHECK', None)
+
+    if check:
+        return set(import_string(check)(names)) if names else set()
+
+    return {name for name in names if check_storage_file_referenced(name)}
+
+
+def remove_storage_file_if_unreferenced(file_path, instance=None, storage=default_storage):
+    """
+    Removes the file from the storage if it exists and is not referenced by an instance other than the given one.
+    """
+    if check_storage_file_referenced(file_path, instance):
+        logger.info(f"remove_storage_file_if_unreferenced: {file_path} is still referenced, not removed")
+        return
+
+    remove_storage_file_if_exists(file_path, storage)
+
+
+def remove_storage_files(names, storage=default_storage, check_reference=True, failed=None):
+    """
+    Removes the given files from the storage in batches and returns the number of files removed. With
+    `check_reference`, files still referenced by an instance, see `get_referenced_storage_files`, are kept. The names
+    of the files that could not be removed are appended to the `failed` list, if given.
+    """
+    if check_reference:
+        referenced = get_referenced_storage_files(names)
+        names = [name for name in names if name not in referenced]
+
+    return delete_storage_files(storage, names, failed=failed)
+
+
+def remove_storage_files_on_commit(names, storage=default_storage, check_reference=True):
+    """
+    Removes the given files from the storage once the current transaction commits, so a rollback keeps them.
+
+    The removal is handed to the callable set by the STORAGE_DELETE_QUEUE setting, e.g. an outbox flushed by a
+    background worker. Without it, the files are removed in the process after the commit.
+    """
+    names = [name for name in dict.fromkeys(names) if name]
+    if not names:
+        return
+
+    queue = getattr(settings, 'STORAGE_DELETE_QUEUE', None)
+    if queue:
+        import_string(queue)(names, storage=storage, check_reference=check_reference)
+        return
+
+    transaction.on_commit(partial(remove_storage_files, names, storage, check_reference))
+
+
+def get_spool_max_size():
+    """
+    Returns the size in bytes above which temporary files are spooled to disk instead of memory.
+    """
+    return getattr(settings, 'FILE_SPOOL_MAX_SIZE', settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+
+
+def get_url_as_field_file_or_false(url, filename, max_size=None, chunk_size=64 * 1024):
     """
     Retrieves the file from the given URL and returns a file object or False if the request fails.
+
+    The body is streamed in chunks into a spooled temporary file, and the request is dropped as soon as it exceeds
+    `max_size` (defaults to the MAX_UPLOAD_SIZE setting).
     """
+    max_size = max_size or getattr(settings, 'MAX_UPLOAD_SIZE', None)
+
     head = get_agent_head_or_default()
-    req = requests.get(url, allow_redirects=True, stream=True, headers=head, timeout=10)
-    req.raw.decode_content = True
 
-    if req.status_code == 200:
-        bytes_io = BytesIO()
-        bytes_io.write(req.content)
-        return File(bytes_io, name=filename)
+    with requests.get(url, allow_redirects=True, stream=True, headers=head, timeout=10) as req:
+        if req.status_code != 200:
+            return False
+
+        content_length = req.headers.get('Content-Length', '')
+        if max_size and content_length.isdigit() and int(content_length) > max_size:
+            logger.warning(f"get_url_as_field_file_or_false: {url} exceeds max size of {max_size} bytes")
+            return False
+
+        spooled_file = SpooledTemporaryFile(max_size=get_spool_max_size())
+        size = 0
 
-    return False
+        for chunk in req.iter_content(chunk_size=chunk_size):
+            size += len(chunk)
+            if max_size and size > max_size:
+                logger.warning(f"get_url_as_field_file_or_false: {url} exceeds max size of {max_size} bytes")
+                spooled_file.close()
+                return False
+
+            spooled_file.write(chunk)
+
+    spooled_file.seek(0)
+
+    return File(spooled_file, name=filename)
 
 
 def get_processed_image_as_field_file(image_file, image_name, **kwargs):
     """
     Processes the image and returns a file object with the processed image or False if processing fails.
     """
-    bytes_io, filename = get_processed_image(image_file, image_name, **kwargs)
+    return get_processed_images_as_field_files(image_file, image_name, [kwargs])[0]
+
 
-    return File(bytes_io, name=filename)
+def get_processed_images_as_field_files(image_file, image_name, params_list):
+    """
+    Processes the image once for a list of params and returns a list of file objects, in the same order as the params.
+    """
+    return [
+        File(out_file, name=filename)
+        for out_file, filename in get_processed_images(
+            image_file, image_name, params_list, spool_max_size=get_spool_max_size()
+        )
+    ]
 
 
 def render_template(template_name, context={}):
@@ -0,0 +1,101 @@
+import base64
+import csv
+import datetime
+import decimal
+import pickle
+from tempfile import SpooledTemporaryFile
+
+from django.db.models import ForeignKey
+from django.utils import timezone
+from openpyxl import Workbook
+
+
+class Echo:
+    """
+    File-like object that returns what is written to it, so a csv writer can be used to stream rows.
+    """
+
+    def write(self, value):
+        return value
+
+
+def get_export_field_names(model):
+    """
+    Returns the names of the concrete fields of the given model, in the order they are exported.
+    """
+    return [field.name for field in model._meta.fields]
+
+
+def dump_queryset_query(queryset):
+    """
+    Returns the pickled query of the given queryset as text, so it can be passed to a task instead of a list of pks.
+    """
+    return base64.b64encode(pickle.dumps(queryset.query)).decode()
+
+
+def load_queryset_query(model, query):
+    """
+    Returns a queryset of the given model running the query dumped with `dump_queryset_query`.
+    """
+    queryset = model._base_manager.all()
+    queryset.query = pickle.loads(base64.b64decode(query))
+    return queryset
+
+
+def iter_export_rows(queryset, field_names, chunk_size=2000):
+    """
+    Yields the header and a row of values per instance of the queryset.
+
+    Foreign keys are fetched with select_related, and instances are streamed from the database in chunks.
+    """
+    model = queryset.model
+    related_names = [
+        name for name in field_names if isinstance(model._meta.get_field(name), ForeignKey)
+    ]
+
+    yield field_names
+
+    for obj in queryset.select_related(*related_names).iterator(chunk_size=chunk_size):
+        yield [getattr(obj, name) for name in field_names]
+
+
+def iter_csv(rows):
+    """
+    Yields the given rows as lines of CSV.
+    """
+    writer = csv.writer(Echo())
+
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def get_xlsx_value(value):
+    if value is None or isinstance(value, (str, bool, int, float, decimal.Decimal)):
+        return value
+
+    if isinstance(value, datetime.datetime):
+        # xlsx has no time zones
+        return timezone.make_naive(value) if timezone.is_aware(value) else value
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value
+
+    return str(value)
+
+
+def write_xlsx(rows, file=None, title=None):
+    """
+    Writes the given rows to a write-only xlsx workbook, so rows are not kept in memory, and returns the file.
+    """
+    file = file or SpooledTemporaryFile()
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=title)
+
+    for row in rows:
+        worksheet.append([get_xlsx_value(value) for value in row])
+
+    workbook.save(file)
+    file.seek(0)
+
+    return file
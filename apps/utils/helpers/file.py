@@ -1,4 +1,10 @@
+import functools
+import hashlib
+import mmap
 import os
+import struct
+import zlib
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
 
 
 def check_file_exists(file_path):
@@ -41,3 +47,68 @@ def filter_by_extensions(item_list, endings):
         return item_list
 
     return [item for item in item_list if not any(item.lower().endswith(e) for e in endings)]
+
+
+def get_file_hash(file, algorithm='sha256', chunk_size=64 * 1024):
+    """
+    Returns the hex digest of the content of the given file object, read in chunks.
+    """
+    hash = hashlib.new(algorithm)
+
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        hash.update(chunk)
+    file.seek(0)
+
+    return hash.hexdigest()
+
+
+class MappedZipArchive:
+    """
+    Read-only zip archive, memory-mapped once, with a name to offset index built from its central directory.
+
+    Reading a member is a dict lookup, a slice of the mapping and, for deflated members, a zlib decompression. Only
+    stored and deflated members are supported.
+    """
+    LOCAL_HEADER = struct.Struct('<4s2B4HL2L2H')
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            with ZipFile(f) as zip_file:
+                self.index = {
+                    info.filename: (info.header_offset, info.compress_size, info.compress_type)
+                    for info in zip_file.infolist()
+                }
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def namelist(self):
+        return list(self.index)
+
+    def read(self, name):
+        """
+        Returns the content of the given member, or raises KeyError if it does not exist.
+        """
+        header_offset, compress_size, compress_type = self.index[name]
+
+        header = self.LOCAL_HEADER.unpack_from(self.mmap, header_offset)
+        start = header_offset + self.LOCAL_HEADER.size + header[-2] + header[-1]
+        data = self.mmap[start:start + compress_size]
+
+        if compress_type == ZIP_STORED:
+            return data
+        if compress_type == ZIP_DEFLATED:
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+
+        raise NotImplementedError(f"Compression type {compress_type} of {name} is not supported")
+
+
+@functools.lru_cache(maxsize=None)
+def get_mapped_zip_archive(path):
+    """
+    Returns the memory-mapped archive of the given path, opened once per process.
+    """
+    return MappedZipArchive(path)
@@ -0,0 +1,74 @@
+import re
+
+# blocks whose whitespace is significant, matched as a whole and kept as is
+PRESERVED_TAGS = rb'pre|textarea|script'
+
+MINIFY_HTML_REGEX = re.compile(
+    rb'(<(' + PRESERVED_TAGS + rb')\b.*?</\2\s*>)|(?<=>)\s+(?=<)',
+    re.IGNORECASE | re.DOTALL
+)
+
+PRESERVED_TAG_REGEX = re.compile(rb'<(/?)(?:' + PRESERVED_TAGS + rb')\b', re.IGNORECASE)
+
+
+def _minify_html_match(match):
+    return match.group(1) or b''
+
+
+def minify_html_bytes(content):
+    """
+    Removes the whitespace between tags of the given HTML bytes in a single regex pass, keeping <pre>, <textarea> and
+    <script> blocks as is.
+    """
+    return MINIFY_HTML_REGEX.sub(_minify_html_match, content)
+
+
+def get_html_safe_cut(content):
+    """
+    Returns the position up to which the given partial HTML bytes can be minified on their own.
+
+    The cut is never inside an unclosed <pre>, <textarea> or <script> block, and trailing whitespace is left for the
+    next chunk, as it may turn out to be between two tags.
+    """
+    cut = content.rfind(b'<')
+    if cut <= 0:
+        return 0
+
+    last_match = None
+    for match in PRESERVED_TAG_REGEX.finditer(content, 0, cut):
+        last_match = match
+
+    if last_match and not last_match.group(1):
+        cut = last_match.start()
+
+    while cut > 0 and content[cut - 1:cut].isspace():
+        cut -= 1
+
+    return cut
+
+
+def iter_minified_html(chunks):
+    """
+    Minifies an iterable of HTML byte chunks, yielding each part as soon as it can be minified safely.
+    """
+    buffer = b''
+    # whether the last part yielded ended with `>`, so leading whitespace of the next part is between tags
+    after_tag = False
+
+    def minify_part(part):
+        if after_tag:
+            return minify_html_bytes(b'>' + part)[1:]
+
+        return minify_html_bytes(part)
+
+    for chunk in chunks:
+        buffer += chunk
+
+        cut = get_html_safe_cut(buffer)
+        if cut:
+            yield minify_part(buffer[:cut])
+            after_tag = buffer[cut - 1:cut] == b'>'
+            buffer = buffer[cut:]
+
+    if buffer:
+        yield minify_part(buffer)
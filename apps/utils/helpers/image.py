@@ -1,4 +1,5 @@
-from io import BytesIO
+import io
+from tempfile import SpooledTemporaryFile
 
 from PIL import Image, ImageOps
 from PIL import Image as pil, ExifTags
@@ -6,6 +7,22 @@ from PIL import UnidentifiedImageError
 
 from .file import rename_file
 
+SPOOL_MAX_SIZE = int(2.5 * 1024 * 1024)
+
+
+class SpooledImageFile(SpooledTemporaryFile):
+    """
+    A SpooledTemporaryFile that only exposes a file descriptor once it is rolled over to disk.
+
+    Pillow encoders ask for a file descriptor when one is available, which would force every output to disk.
+    """
+
+    def fileno(self):
+        if not self._rolled:
+            raise io.UnsupportedOperation('fileno')
+
+        return super().fileno()
+
 
 def get_pil_supported_format_or_default(image, format=None):
     """
@@ -62,10 +79,10 @@ def resize_image(image, size, thumb=True):
     Resizes the given image to the given size.
     """
     if thumb:
-        image.thumbnail(size, pil.ANTIALIAS)
+        image.thumbnail(size, pil.LANCZOS)
         return image
 
-    return image.resize(size, pil.ANTIALIAS)
+    return image.resize(size, pil.LANCZOS)
 
 
 def normalize_rotation(image):
@@ -126,102 +143,216 @@ def get_centring_from_crop(crop):
     ]
 
 
-def get_processed_image(image_file, image_name, **kwargs):
+def get_draft_size_or_none(params_list):
     """
-    Returns the processed image using the Pillow library.
+    Returns the size to draft a JPEG image to, so it still covers every size in the given list of params, or None if
+    any of the params needs the full resolution image.
+    """
+    sizes = []
+    for params in params_list:
+        size = params.get('size', None)
+        if size is None or None in size or params.get('scale', None) is not None:
+            return None
 
-    Adapted from `django-resized`
-    https://github.com/un1t/django-resized
-    version 1.0.1
+        sizes.append(max(size))
+
+    if not sizes:
+        return None
+
+    # square, as the image may still be rotated by its EXIF orientation
+    return max(sizes), max(sizes)
+
+
+def get_normalized_image_or_none(image_file, draft_size=None, max_pixels=None):
+    """
+    Opens, drafts and EXIF-rotates the given image file once, or returns None if the image can not be identified or
+    has more pixels than `max_pixels` (defaults to `Image.MAX_IMAGE_PIXELS`).
+    """
+    max_pixels = max_pixels or Image.MAX_IMAGE_PIXELS
+
+    try:
+        img = Image.open(image_file)
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        return None
+
+    if max_pixels and img.size[0] * img.size[1] > max_pixels:
+        return None
+
+    if draft_size and img.format == 'JPEG':
+        img.draft(None, draft_size)
+
+    return normalize_rotation(img)
+
+
+def reduce_image(image, size, reducing_gap=2.0):
+    """
+    Reduces the given image by an integer factor, while keeping it at least `reducing_gap` times the given size.
+    """
+    factor = min(image.size[0] // int(size[0] * reducing_gap), image.size[1] // int(size[1] * reducing_gap))
+    if factor > 1:
+        return image.reduce(factor)
+
+    return image
+
+
+def get_thumbnail_size(image_size, size):
+    """
+    Returns the size the given image size is shrunk to by `Image.thumbnail`, preserving the aspect ratio.
+    """
+    factor = min(size[0] / image_size[0], size[1] / image_size[1], 1)
+    return round(image_size[0] * factor), round(image_size[1] * factor)
+
+
+def get_processed_images(image_file, image_name, params_list, spool_max_size=SPOOL_MAX_SIZE, max_pixels=None):
+    """
+    Returns the processed images for a list of params, decoding the source image only once.
+
+    The source image is opened, drafted (for JPEG) and EXIF-rotated once. Outputs are then built from largest to
+    smallest, each thumbnail being resized from the smallest already built thumbnail that still covers it.
 
     Args:
         image_file (file object): The file object containing the image data to be processed.
         image_name (str): The name of the image file.
-        **kwargs: Additional keyword arguments to customize the image processing.
+        params_list (list): A list of keyword argument dicts, as accepted by `get_processed_image`.
+        spool_max_size (int): The size in bytes above which an output is spooled to disk instead of memory.
+        max_pixels (int): The maximum number of pixels of the source image, defaults to `Image.MAX_IMAGE_PIXELS`.
 
     Returns:
-        tuple: A tuple containing a bytes object representing the processed image data and the filename of the image.
-
-    Keyword Args:
-        size (tuple): A tuple of the width and height of the output image.
-        scale (float): A scaling factor for the output image.
-        crop (str): A string representing the cropping mode for the output image.
-        quality (int): An integer representing the quality of the output image.
-        keep_meta (bool): A boolean value indicating whether to keep the metadata of the input image.
-        force_format (str): A string representing the image format to be used for the output image.
-        prefix (str): A string representing the prefix to be used for the filename of the output image.
+        list: A list of (file object, filename) tuples, in the same order as `params_list`.
     """
+    params_list = [dict(params) for params in params_list]
 
-    size = kwargs.get('size', None)
-    scale = kwargs.get('scale', None)
-    crop = kwargs.get('crop', None)
-    quality = kwargs.pop('quality', -1)
-    keep_meta = kwargs.get('keep_meta', True)
-    force_format = kwargs.get('force_format', None)
-    prefix = kwargs.get('prefix', None)
-
-    try:
-        img = Image.open(image_file)
-    except UnidentifiedImageError:
-        return None, ''
+    img = get_normalized_image_or_none(image_file, get_draft_size_or_none(params_list), max_pixels)
+    if img is None:
+        return [(None, '') for _ in params_list]
 
-    img = normalize_rotation(img)
+    resample = Image.LANCZOS
 
     rgb_formats = ('jpeg', 'jpg')
-    rgba_formats = ('png')
+    rgba_formats = ('png',)
 
-    if force_format and force_format.lower() in rgb_formats and img.mode != 'RGB':
-        img = img.convert('RGB')
-    if force_format and force_format.lower() in rgba_formats and img.mode != 'RGBA':
-        img = img.convert('RGBA')
+    sources = {}
+    thumbnails = {}
 
-    resample = Image.ANTIALIAS
+    def get_source(force_format):
+        mode = img.mode
+        if force_format and force_format.lower() in rgb_formats:
+            mode = 'RGB'
+        if force_format and force_format.lower() in rgba_formats:
+            mode = 'RGBA'
 
-    if size is None:
-        size = img.size
+        if mode not in sources:
+            sources[mode] = img if mode == img.mode else img.convert(mode)
+            thumbnails[mode] = []
 
-    if crop:
-        thumb = ImageOps.fit(
-            img,
-            size,
-            resample,
-            centering=get_centring_from_crop(crop)
-        )
+        return mode, sources[mode]
 
-    elif None in size:
-        thumb = img
-        if size[0] is None and size[1] is not None:
-            scale = size[1] / img.size[1]
-        elif size[1] is None and size[0] is not None:
-            scale = size[0] / img.size[0]
+    def get_area(params):
+        size = params.get('size', None)
+        if size is None or None in size:
+            return float('inf')
 
-    else:
-        img.thumbnail(
-            size,
-            resample,
-        )
-        thumb = img
+        return size[0] * size[1]
+
+    outputs = [None] * len(params_list)
+
+    for index in sorted(range(len(params_list)), key=lambda i: get_area(params_list[i]), reverse=True):
+        params = params_list[index]
+
+        size = params.get('size', None)
+        scale = params.get('scale', None)
+        crop = params.get('crop', None)
+        quality = params.get('quality', -1)
+        keep_meta = params.get('keep_meta', True)
+        force_format = params.get('force_format', None)
+        prefix = params.get('prefix', None)
 
-    if scale is not None:
-        thumb = ImageOps.scale(
-            thumb,
-            scale,
-            resample
-        )
+        mode, source = get_source(force_format)
 
-    img_info = img.info
-    if not keep_meta:
-        img_info.pop('exif', None)
+        if size is None:
+            size = source.size
 
-    bytes_io = BytesIO()
-    img_format = get_pil_supported_format_or_default(img, force_format)
+        if crop:
+            thumb = ImageOps.fit(
+                reduce_image(source, size),
+                size,
+                resample,
+                centering=get_centring_from_crop(crop)
+            )
 
-    if img_format == "WEBP" and quality == -1:
-        quality = 100
+        elif None in size:
+            thumb = source
+            if size[0] is None and size[1] is not None:
+                scale = size[1] / source.size[1]
+            elif size[1] is None and size[0] is not None:
+                scale = size[0] / source.size[0]
 
-    thumb.save(bytes_io, format=img_format, quality=quality, **img_info)
+        else:
+            target_size = get_thumbnail_size(source.size, size)
+            candidates = [
+                t for t in thumbnails[mode]
+                if t.size[0] >= target_size[0] and t.size[1] >= target_size[1]
+            ]
 
-    ext = pil_format_to_extension_or_none(img_format)
-    filename = rename_file(image_name, prefix, ext)
+            thumb = min(candidates, key=lambda t: t.size[0] * t.size[1]) if candidates else source
+            thumb = thumb.copy()
+            thumb.thumbnail(
+                size,
+                resample,
+            )
+            thumbnails[mode].append(thumb)
 
-    return bytes_io, filename
+        if scale is not None:
+            thumb = ImageOps.scale(
+                thumb,
+                scale,
+                resample
+            )
+
+        img_info = dict(img.info)
+        if not keep_meta:
+            img_info.pop('exif', None)
+
+        out_file = SpooledImageFile(max_size=spool_max_size)
+        img_format = get_pil_supported_format_or_default(img, force_format)
+
+        if img_format == "WEBP" and quality == -1:
+            quality = 100
+
+        thumb.save(out_file, format=img_format, quality=quality, **img_info)
+        out_file.seek(0)
+
+        ext = pil_format_to_extension_or_none(img_format)
+        filename = rename_file(image_name, prefix, ext)
+
+        outputs[index] = (out_file, filename)
+
+    return outputs
+
+
+def get_processed_image(image_file, image_name, **kwargs):
+    """
+    Returns the processed image using the Pillow library.
+
+    Adapted from `django-resized`
+    https://github.com/un1t/django-resized
+    version 1.0.1
+
+    Args:
+        image_file (file object): The file object containing the image data to be processed.
+        image_name (str): The name of the image file.
+        **kwargs: Additional keyword arguments to customize the image processing.
+
+    Returns:
+        tuple: A tuple containing a file object with the processed image data and the filename of the image.
+
+    Keyword Args:
+        size (tuple): A tuple of the width and height of the output image.
+        scale (float): A scaling factor for the output image.
+        crop (str): A string representing the cropping mode for the output image.
+        quality (int): An integer representing the quality of the output image.
+        keep_meta (bool): A boolean value indicating whether to keep the metadata of the input image.
+        force_format (str): A string representing the image format to be used for the output image.
+        prefix (str): A string representing the prefix to be used for the filename of the output image.
+    """
+    return get_processed_images(image_file, image_name, [kwargs])[0]
@@ -0,0 +1,46 @@
+from django.core.mail import EmailMultiAlternatives
+
+
+def get_email_message_data(message):
+    """
+    Returns the given email message as a JSON serializable dict, to be sent later with `get_email_message`.
+
+    The subject, body, addresses, headers and alternatives are kept, attachments are not. The id of the email log of
+    the message, set by `EmailLogBackendMixin`, is kept too, so a retry updates that log instead of adding one.
+    """
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': dict(message.extra_headers),
+        'alternatives': [list(alternative) for alternative in getattr(message, 'alternatives', [])],
+        'email_log_id': getattr(message, 'email_log_id', None),
+    }
+
+
+def get_email_message(data, connection=None):
+    """
+    Returns the email message of a dict returned by `get_email_message_data`.
+    """
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        connection=connection
+    )
+
+    for content, mimetype in data['alternatives']:
+        message.attach_alternative(content, mimetype)
+
+    message.email_log_id = data.get('email_log_id')
+
+    return message
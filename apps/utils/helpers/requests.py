@@ -1,8 +1,10 @@
+import functools
 import os
 import random
 
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
 from ua_parser import user_agent_parser
 
 
@@ -106,6 +108,40 @@ def get_url_head_or_false(url):
     return False
 
 
+@functools.lru_cache(maxsize=None)
+def get_pooled_session(pool_maxsize=10):
+    """
+    Returns a requests session shared by the process, keeping connections to each host alive in a pool.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+def check_url_exists(url, timeout=2):
+    """
+    Checks whether the given URL responds with 200 OK, using a HEAD request over the pooled session. Servers that do
+    not allow HEAD are asked with a streamed GET, without reading the body.
+    """
+    session = get_pooled_session()
+    head = get_agent_head_or_default()
+
+    try:
+        req = session.head(url, allow_redirects=True, headers=head, timeout=timeout)
+
+        if req.status_code == requests.codes.method_not_allowed:
+            with session.get(url, allow_redirects=True, headers=head, timeout=timeout, stream=True) as req:
+                return req.status_code == requests.codes.ok
+
+    except requests.RequestException:
+        return False
+
+    return req.status_code == requests.codes.ok
+
+
 def get_client_ip(request):
     """
     Returns the client's IP address.
@@ -1,8 +1,15 @@
 import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 
 from azure.storage.blob import generate_blob_sas, BlobSasPermissions
 from django.conf import settings
+from django.core.files.storage import storages
+from django.utils.functional import LazyObject, empty
+from storages.backends.azure_storage import AzureStorage
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
 
 logger = logging.getLogger('custom')
 
@@ -52,3 +59,171 @@ def get_azure_presigned_url_or_none(filepath, **kwargs):
         logger.error(f"Error generating Azure presigned URL for file {filepath}: {e}")
 
     return None
+
+
+def get_storage_alias_or_none(storage):
+    """
+    Returns the alias of the STORAGES setting the given storage instance belongs to, or None if it was created
+    elsewhere.
+    """
+    if isinstance(storage, LazyObject):
+        if storage._wrapped is empty:
+            storage._setup()
+        storage = storage._wrapped
+
+    for alias in settings.STORAGES:
+        if storages[alias] is storage:
+            return alias
+
+    return None
+
+
+def get_storage_url_expiry_or_none(storage):
+    """
+    Returns the number of seconds the urls of the given storage stay valid, or None if they do not expire.
+    """
+    if isinstance(storage, LazyObject):
+        if storage._wrapped is empty:
+            storage._setup()
+        storage = storage._wrapped
+
+    if isinstance(storage, S3Boto3Storage) and storage.querystring_auth:
+        return storage.querystring_expire
+
+    if isinstance(storage, AzureStorage) and storage.expiration_secs:
+        return storage.expiration_secs
+
+    return None
+
+
+def get_storage_prefix(storage):
+    """
+    Returns the key prefix of the location of the given object storage.
+    """
+    location = (getattr(storage, 'location', '') or '').strip('/')
+    return f"{location}/" if location else ''
+
+
+def iter_storage_files(storage, path='', workers=8):
+    """
+    Yields a (name, modified_time or None) tuple for every file in the given storage, recursively.
+
+    S3 and Azure are listed flat through their paginated object listing. Other storages are walked with `listdir`,
+    listing directories in parallel.
+    """
+    if isinstance(storage, S3Boto3Storage):
+        prefix = get_storage_prefix(storage)
+        paginator = storage.connection.meta.client.get_paginator('list_objects_v2')
+
+        for page in paginator.paginate(Bucket=storage.bucket_name, Prefix=prefix + path):
+            for entry in page.get('Contents', ()):
+                yield entry['Key'][len(prefix):], entry['LastModified']
+
+        return
+
+    if isinstance(storage, AzureStorage):
+        prefix = get_storage_prefix(storage)
+
+        for blob in storage.client.list_blobs(name_starts_with=(prefix + path) or None):
+            yield blob.name[len(prefix):], blob.last_modified
+
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {executor.submit(storage.listdir, path): path}
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                parent = pending.pop(future)
+                dirs, files = future.result()
+
+                for name in dirs:
+                    dir_path = posixpath.join(parent, name)
+                    pending[executor.submit(storage.listdir, dir_path)] = dir_path
+
+                for name in files:
+                    yield posixpath.join(parent, name), None
+
+
+def delete_storage_files(storage, names, batch_size=1000, workers=8, failed=None):
+    """
+    Deletes the given files from the storage in batches and returns the number of files deleted. The names of the files
+    that could not be deleted are logged, and appended to the `failed` list if one is given. Missing files count as
+    deleted.
+
+    S3 uses `delete_objects` (up to 1000 keys per request) and Azure uses a batch `delete_blobs` (up to 256 blobs per
+    request). Other storages delete file by file, in parallel.
+    """
+    if isinstance(storage, S3Boto3Storage):
+        batch_size = min(batch_size, 1000)
+        client = storage.connection.meta.client
+
+        def delete_batch(batch):
+            keys = {storage._normalize_name(clean_name(name)): name for name in batch}
+            response = client.delete_objects(
+                Bucket=storage.bucket_name,
+                Delete={
+                    'Objects': [{'Key': key} for key in keys],
+                    'Quiet': True,
+                }
+            )
+
+            errors = []
+            for error in response.get('Errors', []):
+                logger.error(f"delete_storage_files: {error.get('Key')}: {error.get('Message')}")
+                errors.append(keys.get(error.get('Key'), error.get('Key')))
+
+            return errors
+
+    elif isinstance(storage, AzureStorage):
+        batch_size = min(batch_size, 256)
+
+        def delete_batch(batch):
+            responses = storage.client.delete_blobs(
+                *[storage._get_valid_path(name) for name in batch], raise_on_any_failure=False
+            )
+
+            errors = []
+            for name, response in zip(batch, responses):
+                if response.status_code >= 300 and response.status_code != 404:
+                    logger.error(f"delete_storage_files: {name}: {response.status_code} {response.reason}")
+                    errors.append(name)
+
+            return errors
+
+    else:
+        def delete_file(name):
+            try:
+                storage.delete(name)
+                return None
+            except Exception as e:
+                logger.error(f"delete_storage_files: {name}: {e}")
+                return name
+
+        def delete_batch(batch):
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return [name for name in executor.map(delete_file, batch) if name is not None]
+
+    num_deleted = 0
+    batch = []
+
+    def delete_and_count(batch):
+        errors = delete_batch(batch)
+        if failed is not None:
+            failed.extend(errors)
+
+        return len(batch) - len(errors)
+
+    for name in names:
+        batch.append(name)
+
+        if len(batch) >= batch_size:
+            num_deleted += delete_and_count(batch)
+            batch = []
+
+    if batch:
+        num_deleted += delete_and_count(batch)
+
+    return num_deleted
@@ -1,15 +1,24 @@
-import csv
+import re
+from uuid import uuid4
 
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin.templatetags.admin_urls import admin_urlname
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import FileSystemStorage, storages
 from django.db.models import DateField, DateTimeField, ForeignKey, BooleanField, CharField, IntegerField, \
-    SmallIntegerField, PositiveSmallIntegerField, PositiveIntegerField
-from django.http import HttpResponse
-from django.shortcuts import resolve_url
-from django.urls import reverse
+    SmallIntegerField, PositiveSmallIntegerField, PositiveIntegerField, Exists, OuterRef, ForeignObjectRel
+from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.shortcuts import resolve_url, redirect
+from django.urls import reverse, path
 from django.utils.html import format_html
 from django.utils.safestring import SafeText
 
+from ...helpers.django import EstimatedCountPaginator
+from ...helpers.export import get_export_field_names, iter_export_rows, iter_csv, write_xlsx, dump_queryset_query
+from ...tasks import task_export_queryset
+
 
 def parse_field_config(links_config):
     """
@@ -79,33 +88,121 @@ class NoModuleAdminMixin(object):
         return False
 
 
+class EstimatedCountAdminMixin(object):
+    """
+    Mixin for the changelists of large tables: the full result count is not shown, and unfiltered changelists are
+    paginated with the row estimate of the database.
+    """
+
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+
 class ExportCsvMixin(admin.ModelAdmin):
     """
-    This mixin allows you to export a csv file from the admin change list.
+    This mixin allows you to export a csv or xlsx file from the admin change list.
+
+    Rows are streamed from the database in chunks of `export_chunk_size`. Exports are generated in a Celery task,
+    and saved to the default storage, when more than EXPORT_ASYNC_THRESHOLD instances are selected.
     """
+    export_chunk_size = 2000
+    export_actions = ('export_as_csv', 'export_as_xlsx')
+    export_file_name_regex = re.compile(r'^[0-9a-f]{32}\.(csv|xlsx)$')
 
     def __init__(self, model, admin_site):
         super().__init__(model, admin_site)
 
-        if 'export_as_csv' not in self.actions:
-            self.actions += ('export_as_csv',)
+        for action in self.export_actions:
+            if action not in self.actions:
+                self.actions += (action,)
 
-    def export_as_csv(self, request, queryset):
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+
+        return [
+            path(
+                'export/<str:file_name>/',
+                self.admin_site.admin_view(self.export_download_view),
+                name='{}_{}_export'.format(*info)
+            ),
+        ] + super().get_urls()
+
+    def get_export_storage(self):
+        return storages[getattr(settings, 'EXPORT_STORAGE', 'default')]
+
+    def get_export_path(self, file_name):
+        return 'export/{}/{}/{}'.format(self.model._meta.app_label, self.model._meta.model_name, file_name)
+
+    def export_download_view(self, request, file_name):
+        """
+        Serves a file generated by an async export, with a fresh (possibly signed) storage URL.
+        """
+        if not self.has_view_or_change_permission(request):
+            raise PermissionDenied
+
+        if not self.export_file_name_regex.match(file_name):
+            raise Http404
+
+        storage = self.get_export_storage()
+        name = self.get_export_path(file_name)
+
+        if not storage.exists(name):
+            raise Http404('The export does not exist or is not ready yet.')
+
+        if isinstance(storage, FileSystemStorage):
+            return FileResponse(storage.open(name), as_attachment=True, filename=file_name)
+
+        return redirect(storage.url(name))
+
+    def export(self, request, queryset, fmt):
         meta = self.model._meta
-        field_names = [field.name for field in meta.fields]
+        threshold = getattr(settings, 'EXPORT_ASYNC_THRESHOLD', None)
 
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename={}.csv'.format(meta)
-        writer = csv.writer(response)
+        count = queryset.count() if threshold else 0
+
+        if threshold and count > threshold:
+            file_name = '{}.{}'.format(uuid4().hex, fmt)
+
+            task_export_queryset.delay(
+                meta.app_label, meta.model_name, dump_queryset_query(queryset), fmt, self.get_export_path(file_name),
+                storage=getattr(settings, 'EXPORT_STORAGE', 'default')
+            )
+
+            url = reverse(
+                '{}:{}_{}_export'.format(self.admin_site.name, meta.app_label, meta.model_name), args=[file_name]
+            )
+
+            self.message_user(request, format_html(
+                'The export of {} rows is being generated, it will be available at <a href="{}">{}</a>.',
+                count, url, file_name
+            ))
+            return None
 
-        writer.writerow(field_names)
-        for obj in queryset:
-            row = writer.writerow([getattr(obj, field) for field in field_names])
+        rows = iter_export_rows(queryset, get_export_field_names(self.model), chunk_size=self.export_chunk_size)
+
+        if fmt == 'xlsx':
+            return FileResponse(
+                write_xlsx(rows, title=meta.model_name[:31]),
+                as_attachment=True,
+                filename='{}.xlsx'.format(meta),
+                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+            )
+
+        response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename={}.csv'.format(meta)
 
         return response
 
+    def export_as_csv(self, request, queryset):
+        return self.export(request, queryset, 'csv')
+
     export_as_csv.short_description = "Export Selected"
 
+    def export_as_xlsx(self, request, queryset):
+        return self.export(request, queryset, 'xlsx')
+
+    export_as_xlsx.short_description = "Export Selected (xlsx)"
+
 
 class AutoModelBaseAdminMixin(admin.ModelAdmin):
     """
@@ -132,6 +229,7 @@ class AutoModelBaseAdminMixin(admin.ModelAdmin):
     * codemirror_fields: includes the field 'body' by default, but can be manually set
     * date_hierarchy: includes the first field that matches the following names: 'joined_at', 'updated_at',
       'created_at', 'modified_at'
+    * list_select_related: includes the ForeignKey fields of list_display, unless set on the class
 
     To use this mixin, simply subclass it and include it as a mixin in your ModelAdmin class.
     """
@@ -146,6 +244,7 @@ class AutoModelBaseAdminMixin(admin.ModelAdmin):
         self.date_hierarchy = None
 
         self.set_list_display_fields(model)
+        self.set_list_select_related(model)
         self.set_list_filter_fields(model)
         self.set_search_fields(model)
         self.set_codemirror_fields(model)
@@ -174,6 +273,18 @@ class AutoModelBaseAdminMixin(admin.ModelAdmin):
             elif isinstance(model._meta.get_field(field), display_field_types) and len(self.list_display) < max_fields:
                 self.list_display += (field,)
 
+    def set_list_select_related(self, model):
+        if self.list_select_related:
+            return
+
+        related_fields = tuple(
+            field for field in self.list_display if isinstance(model._meta.get_field(field), ForeignKey)
+        )
+
+        # unlike the default select_related(), naming the fields also joins nullable foreign keys
+        if related_fields:
+            self.list_select_related = related_fields
+
     def set_list_filter_fields(self, model):
         max_fields = 10
         filter_field_types = (
@@ -272,7 +383,12 @@ class AutoModelLinkAdminMixin(admin.ModelAdmin):
         except Exception:
             return
 
-        if not target_instance.exists():
+        # annotated by get_queryset, the query is only run for instances loaded elsewhere
+        exists = getattr(instance, self.get_changelist_exists_name(model_field_name), None)
+        if exists is None:
+            exists = target_instance.exists()
+
+        if not exists:
             return
 
         def get_url():
@@ -293,6 +409,29 @@ class AutoModelLinkAdminMixin(admin.ModelAdmin):
             '{}?{}={}'.format(get_url(), get_lookup_filter(), instance.pk), get_label()
         )
 
+    @staticmethod
+    def get_changelist_exists_name(model_field_name):
+        return '{}_link_exists'.format(model_field_name)
+
+    def get_changelist(self, request, **kwargs):
+        return AutoModelLinkChangeList
+
+    def annotate_changelist_links(self, queryset):
+        """
+        Annotates whether each reverse relation with a changelist link has rows, with one subquery per relation
+        instead of one query per row. Only the rows of the changelist page are annotated, see `AutoModelLinkChangeList`.
+        """
+        annotations = {}
+        for relation in self.changelist_link_relations:
+            annotations[self.get_changelist_exists_name(relation.name)] = Exists(
+                relation.related_model._base_manager.filter(**{relation.field.name: OuterRef('pk')})
+            )
+
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+
+        return queryset
+
     def get_app_model(self, instance, model_field_name):
         model_meta = getattr(instance, model_field_name).model._meta
         app = model_meta.app_label
@@ -338,12 +477,28 @@ class AutoModelLinkAdminMixin(admin.ModelAdmin):
             if f not in model._meta.fields and f.one_to_many
         ]
 
+        self.changelist_link_relations = [
+            f for f in model._meta.get_fields()
+            if f.name in changelist_links and isinstance(f, ForeignObjectRel)
+        ]
+
         for model_field_name, admin_field_name in parse_field_config(changelist_links):
             self.add_changelist_link(model_field_name, admin_field_name)
 
         super().__init__(model, admin_site)
 
 
+class AutoModelLinkChangeList(ChangeList):
+    """
+    Changelist that annotates the changelist links of its results only, so the change view, actions and exports do not
+    run the subqueries.
+    """
+
+    def get_results(self, request):
+        self.queryset = self.model_admin.annotate_changelist_links(self.queryset)
+        super().get_results(request)
+
+
 class AutoModelAdminMixin(AutoModelBaseAdminMixin, AutoModelLinkAdminMixin, ExportCsvMixin, admin.ModelAdmin):
     pass
 
@@ -1,12 +1,18 @@
+import logging
 import uuid
 
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
 from django.template.defaultfilters import striptags, truncatewords
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
-from ...helpers.django import get_processed_image_as_field_file, get_upload_path
+from ...helpers.django import get_processed_images_as_field_files, get_upload_path, remove_storage_files_on_commit
+from ...tasks import task_process_image_out_fields
+from .core import StoredFieldsMixin
+
+logger = logging.getLogger('custom')
 
 
 class TimestampMixin(models.Model):
@@ -166,23 +172,43 @@ class BodyExcerptMixin(models.Model):
         super().save(*args, **kwargs)
 
 
-class ResizeImageSaveMixin(models.Model):
+class ResizeImageSaveMixin(StoredFieldsMixin, models.Model):
     """
     Mixin that resizes an image field on save, creating new image fields in various sizes.
 
-    Image processing is done with the 'get_processed_image_as_field_file' function. Resized images are stored in fields
+    Image processing is done with the 'get_processed_images_as_field_files' function, which decodes the original image
+    once for all sizes. Resized images are stored in fields
     with names determined by the 'image_out_fields' dictionary. The original image field is determined by the 'image_in_field'
     attribute.
 
-    The 'from_db' method is overridden to store the initial state of the model, which is used to compare if the image
-    field has changed when the model is saved.
+    The stored value of the image field is kept by 'StoredFieldsMixin', which is used to compare if the image field has
+    changed when the model is saved.
+
+    If 'image_out_async' is set (defaults to the IMAGE_OUT_ASYNC setting), save() stores the original image straight
+    away and queues the resized images to a Celery task. The state of each resized image is kept in 'image_out_status',
+    and 'get_image_out_url' falls back to the original image until the resized image is ready.
 
     To use this mixin, simply subclass this mixin and include it as a mixin in your Model class. The fields that are resized should
     be named according to the 'image_in_field' attribute, and the new fields will be named according to the 'image_out_fields'
     dictionary.
     """
 
-    _stored: dict
+    IMAGE_OUT_PENDING = 'pending'
+    IMAGE_OUT_READY = 'ready'
+    IMAGE_OUT_FAILED = 'failed'
+
+    image_in_field = "image"
+    image_out_fields = {
+        'image_xxs': {'size': [40, 30], 'force_format': 'WEBP', 'quality': 99},
+        'image_xs': {'size': [160, 120], 'force_format': 'WEBP', 'quality': 99},
+        'image_sm': {'size': [480, 360], 'force_format': 'WEBP', 'quality': 99},
+        'image_md': {'size': [800, 600], 'force_format': 'WEBP', 'quality': 99},
+        'image_lg': {'size': [1280, 960], 'force_format': 'WEBP', 'quality': 99},
+        'image_xl': {'size': [1920, 1440], 'force_format': 'WEBP', 'quality': 99},
+        'image_xxl': {'size': [2560, 1920], 'force_format': 'WEBP', 'quality': 99},
+    }
+
+    image_out_status = models.JSONField(_('Image out status'), default=dict, blank=True, editable=False)
 
     class Meta:
         abstract = True
@@ -190,40 +216,113 @@ class ResizeImageSaveMixin(models.Model):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.image_in_field = "image"
-        self.image_out_fields = {
-            'image_xxs': {'size': [40, 30], 'force_format': 'WEBP', 'quality': 99},
-            'image_xs': {'size': [160, 120], 'force_format': 'WEBP', 'quality': 99},
-            'image_sm': {'size': [480, 360], 'force_format': 'WEBP', 'quality': 99},
-            'image_md': {'size': [800, 600], 'force_format': 'WEBP', 'quality': 99},
-            'image_lg': {'size': [1280, 960], 'force_format': 'WEBP', 'quality': 99},
-            'image_xl': {'size': [1920, 1440], 'force_format': 'WEBP', 'quality': 99},
-            'image_xxl': {'size': [2560, 1920], 'force_format': 'WEBP', 'quality': 99},
-        }
+        self.image_out_async = getattr(settings, 'IMAGE_OUT_ASYNC', False)
 
     @classmethod
-    def from_db(cls, db, field_names, values):
-        instance = super().from_db(db, field_names, values)
-        instance._stored = dict(zip(field_names, values))
+    def get_stored_field_names(cls):
+        return super().get_stored_field_names() + (cls.image_in_field,)
+
+    def get_image_out_field_names(self):
+        return [field_name for field_name in self.image_out_fields if hasattr(self, field_name)]
+
+    def get_image_out_url(self, field_name):
+        """
+        Returns the url of the given resized image, or the url of the original image if it is not ready yet.
+        """
+        image_out = getattr(self, field_name, None)
+        if image_out and self.image_out_status.get(field_name, self.IMAGE_OUT_READY) == self.IMAGE_OUT_READY:
+            return image_out.url
+
+        image_in = getattr(self, self.image_in_field, None)
+        if image_in:
+            return image_in.url
+
+        return None
+
+    def process_image_out_fields(self, image_in_name=None):
+        """
+        Generates and saves the resized image fields from the current image field, and removes the replaced files.
+
+        Returns True if all resized images were generated, False if any failed, or None if nothing was done. If
+        'image_in_name' is given and no longer matches the image field, the image was replaced in the meantime and
+        nothing is done.
+        """
+        image_in = getattr(self, self.image_in_field, None)
+
+        if not image_in or (image_in_name is not None and image_in.name != image_in_name):
+            return None
+
+        field_names = self.get_image_out_field_names()
+        replaced = self.get_image_out_names(field_names)
+        params_list = [self.image_out_fields[field_name] for field_name in field_names]
 
-        return instance
+        try:
+            images_out = get_processed_images_as_field_files(image_in.file, image_in.name, params_list)
+        except Exception as e:
+            logger.error(f"process_image_out_fields: {self._meta.label} {self.pk}: {e}")
+            images_out = [None] * len(field_names)
+
+        for field_name, image_out in zip(field_names, images_out):
+            setattr(self, field_name, image_out)
+            self.image_out_status[field_name] = self.IMAGE_OUT_READY if image_out else self.IMAGE_OUT_FAILED
+
+        self.save(update_fields=field_names + ['image_out_status'])
+        self.remove_image_out_files(replaced, field_names)
+
+        return all(images_out)
+
+    def get_image_out_names(self, field_names):
+        return [getattr(self, field_name).name for field_name in field_names]
+
+    def remove_image_out_files(self, names, field_names):
+        """
+        Removes the given files of the resized image fields once the transaction commits, unless still in use.
+        """
+        current = set(self.get_image_out_names(field_names))
+        current.add(getattr(self, self.image_in_field).name)
+
+        for name, field_name in zip(names, field_names):
+            if name and name not in current:
+                remove_storage_files_on_commit([name], storage=self._meta.get_field(field_name).storage)
 
     def save(self, *args, **kwargs):
         image_in = getattr(self, self.image_in_field, None)
-        stored_image_in = self._stored.pop(self.image_in_field, None) if hasattr(self, '_stored') else None
+        stored_image_in = self.get_stored_value(self.image_in_field)
+
+        dispatch_image_out = False
+        field_names = []
+        replaced = []
 
         if image_in != stored_image_in:
-            for field_name, image_kwargs in self.image_out_fields.items():
-                if hasattr(self, field_name):
-                    if image_in:
-                        image_out = get_processed_image_as_field_file(image_in.file, image_in.name, **image_kwargs)
-                    else:
-                        image_out = None
+            self.image_out_status = {}
 
-                    setattr(self, field_name, image_out)
+            field_names = self.get_image_out_field_names()
+            replaced = [] if self._state.adding else self.get_image_out_names(field_names)
+
+            if image_in and self.image_out_async:
+                images_out = [None] * len(field_names)
+                dispatch_image_out = bool(field_names)
+            elif image_in and field_names:
+                params_list = [self.image_out_fields[field_name] for field_name in field_names]
+                images_out = get_processed_images_as_field_files(image_in.file, image_in.name, params_list)
+            else:
+                images_out = [None] * len(field_names)
+
+            for field_name, image_out in zip(field_names, images_out):
+                setattr(self, field_name, image_out)
+
+                if image_in:
+                    self.image_out_status[field_name] = self.IMAGE_OUT_PENDING if dispatch_image_out else self.IMAGE_OUT_READY
 
         super().save(*args, **kwargs)
 
+        if replaced:
+            self.remove_image_out_files(replaced, field_names)
+
+        if dispatch_image_out:
+            args = (self._meta.app_label, self._meta.model_name, self.pk, getattr(self, self.image_in_field).name)
+            transaction.on_commit(lambda: task_process_image_out_fields.delay(*args))
+
 
 class LogoSizeImageMixin(ResizeImageSaveMixin, models.Model):
     """
@@ -1,26 +1,203 @@
-from django.db import models
+from functools import lru_cache
 
-from ...helpers.django import remove_storage_file_if_exists
+from django.core.files import File
+from django.db import models, transaction
+
+from ...helpers.django import remove_storage_files_on_commit
+
+
+@lru_cache(maxsize=None)
+def get_file_field_names(model):
+    """
+    Returns the names of the concrete FileField/ImageField fields of the given model.
+    """
+    return tuple(field.name for field in model._meta.concrete_fields if isinstance(field, models.FileField))
+
+
+@lru_cache(maxsize=None)
+def get_stored_fields(model):
+    """
+    Returns the attnames of the fields kept by `StoredFieldsMixin` for the given model, their positions in the concrete
+    fields of the model, and the position of each name and attname in the kept values. Names that are not concrete
+    fields of the model are left out.
+    """
+    concrete_attnames = [field.attname for field in model._meta.concrete_fields]
+    names = {field.name: field.attname for field in model._meta.concrete_fields}
+    attnames = tuple(dict.fromkeys(
+        names.get(name, name) for name in model.get_stored_field_names() if names.get(name, name) in concrete_attnames
+    ))
+
+    lookup = {}
+    for name, attname in names.items():
+        if attname in attnames:
+            lookup[name] = lookup[attname] = attnames.index(attname)
+
+    return attnames, tuple(concrete_attnames.index(attname) for attname in attnames), lookup
+
+
+class StoredFieldsMixin(models.Model):
+    """
+    Mixin that keeps the stored values of the fields returned by `get_stored_field_names`, to check on save which of
+    them changed.
+
+    The fields are resolved once per model class, and only their values are kept, in a tuple, when an instance is
+    loaded from the database and after each save. Checking a field costs the same whatever the size of the model.
+    Mixins add their fields by extending `get_stored_field_names`:
+
+    @classmethod
+    def get_stored_field_names(cls):
+        return super().get_stored_field_names() + ('myfile',)
+    """
+    _stored = None
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def get_stored_field_names(cls):
+        return ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        attnames, indexes, _ = get_stored_fields(cls)
+
+        if len(values) == len(cls._meta.concrete_fields):
+            instance._stored = tuple(values[i] for i in indexes)
+        else:
+            positions = {attname: i for i, attname in enumerate(field_names)}
+            instance._stored = tuple(
+                values[positions[attname]] if attname in positions else None for attname in attnames
+            )
+
+        return instance
+
+    def get_stored_value(self, field_name):
+        """
+        Returns the stored value of the given field, or None if the instance was not loaded or saved yet. File fields
+        return the file name.
+        """
+        lookup = get_stored_fields(type(self))[2]
+
+        if self._stored is None or field_name not in lookup:
+            return None
+
+        return self._stored[lookup[field_name]]
+
+    def set_stored(self, update_fields=None):
+        """
+        Keeps the current values of the stored fields, or only of `update_fields` if given. Deferred fields are not
+        loaded.
+        """
+        attnames, _, lookup = get_stored_fields(type(self))
+        previous = self._stored or (None,) * len(attnames)
+        updated = None if update_fields is None else {lookup[name] for name in update_fields if name in lookup}
+        stored = []
+
+        for i, (attname, value) in enumerate(zip(attnames, previous)):
+            if attname in self.__dict__ and (updated is None or i in updated):
+                value = self.__dict__[attname]
+                if isinstance(value, File):
+                    value = value.name
+
+            stored.append(value)
+
+        self._stored = tuple(stored)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.set_stored(update_fields=kwargs.get('update_fields'))
+
+
+@lru_cache(maxsize=None)
+def has_bulk_delete(model):
+    """
+    Returns whether every `delete()` override of the given model has a bulk counterpart, i.e. it is the file removal
+    of `RemoveFieldFileOnDeleteMixin`, or its class also defines `collect_bulk_delete`.
+    """
+    return all(
+        klass in (models.Model, RemoveFieldFileOnDeleteMixin) or 'collect_bulk_delete' in vars(klass)
+        for klass in model.__mro__ if 'delete' in vars(klass)
+    )
 
 
 class QuerySetByInstanceDelete(models.QuerySet):
     """
-    QuerySet that deletes instances by instance.delete() instead of queryset.delete()
+    QuerySet that does the work of instance.delete() for all instances in bulk, with a single set-based delete.
+
+    The instances are read in chunks of `delete_chunk_size` to gather:
+
+    * the files of their FileFields, or of `filefields_to_remove_on_delete` if the model sets it, removed in batches
+      once the transaction commits
+    * whatever the model collects with the `collect_bulk_delete(instances, **kwargs)` classmethod, if defined, which is
+      passed to its `after_bulk_delete(collected)` classmethod after the delete (e.g. action log rows)
+
+    Models with a `delete()` override that has no bulk counterpart (e.g. `SoftDeleteModelMixin`, see `has_bulk_delete`)
+    are deleted instance by instance instead, so the override still runs.
     """
+    delete_chunk_size = 2000
+
+    def delete(self, **kwargs):
+        model = self.model
+
+        if not has_bulk_delete(model):
+            return self.delete_by_instance(**kwargs)
+
+        file_field_names = getattr(model, 'filefields_to_remove_on_delete', None) or get_file_field_names(model)
+        collect = getattr(model, 'collect_bulk_delete', None)
+
+        file_names = {field_name: set() for field_name in file_field_names}
+        collected = []
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            instances = []
+            for instance in self.iterator(chunk_size=self.delete_chunk_size):
+                for field_name in file_field_names:
+                    name = getattr(instance, field_name).name
+                    if name:
+                        file_names[field_name].add(name)
+
+                if collect:
+                    instances.append(instance)
+
+                    if len(instances) >= self.delete_chunk_size:
+                        collected.extend(collect(instances, **kwargs))
+                        instances = []
 
-    def delete(self, *args, **kwargs):
-        for obj in self:
-            obj.delete()
+            if collect and instances:
+                collected.extend(collect(instances, **kwargs))
 
-        super().delete(*args, **kwargs)
+            deleted = super().delete()
+
+            if collected:
+                model.after_bulk_delete(collected)
+
+            for field_name, names in file_names.items():
+                remove_storage_files_on_commit(sorted(names), storage=model._meta.get_field(field_name).storage)
+
+        return deleted
+
+    def delete_by_instance(self, **kwargs):
+        count = 0
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            for instance in self.iterator(chunk_size=self.delete_chunk_size):
+                instance.delete(**kwargs)
+                count += 1
+
+        return count, {self.model._meta.label: count}
 
 
 class RemoveFieldFileOnDeleteMixin(models.Model):
     """
     Mixin that removes the file associated with a FileField when a model instance is deleted.
+    Files still referenced by another instance, as checked by the MEDIA_REFERENCE_CHECK setting, are kept.
+
+    All FileFields are removed, unless `filefields_to_remove_on_delete` lists the field names to remove.
 
     To use this mixin, simply include it as a mixin in your model class that has FileField(s). The `objects` attribute of
-    the model should use the `QuerySetByInstanceDelete` manager as its manager.
+    the model should use the `QuerySetByInstanceDelete` manager as its manager, so that queryset deletes also remove the
+    files, in bulk.
 
     Example usage:
 
@@ -31,49 +208,57 @@ class RemoveFieldFileOnDeleteMixin(models.Model):
     """
     objects = QuerySetByInstanceDelete.as_manager()
 
+    filefields_to_remove_on_delete = None
+
     class Meta:
         abstract = True
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.filefields_to_remove_on_delete = [field.name for field in self._meta.fields]
-
     def delete(self, using=None, keep_parents=False):
-        for field_name in self.filefields_to_remove_on_delete:
-            field = getattr(self, field_name, None)
-            remove_storage_file_if_exists(field.name)
+        field_names = self.filefields_to_remove_on_delete or get_file_field_names(type(self))
+        files = [getattr(self, field_name) for field_name in field_names]
 
-        super().delete()
+        deleted = super().delete()
 
+        for file in files:
+            remove_storage_files_on_commit([file.name], storage=file.storage)
 
-class RemoveFieldFileOnChangeMixin(models.Model):
+        return deleted
+
+
+class RemoveFieldFileOnChangeMixin(StoredFieldsMixin, models.Model):
     """
     Mixin that removes the file associated with a FileField when a model instance is saved and the field has changed.
+    Files still referenced by another instance, as checked by the MEDIA_REFERENCE_CHECK setting, are kept.
+
+    All FileFields are watched, unless `filefields_to_remove_on_change` lists the field names to watch. The file is
+    removed once the transaction commits, see `remove_storage_files_on_commit`.
     """
-    _stored: dict
+    filefields_to_remove_on_change = None
 
     class Meta:
         abstract = True
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.filefields_to_remove_on_change = [field.name for field in self._meta.fields]
+    @classmethod
+    def get_filefields_to_remove_on_change(cls):
+        return tuple(cls.filefields_to_remove_on_change or get_file_field_names(cls))
 
     @classmethod
-    def from_db(cls, db, field_names, values):
-        instance = super().from_db(db, field_names, values)
-        instance._stored = dict(zip(field_names, values))
-        return instance
+    def get_stored_field_names(cls):
+        return super().get_stored_field_names() + cls.get_filefields_to_remove_on_change()
 
     def save(self, *args, **kwargs):
+        changed_files = []
 
         if not self._state.adding:
 
-            for field_name in self.filefields_to_remove_on_change:
+            for field_name in self.get_filefields_to_remove_on_change():
                 field = getattr(self, field_name, None)
-                stored_field = self._stored.pop(field_name, None) if hasattr(self, '_stored') else None
+                stored_field = self.get_stored_value(field_name)
 
                 if field != stored_field:
-                    remove_storage_file_if_exists(stored_field)
+                    changed_files.append((stored_field, field.storage))
 
         super().save(*args, **kwargs)
+
+        for stored_field, storage in changed_files:
+            remove_storage_files_on_commit([stored_field], storage=storage)
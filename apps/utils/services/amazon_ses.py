@@ -1,25 +1,49 @@
 import logging
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from functools import lru_cache
 
 import boto3
 from django.conf import settings
 
+from ..helpers.ratelimit import TokenBucket
+
 logger = logging.getLogger('custom')
 
 
+@lru_cache(maxsize=None)
+def get_ses_client():
+    """
+    Returns the SES client of the process. It is created on first use, so each worker process gets its own client, and
+    reused for all later sends.
+    """
+    return boto3.client(
+        'ses',
+        aws_access_key_id=settings.AWS_SES_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SES_SECRET_ACCESS_KEY,
+        region_name=settings.AWS_SES_REGION_NAME
+    )
+
+
+@lru_cache(maxsize=None)
+def get_ses_rate_limiter():
+    """
+    Returns the token bucket that keeps the sends of the process within the AWS_SES_MAX_SEND_RATE setting (messages per
+    second), or None if no rate is set. The rate is unset by default, set it for the workers of the email queue only,
+    so emails sent within a request are never held back.
+    """
+    rate = getattr(settings, 'AWS_SES_MAX_SEND_RATE', None)
+    return TokenBucket(rate) if rate else None
+
+
 class AmazonSesHandler:
     """
     A module to handle Amazon SES API related operations.
     """
 
     def __init__(self, from_email=None):
-        self.ses = boto3.client(
-            'ses',
-            aws_access_key_id=settings.AWS_SES_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SES_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_SES_REGION_NAME
-        )
+        self.ses = get_ses_client()
+        self.rate_limiter = get_ses_rate_limiter()
         self.from_email = from_email or settings.DEFAULT_FROM_EMAIL
 
     def send_email(self, message):
@@ -43,6 +67,9 @@ class AmazonSesHandler:
                     html_part = MIMEText(alt[0], 'html')
                     msg.attach(html_part)
 
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
         try:
             response = self.ses.send_raw_email(
                 Source=message.from_email,
@@ -0,0 +1,86 @@
+import logging
+from datetime import timedelta
+from tempfile import SpooledTemporaryFile
+
+from celery import shared_task
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import storages
+from django.utils import timezone
+
+from .helpers.export import get_export_field_names, iter_export_rows, iter_csv, write_xlsx, load_queryset_query
+from .helpers.storage import iter_storage_files, delete_storage_files
+
+logger = logging.getLogger('custom')
+
+
+@shared_task
+def task_process_image_out_fields(app_label, model_name, pk, image_in_name):
+    """
+    Generates the resized image fields of a `ResizeImageSaveMixin` instance outside of the request cycle.
+
+    The task is skipped if the instance no longer exists or its input image was replaced after the task was queued.
+    """
+    model = apps.get_model(app_label, model_name)
+    instance = model._base_manager.filter(pk=pk).first()
+
+    if not instance:
+        logger.warning(f"task_process_image_out_fields: {app_label}.{model_name} {pk} does not exist")
+        return
+
+    instance.process_image_out_fields(image_in_name=image_in_name)
+
+
+@shared_task
+def task_export_queryset(app_label, model_name, query, fmt, file_name, storage='default', chunk_size=2000):
+    """
+    Exports the instances matched by the given query (see `dump_queryset_query`) as csv or xlsx, and saves the file to
+    the given storage.
+    """
+    model = apps.get_model(app_label, model_name)
+    queryset = load_queryset_query(model, query)
+    rows = iter_export_rows(queryset, get_export_field_names(model), chunk_size=chunk_size)
+
+    if fmt == 'xlsx':
+        file = write_xlsx(rows, title=model_name[:31])
+    else:
+        file = SpooledTemporaryFile(mode='w+b')
+        for line in iter_csv(rows):
+            file.write(line.encode())
+
+        file.seek(0)
+
+    with file:
+        name = storages[storage].save(file_name, File(file))
+
+    logger.info(f"task_export_queryset: {app_label}.{model_name} exported to {name}")
+
+    return name
+
+
+@shared_task
+def task_clean_exports(storage=None, retention=None):
+    """
+    Removes the async exports older than `EXPORT_RETENTION` days from the export storage.
+    """
+    storage = storages[storage or getattr(settings, 'EXPORT_STORAGE', 'default')]
+    retention = retention if retention is not None else getattr(settings, 'EXPORT_RETENTION', 7)
+    cutoff = timezone.now() - timedelta(days=retention)
+    names = []
+
+    try:
+        for name, modified_time in iter_storage_files(storage, 'export/'):
+            if modified_time is None:
+                modified_time = storage.get_modified_time(name)
+
+            if modified_time < cutoff:
+                names.append(name)
+    except FileNotFoundError:
+        return 0
+
+    removed = delete_storage_files(storage, names)
+
+    logger.info(f"task_clean_exports: {removed} exports removed")
+
+    return removed
@@ -122,12 +122,20 @@ if HTML_MINIFY_ENABLED:
                      'apps.core.middleware.htmlminify.HTMLMinifyMiddleware',
                  ] + MIDDLEWARE
 
+HTML_MINIFY_CACHE_TIMEOUT = int(os.getenv('DJANGO_HTML_MINIFY_CACHE_TIMEOUT', default=0))
+
 VISIT_LOG_ENABLED = os.getenv('DJANGO_VISIT_LOG_ENABLED', False) == "True"
 if VISIT_LOG_ENABLED:
     MIDDLEWARE += [
         'apps.log.middleware.VisitLogMiddleware',
     ]
 
+VISIT_LOG_BUFFER = os.getenv('DJANGO_VISIT_LOG_BUFFER', default="local")
+VISIT_LOG_REDIS_URL = os.getenv('DJANGO_VISIT_LOG_REDIS_URL', default="redis://redis:6379")
+VISIT_LOG_BUFFER_MAX_SIZE = int(os.getenv('DJANGO_VISIT_LOG_BUFFER_MAX_SIZE', default=10000))
+VISIT_LOG_BATCH_SIZE = int(os.getenv('DJANGO_VISIT_LOG_BATCH_SIZE', default=500))
+VISIT_LOG_FLUSH_INTERVAL = int(os.getenv('DJANGO_VISIT_LOG_FLUSH_INTERVAL', default=10))
+
 # ROOT URL CONFIGURATION
 # ------------------------------------------------------------------------------
 
@@ -344,6 +352,26 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_ENABLE_UTC = True
 CELERY_TIMEZONE = TIME_ZONE
 
+CELERY_BEAT_SCHEDULE = {
+    'flush-storage-deletions': {
+        'task': 'apps.core.tasks.task_flush_storage_deletions',
+        'schedule': 60 * 5,
+    },
+    'clean-exports': {
+        'task': 'apps.utils.tasks.task_clean_exports',
+        'schedule': 60 * 60 * 24,
+    },
+    'clean-email-log-bodies': {
+        'task': 'apps.log.tasks.task_clean_email_log_bodies',
+        'schedule': 60 * 60 * 24,
+    },
+}
+if VISIT_LOG_ENABLED and VISIT_LOG_BUFFER == "redis":
+    CELERY_BEAT_SCHEDULE['flush-visit-log'] = {
+        'task': 'apps.log.tasks.task_flush_visit_log',
+        'schedule': VISIT_LOG_FLUSH_INTERVAL,
+    }
+
 # DJANGO REST FRAMEWORK
 # ------------------------------------------------------------------------------
 # http://www.django-rest-framework.org/
@@ -448,3 +476,32 @@ if SENTRY_ENABLED:
 
 SESSION_COOKIE_AGE = int(os.getenv('DJANGO_SESSION_COOKIE_AGE', default=60 * 60 * 24 * 30))
 MAX_UPLOAD_SIZE = int(os.getenv('DJANGO_MAX_UPLOAD_SIZE', default=4 * 1024 * 1024))
+IMAGE_OUT_ASYNC = os.getenv('DJANGO_IMAGE_OUT_ASYNC', False) == "True"
+IMAGE_MAX_PIXELS = int(os.getenv('DJANGO_IMAGE_MAX_PIXELS', default=64 * 1024 * 1024))
+FILE_SPOOL_MAX_SIZE = int(os.getenv('DJANGO_FILE_SPOOL_MAX_SIZE', default=2.5 * 1024 * 1024))
+MEDIA_CLEAN_EXCLUDE = [e for e in os.getenv('DJANGO_MEDIA_CLEAN_EXCLUDE', default='attachment/ondemand/*,export/*,log/email/*').split(',') if e]
+MEDIA_REFERENCE_CHECK = 'apps.core.helpers.check_media_reference_exists'
+MEDIA_REFERENCE_BULK_CHECK = 'apps.core.helpers.get_referenced_media_names'
+SITE_CONFIG_CACHE_TIMEOUT = int(os.getenv('DJANGO_SITE_CONFIG_CACHE_TIMEOUT', default=60 * 5))
+SITE_CONFIG_LOCAL_TTL = int(os.getenv('DJANGO_SITE_CONFIG_LOCAL_TTL', default=5))
+RENDER_TEMPLATE_CACHE_SIZE = int(os.getenv('DJANGO_RENDER_TEMPLATE_CACHE_SIZE', default=256))
+RENDER_TEMPLATE_CACHE_MAX_CONTENT_SIZE = int(os.getenv('DJANGO_RENDER_TEMPLATE_CACHE_MAX_CONTENT_SIZE', default=4 * 1024 * 1024))
+ICON_SPRITE_ENABLED = os.getenv('DJANGO_ICON_SPRITE_ENABLED', False) == "True"
+EXISTS_CACHE_TIMEOUT = int(os.getenv('DJANGO_EXISTS_CACHE_TIMEOUT', default=60 * 60 * 24))
+EXISTS_CACHE_NEGATIVE_TIMEOUT = int(os.getenv('DJANGO_EXISTS_CACHE_NEGATIVE_TIMEOUT', default=60 * 5))
+EXISTS_CACHE_MISS_DEFAULT = os.getenv('DJANGO_EXISTS_CACHE_MISS_DEFAULT', True) != "False"
+EXPORT_ASYNC_THRESHOLD = int(os.getenv('DJANGO_EXPORT_ASYNC_THRESHOLD', default=50000))
+EXPORT_STORAGE = os.getenv('DJANGO_EXPORT_STORAGE', default="private")
+EXPORT_RETENTION = int(os.getenv('DJANGO_EXPORT_RETENTION', default=7))
+STORAGE_DELETE_QUEUE = 'apps.core.helpers.queue_storage_deletions'
+STORAGE_DELETION_FLUSH_DELAY = int(os.getenv('DJANGO_STORAGE_DELETION_FLUSH_DELAY', default=10))
+STORAGE_DELETION_MAX_ATTEMPTS = int(os.getenv('DJANGO_STORAGE_DELETION_MAX_ATTEMPTS', default=5))
+EMAIL_LOG_BODY_COMPRESS_SIZE = int(os.getenv('DJANGO_EMAIL_LOG_BODY_COMPRESS_SIZE', default=4 * 1024))
+EMAIL_LOG_BODY_OFFLOAD_SIZE = int(os.getenv('DJANGO_EMAIL_LOG_BODY_OFFLOAD_SIZE', default=256 * 1024))
+EMAIL_LOG_BODY_STORAGE = os.getenv('DJANGO_EMAIL_LOG_BODY_STORAGE', default="private")
+EMAIL_QUEUE_ENABLED = os.getenv('DJANGO_EMAIL_QUEUE_ENABLED', False) == "True"
+EMAIL_QUEUE_NAME = os.getenv('DJANGO_EMAIL_QUEUE_NAME', default="queue_short")
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv('DJANGO_EMAIL_QUEUE_BATCH_SIZE', default=50))
+EMAIL_QUEUE_MAX_RETRIES = int(os.getenv('DJANGO_EMAIL_QUEUE_MAX_RETRIES', default=5))
+EMAIL_QUEUE_RETRY_DELAY = int(os.getenv('DJANGO_EMAIL_QUEUE_RETRY_DELAY', default=30))
+AWS_SES_MAX_SEND_RATE = float(os.getenv('AWS_SES_MAX_SEND_RATE', default=0))